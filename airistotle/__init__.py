@@ -1,2 +1,16 @@
-from .assistant import Assistant
-from . import settings
\ No newline at end of file
+from . import settings
+
+__all__ = ["Assistant", "AsyncAssistant", "settings"]
+
+
+def __getattr__(name: str):
+    # The assistants pull in the OpenAI SDK, most of the import time; load them on first use
+    if name == "Assistant":
+        from .assistant import Assistant
+
+        return Assistant
+    if name == "AsyncAssistant":
+        from .async_assistant import AsyncAssistant
+
+        return AsyncAssistant
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
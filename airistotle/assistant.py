@@ -1,6 +1,9 @@
 # Built-ins
-import time
 import json
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import Future
 
 # Third-party
 import backoff
@@ -9,96 +12,356 @@ import openai
 from openai import BadRequestError
 
 # AIRISTOTLE
+from .client import get_client, get_assistant_definition
 from .logger import GlobalLogger
-from .settings import AVAILABLE_PLUGINS
+from .scheduler import get_scheduler
+from .settings import AVAILABLE_PLUGINS, ASSISTANT_CACHE_SIZE, MESSAGE_MIRROR_SIZE
+from .telemetry import span
+from .tools import ToolExecutor
+
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ToolExecutor:
+    """Returns the process-wide `ToolExecutor` for `AVAILABLE_PLUGINS`."""
+    global _tool_executor
+    with _tool_executor_lock:
+        if _tool_executor is None:
+            _tool_executor = ToolExecutor(AVAILABLE_PLUGINS)
+        return _tool_executor
+
+
+class RunStreamReader:
+    """
+    Accumulates the reply and outcome of a streamed run, one event at a time.
+    Shared by the sync and async assistants.
+    """
+
+    def __init__(self, log: GlobalLogger):
+        self.log = log
+        self.text = ""
+        self.status = None
+        self.pending_run = None
+        self.messages = []
+
+    def handle(self, event) -> str:
+        """Applies `event` and returns any new reply text it carried."""
+        delta = ""
+        if event.event == "thread.message.created":
+            # Only the latest assistant message is the reply, as in get_response
+            self.text = ""
+        elif event.event == "thread.message.delta":
+            for part in event.data.delta.content or []:
+                if part.type == "text" and part.text and part.text.value:
+                    delta += part.text.value
+            self.text += delta
+        elif event.event == "thread.message.completed":
+            self.messages.append(event.data)
+        elif event.event == "thread.run.step.delta":
+            step_details = event.data.delta.step_details
+            if step_details and step_details.type == "tool_calls":
+                for tool_call in step_details.tool_calls or []:
+                    if tool_call.type == "function" and tool_call.function.name:
+                        self.log.debug("Run is calling '%s'", tool_call.function.name)
+        elif event.event == "thread.run.requires_action":
+            self.log.audit("Run requires action.")
+            self.pending_run = event.data
+        elif event.event in [
+            "thread.run.completed",
+            "thread.run.cancelled",
+            "thread.run.expired",
+            "thread.run.failed",
+        ]:
+            self.status = event.data.status
+        return delta
+
+
+class MessageMirror:
+    """
+    Local copy of the most recent messages of one thread, oldest first, and a cursor
+    at the newest of them, so only messages created since need to be fetched.
+    Shared by the sync and async assistants, and safe to use from several threads.
+
+    :param maxsize: Number of messages kept.
+    """
+
+    def __init__(self, maxsize: int = MESSAGE_MIRROR_SIZE):
+        self.maxsize = maxsize
+        self._messages = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def cursor(self):
+        """Id of the newest message known, if any."""
+        with self._lock:
+            return next(reversed(self._messages), None)
+
+    def list_params(self) -> dict:
+        """Arguments for `messages.list` which fetch only what the mirror is missing."""
+        cursor = self.cursor
+        if cursor is None:
+            return {"order": "desc", "limit": self.maxsize}
+        return {"order": "asc", "after": cursor, "limit": self.maxsize}
+
+    def apply_page(self, params: dict, page):
+        """
+        Adds a page fetched with `list_params()` arguments. Returns False, leaving the
+        mirror empty, if there were more new messages than fit on the page; fetch again
+        with the new `list_params()` in that case.
+        """
+        with self._lock:
+            if params["order"] == "asc" and page.has_more:
+                # Fell too far behind; rather than page through, start over from the newest
+                self._messages.clear()
+                return False
+            self.extend(page.data if params["order"] == "asc" else reversed(page.data))
+            return True
+
+    def add(self, message):
+        with self._lock:
+            self._messages[message.id] = message
+            while len(self._messages) > self.maxsize:
+                self._messages.popitem(last=False)
+
+    def extend(self, messages):
+        with self._lock:
+            for message in messages:
+                self.add(message)
+
+    def remove(self, message_id: str):
+        with self._lock:
+            self._messages.pop(message_id, None)
+
+    def newest(self):
+        with self._lock:
+            return self._messages[self.cursor] if self._messages else None
+
+    def reply(self, run_id: str = None):
+        """The newest assistant message, optionally only among those of `run_id`."""
+        with self._lock:
+            for message in reversed(self._messages.values()):
+                if message.role in ["assistant", "system"] and (run_id is None or message.run_id == run_id):
+                    return message
+        return None
 
 
 class Assistant:
     def __init__(self, openai_api_key: str, assistant_id: str, thread_id: str = ""):
-        self.client = openai.Client(api_key=openai_api_key)
-        self.assistant = self.client.beta.assistants.retrieve(assistant_id=assistant_id)
+        self.client = get_client(openai_api_key)
+        self.assistant = get_assistant_definition(self.client, assistant_id)
         self.log = GlobalLogger("Assistant")
         self.function_calls = []
+        self.messages = MessageMirror()
 
         # If a thread_id is provided, use it, otherwise create a new thread
         if thread_id:
             self.thread_id = thread_id
-            self.log.debug(f"Using existing thread: {self.thread_id}")
+            self.log.debug("Using existing thread: %s", self.thread_id)
         else:
-            thread = self.client.beta.threads.create()
+            with span("openai.threads.create"):
+                thread = self.client.beta.threads.create()
             self.thread_id = thread.id
-            self.log.info(f"Created new thread: {self.thread_id}")
+            self.log.info("Created new thread: %s", self.thread_id)
 
     def process_requires_action(self, run):
-        tool_call = run.required_action.submit_tool_outputs.tool_calls[0]
-        func = tool_call.function
-        params = json.loads(func.arguments)
+        tool_outputs = self.collect_tool_outputs(run)
+        with span("openai.runs.submit_tool_outputs", run_id=run.id):
+            self.client.beta.threads.runs.submit_tool_outputs(
+                thread_id=self.thread_id,
+                run_id=run.id,
+                tool_outputs=tool_outputs,
+            )
 
-        self.log.debug(f"Processing function call on '{func.name}'")
-        self.log.audit(f"Function call params: {params}")
+    def collect_tool_outputs(self, run) -> list:
+        tool_calls = run.required_action.submit_tool_outputs.tool_calls
+        records = get_tool_executor().run(tool_calls)
 
-        if func.name in AVAILABLE_PLUGINS:
-            plugin = AVAILABLE_PLUGINS[func.name]
-            result = plugin.run(**params)
-        else:
-            result = f"An error occurred: function '{func.name}' could not be found."
-            self.log.warning(f"Function call on '{func.name}' not found.")
+        for record in records:
+            self.function_calls.append(
+                {
+                    "function": record["function"],
+                    "params": record["params"],
+                    "result": record["result"],
+                    "duration": record["duration"],
+                }
+            )
 
-        self.client.beta.threads.runs.submit_tool_outputs(
-            thread_id=self.thread_id,
-            run_id=run.id,
-            tool_outputs=[{"tool_call_id": tool_call.id, "output": result}],
-        )
+        return [
+            {"tool_call_id": record["tool_call_id"], "output": record["result"]}
+            for record in records
+        ]
 
-        self.function_calls.append(
-            {"function": func.name, "params": params, "result": result}
-        )
+    def sync_messages(self):
+        """Fetches the messages created since the newest one in the local mirror."""
+        with span("openai.messages.list"):
+            params = self.messages.list_params()
+            page = self.client.beta.threads.messages.list(thread_id=self.thread_id, **params)
+            if not self.messages.apply_page(params, page):
+                params = self.messages.list_params()
+                page = self.client.beta.threads.messages.list(thread_id=self.thread_id, **params)
+                self.messages.apply_page(params, page)
 
-    def get_response(self):
+    def get_response(self, run_id: str = None):
+        """
+        Returns the text of the latest assistant message. With `run_id`, only that run's
+        messages are fetched; otherwise only those newer than the local mirror.
+        """
         self.log.debug("Getting latest assistant message.")
-        messages = self.client.beta.threads.messages.list(thread_id=self.thread_id).data
-        assistant_messages = [
-            msg for msg in messages if msg.role in ["assistant", "system"]
-        ]
-        self.log.audit(f"Got latest assistant message: {assistant_messages[0]}")
-        return (
-            assistant_messages[0].content[0].text.value if assistant_messages else None  # type: ignore
+        if run_id:
+            with span("openai.messages.list", run_id=run_id):
+                page = self.client.beta.threads.messages.list(
+                    thread_id=self.thread_id, run_id=run_id, order="asc", limit=self.messages.maxsize
+                )
+            self.messages.extend(page.data)
+        else:
+            self.sync_messages()
+
+        reply = self.messages.reply(run_id)
+        self.log.audit("Got latest assistant message: %s", reply)
+        return reply.content[0].text.value if reply else None  # type: ignore
+
+    def submit_message(self, user_input) -> Future:
+        """
+        Adds a message to the thread and starts a run without waiting for it. Returns a
+        future which resolves with the finished run; tool calls are handled by the
+        shared `RunScheduler` in the meantime.
+        """
+        self.log.debug("Sending message to assistant.")
+        # Handles are cached across messages; only keep the tool calls of the latest one
+        self.function_calls = []
+        with span("openai.messages.create"):
+            message = self.client.beta.threads.messages.create(
+                thread_id=self.thread_id, role="user", content=user_input
+            )
+        self.messages.add(message)
+        with span("openai.runs.create"):
+            run = self.client.beta.threads.runs.create(
+                thread_id=self.thread_id, assistant_id=self.assistant.id
+            )
+        return get_scheduler().track(
+            self.client,
+            self.thread_id,
+            run.id,
+            on_requires_action=self.process_requires_action,
         )
 
     @backoff.on_exception(backoff.expo, BadRequestError, max_time=120)
     def send_message(self, user_input):
-        self.log.debug("Sending message to assistant.")
-        self.client.beta.threads.messages.create(
-            thread_id=self.thread_id, role="user", content=user_input
-        )
-        run = self.client.beta.threads.runs.create(
+        with span("assistant.send_message", thread_id=self.thread_id):
+            future = self.submit_message(user_input)
+            with span("run.wait") as wait:
+                run = future.result()
+                wait.set(status=run.status)
+
+            if run.status == "completed":
+                self.log.debug("Run completed.")
+                return self.get_response(run.id)
+            else:
+                raise Exception(f"Run ended with status: {run.status}")
+
+    @backoff.on_exception(backoff.expo, BadRequestError, max_time=120)
+    def stream_message(self, user_input, on_text=None):
+        """
+        Sends a message like `send_message`, but consumes the run's events as they
+        arrive instead of polling, and returns the reply without listing the thread.
+
+        :param user_input: The user's message.
+        :param on_text: Optional callback, called as `on_text(delta, text)` with each
+            new fragment of the reply and the reply text so far.
+        """
+        with span("assistant.stream_message", thread_id=self.thread_id):
+            return self._stream_message(user_input, on_text)
+
+    def _stream_message(self, user_input, on_text=None):
+        self.log.debug("Streaming message to assistant.")
+        self.function_calls = []
+        with span("openai.messages.create"):
+            message = self.client.beta.threads.messages.create(
+                thread_id=self.thread_id, role="user", content=user_input
+            )
+        self.messages.add(message)
+        manager = self.client.beta.threads.runs.stream(
             thread_id=self.thread_id, assistant_id=self.assistant.id
         )
-        run = self.client.beta.threads.runs.retrieve(
-            run_id=run.id, thread_id=self.thread_id
-        )
 
-        while run.status not in ["completed", "cancelled", "expired", "failed"]:
-            self.log.audit(f"Waiting for run to complete. Currently in: {run.status}")
-            time.sleep(1)
-            run = self.client.beta.threads.runs.retrieve(
-                run_id=run.id, thread_id=self.thread_id
-            )
-            if run.status == "requires_action":
-                self.log.audit("Run requires action.")
-                self.process_requires_action(run)
+        reader = RunStreamReader(self.log)
+        while manager is not None:
+            with span("run.stream") as stream_span, manager as stream:
+                for event in stream:
+                    delta = reader.handle(event)
+                    if delta and on_text:
+                        on_text(delta, reader.text)
+                stream_span.set(status=reader.status or "requires_action")
+
+            manager = None
+            if reader.pending_run is not None:
+                pending_run, reader.pending_run = reader.pending_run, None
+                manager = self.client.beta.threads.runs.submit_tool_outputs_stream(
+                    thread_id=self.thread_id,
+                    run_id=pending_run.id,
+                    tool_outputs=self.collect_tool_outputs(pending_run),
+                )
 
-        if run.status == "completed":
+        self.messages.extend(reader.messages)
+        if reader.status == "completed":
             self.log.debug("Run completed.")
-            return self.get_response()
+            return reader.text or None
         else:
-            raise Exception(f"Run ended with status: {run.status}")
+            raise Exception(f"Run ended with status: {reader.status}")
 
     def remove_last_message(self):
+        """Deletes the newest message of the thread."""
         self.log.debug("Removing last message from assistant.")
-        messages = self.client.beta.threads.messages.list(thread_id=self.thread_id).data
-        last_message = messages[-1]
+        self.sync_messages()
+        last_message = self.messages.newest()
+        if last_message is None:
+            return
         self.client.beta.threads.messages.delete(
             thread_id=self.thread_id, message_id=last_message.id
         )
-        self.log.debug(f"Removed message: {last_message.id}")
+        self.messages.remove(last_message.id)
+        self.log.debug("Removed message: %s", last_message.id)
+
+
+class AssistantCache:
+    """
+    Bounded LRU of `Assistant` handles keyed by OpenAI thread id, so that follow-up
+    messages in a conversation reuse the handle created for the first one.
+
+    :param openai_api_key: API key passed to new `Assistant` handles.
+    :param assistant_id: Assistant id passed to new `Assistant` handles.
+    :param maxsize: Maximum number of handles kept. Defaults to `ASSISTANT_CACHE_SIZE`.
+    """
+
+    def __init__(self, openai_api_key: str, assistant_id: str, maxsize: int = 0):
+        self.openai_api_key = openai_api_key
+        self.assistant_id = assistant_id
+        self.maxsize = maxsize or ASSISTANT_CACHE_SIZE
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, thread_id: str = "") -> Assistant:
+        """Returns the handle for `thread_id`, creating it (or a new thread) if needed."""
+        if thread_id:
+            with self._lock:
+                assistant = self._handles.get(thread_id)
+                if assistant is not None:
+                    self._handles.move_to_end(thread_id)
+                    return assistant
+
+        assistant = Assistant(self.openai_api_key, self.assistant_id, thread_id=thread_id)
+        with self._lock:
+            # Another caller may have raced us to the same thread; keep the first handle.
+            assistant = self._handles.setdefault(assistant.thread_id, assistant)
+            self._handles.move_to_end(assistant.thread_id)
+            while len(self._handles) > self.maxsize:
+                self._handles.popitem(last=False)
+        return assistant
+
+    def discard(self, thread_id: str):
+        with self._lock:
+            self._handles.pop(thread_id, None)
+
+    def __len__(self) -> int:
+        return len(self._handles)
@@ -0,0 +1,236 @@
+# Built-ins
+import asyncio
+import contextvars
+
+from collections import OrderedDict
+
+# Third-party
+import backoff
+
+from openai import BadRequestError
+
+# AIRISTOTLE
+from .assistant import MessageMirror, RunStreamReader, get_tool_executor
+from .client import get_async_client, get_async_assistant_definition
+from .logger import GlobalLogger
+from .scheduler import TERMINAL_STATUSES
+from .ratelimit import BACKGROUND, request_priority
+from .settings import ASSISTANT_CACHE_SIZE, RUN_POLL_MIN_INTERVAL, RUN_POLL_MAX_INTERVAL, RUN_POLL_BACKOFF
+from .telemetry import span
+
+
+class AsyncAssistant:
+    """
+    asyncio counterpart of `Assistant`, built on the shared async OpenAI client.
+    Plugins are still synchronous, so tool calls run on the shared `ToolExecutor`
+    without blocking the event loop.
+
+    Use `await AsyncAssistant.create(...)` rather than the constructor, as creating a
+    new thread requires an API call.
+    """
+
+    def __init__(self, openai_api_key: str, assistant_id: str, thread_id: str = ""):
+        self.client = get_async_client(openai_api_key)
+        self.assistant_id = assistant_id
+        self.thread_id = thread_id
+        self.log = GlobalLogger("AsyncAssistant")
+        self.function_calls = []
+        self.messages = MessageMirror()
+
+    @classmethod
+    async def create(cls, openai_api_key: str, assistant_id: str, thread_id: str = ""):
+        assistant = cls(openai_api_key, assistant_id, thread_id=thread_id)
+        assistant.assistant = await get_async_assistant_definition(
+            assistant.client, assistant_id
+        )
+
+        # If a thread_id is provided, use it, otherwise create a new thread
+        if thread_id:
+            assistant.log.debug("Using existing thread: %s", thread_id)
+        else:
+            with span("openai.threads.create"):
+                thread = await assistant.client.beta.threads.create()
+            assistant.thread_id = thread.id
+            assistant.log.info("Created new thread: %s", assistant.thread_id)
+        return assistant
+
+    async def collect_tool_outputs(self, run) -> list:
+        tool_calls = run.required_action.submit_tool_outputs.tool_calls
+        loop = asyncio.get_running_loop()
+        records = await loop.run_in_executor(
+            None, contextvars.copy_context().run, get_tool_executor().run, tool_calls
+        )
+
+        for record in records:
+            self.function_calls.append(
+                {
+                    "function": record["function"],
+                    "params": record["params"],
+                    "result": record["result"],
+                    "duration": record["duration"],
+                }
+            )
+
+        return [
+            {"tool_call_id": record["tool_call_id"], "output": record["result"]}
+            for record in records
+        ]
+
+    async def process_requires_action(self, run):
+        with span("run.requires_action", run_id=run.id):
+            tool_outputs = await self.collect_tool_outputs(run)
+            with span("openai.runs.submit_tool_outputs", run_id=run.id):
+                await self.client.beta.threads.runs.submit_tool_outputs(
+                    thread_id=self.thread_id,
+                    run_id=run.id,
+                    tool_outputs=tool_outputs,
+                )
+
+    async def sync_messages(self):
+        with span("openai.messages.list"):
+            params = self.messages.list_params()
+            page = await self.client.beta.threads.messages.list(thread_id=self.thread_id, **params)
+            if not self.messages.apply_page(params, page):
+                params = self.messages.list_params()
+                page = await self.client.beta.threads.messages.list(thread_id=self.thread_id, **params)
+                self.messages.apply_page(params, page)
+
+    async def get_response(self, run_id: str = None):
+        self.log.debug("Getting latest assistant message.")
+        if run_id:
+            with span("openai.messages.list", run_id=run_id):
+                page = await self.client.beta.threads.messages.list(
+                    thread_id=self.thread_id, run_id=run_id, order="asc", limit=self.messages.maxsize
+                )
+            self.messages.extend(page.data)
+        else:
+            await self.sync_messages()
+
+        reply = self.messages.reply(run_id)
+        return reply.content[0].text.value if reply else None  # type: ignore
+
+    @backoff.on_exception(backoff.expo, BadRequestError, max_time=120)
+    async def send_message(self, user_input):
+        with span("assistant.send_message", thread_id=self.thread_id):
+            return await self._send_message(user_input)
+
+    async def _send_message(self, user_input):
+        self.log.debug("Sending message to assistant.")
+        # Handles are cached across messages; only keep the tool calls of the latest one
+        self.function_calls = []
+        with span("openai.messages.create"):
+            message = await self.client.beta.threads.messages.create(
+                thread_id=self.thread_id, role="user", content=user_input
+            )
+        self.messages.add(message)
+        with span("openai.runs.create"):
+            run = await self.client.beta.threads.runs.create(
+                thread_id=self.thread_id, assistant_id=self.assistant.id
+            )
+
+        # Same adaptive schedule as the RunScheduler; a sleeping coroutine is cheap.
+        interval = RUN_POLL_MIN_INTERVAL
+        while run.status not in TERMINAL_STATUSES:
+            await asyncio.sleep(interval)
+            with span("run.poll", run_id=run.id) as poll, request_priority(BACKGROUND):
+                run = await self.client.beta.threads.runs.retrieve(
+                    run_id=run.id, thread_id=self.thread_id
+                )
+                poll.set(status=run.status)
+            self.log.audit("Waiting for run to complete. Currently in: %s", run.status)
+            if run.status == "requires_action":
+                await self.process_requires_action(run)
+                interval = RUN_POLL_MIN_INTERVAL
+            else:
+                interval = min(interval * RUN_POLL_BACKOFF, RUN_POLL_MAX_INTERVAL)
+
+        if run.status == "completed":
+            self.log.debug("Run completed.")
+            return await self.get_response(run.id)
+        else:
+            raise Exception(f"Run ended with status: {run.status}")
+
+    @backoff.on_exception(backoff.expo, BadRequestError, max_time=120)
+    async def stream_message(self, user_input, on_text=None):
+        """
+        Async counterpart of `Assistant.stream_message`. `on_text` may be a plain
+        function or a coroutine function.
+        """
+        with span("assistant.stream_message", thread_id=self.thread_id):
+            return await self._stream_message(user_input, on_text)
+
+    async def _stream_message(self, user_input, on_text=None):
+        self.log.debug("Streaming message to assistant.")
+        self.function_calls = []
+        with span("openai.messages.create"):
+            message = await self.client.beta.threads.messages.create(
+                thread_id=self.thread_id, role="user", content=user_input
+            )
+        self.messages.add(message)
+        manager = self.client.beta.threads.runs.stream(
+            thread_id=self.thread_id, assistant_id=self.assistant.id
+        )
+
+        reader = RunStreamReader(self.log)
+        while manager is not None:
+            async with manager as stream:
+                async for event in stream:
+                    delta = reader.handle(event)
+                    if delta and on_text:
+                        result = on_text(delta, reader.text)
+                        if asyncio.iscoroutine(result):
+                            await result
+
+            manager = None
+            if reader.pending_run is not None:
+                pending_run, reader.pending_run = reader.pending_run, None
+                manager = self.client.beta.threads.runs.submit_tool_outputs_stream(
+                    thread_id=self.thread_id,
+                    run_id=pending_run.id,
+                    tool_outputs=await self.collect_tool_outputs(pending_run),
+                )
+
+        self.messages.extend(reader.messages)
+        if reader.status == "completed":
+            self.log.debug("Run completed.")
+            return reader.text or None
+        else:
+            raise Exception(f"Run ended with status: {reader.status}")
+
+
+class AsyncAssistantCache:
+    """
+    Async counterpart of `AssistantCache`: a bounded LRU of `AsyncAssistant` handles
+    keyed by OpenAI thread id. Use it from one event loop only.
+
+    :param openai_api_key: API key passed to new `AsyncAssistant` handles.
+    :param assistant_id: Assistant id passed to new `AsyncAssistant` handles.
+    :param maxsize: Maximum number of handles kept. Defaults to `ASSISTANT_CACHE_SIZE`.
+    """
+
+    def __init__(self, openai_api_key: str, assistant_id: str, maxsize: int = 0):
+        self.openai_api_key = openai_api_key
+        self.assistant_id = assistant_id
+        self.maxsize = maxsize or ASSISTANT_CACHE_SIZE
+        self._handles = OrderedDict()
+
+    async def get(self, thread_id: str = "") -> AsyncAssistant:
+        """Returns the handle for `thread_id`, creating it (or a new thread) if needed."""
+        assistant = self._handles.get(thread_id) if thread_id else None
+        if assistant is not None:
+            self._handles.move_to_end(thread_id)
+            return assistant
+
+        assistant = await AsyncAssistant.create(self.openai_api_key, self.assistant_id, thread_id=thread_id)
+        # Another task may have created the same thread's handle meanwhile; keep the first one.
+        assistant = self._handles.setdefault(assistant.thread_id, assistant)
+        self._handles.move_to_end(assistant.thread_id)
+        while len(self._handles) > self.maxsize:
+            self._handles.popitem(last=False)
+        return assistant
+
+    def discard(self, thread_id: str):
+        self._handles.pop(thread_id, None)
+
+    def __len__(self) -> int:
+        return len(self._handles)
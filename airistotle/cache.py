@@ -0,0 +1,275 @@
+# Built-ins
+import re
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Optional as Opt
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# AIRISTOTLE
+from .logger import GlobalLogger
+from .telemetry import METRICS
+
+CACHE_LOOKUPS = METRICS.counter(
+    "airistotle_cache_lookups_total", "Plugin cache lookups, by namespace and result (hit, disk_hit, miss, coalesced)."
+)
+CACHE_EVICTIONS = METRICS.counter(
+    "airistotle_cache_evictions_total", "Entries evicted from the in-memory plugin cache, by namespace."
+)
+TRACKING_PARAMS = re.compile(r"^(utm_.*|fbclid|gclid|mc_cid|mc_eid|ref_src)$")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases a search query and collapses whitespace and trailing punctuation."""
+    return re.sub(r"\s+", " ", query).strip().strip("?!.").lower()
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Returns a canonical form of `url`: lowercased scheme and host, no default port,
+    no fragment, no tracking parameters, and sorted query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in [("http", 80), ("https", 443)]:
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+class DiskCache:
+    """
+    SQLite file shared by all `ContentCache` namespaces, and by every process using the
+    same file. Expired entries are removed by `purge`, which `start_purging` runs on a
+    background thread; it also evicts the entries closest to expiring once the values
+    outgrow `max_bytes`.
+
+    :param path: Location of the cache database.
+    :param max_bytes: Maximum total size of the values, in characters. 0 for no limit.
+    """
+
+    def __init__(self, path, max_bytes: int = 0):
+        self.log = GlobalLogger("DiskCache")
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread = None
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, namespace: str, key: str) -> Opt[tuple]:
+        """Returns `(value, seconds_left)` for a live entry, otherwise None."""
+        row = self.connection.execute(
+            "SELECT value, expires FROM cache WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time():
+            self.connection.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+            return None
+        return row[0], row[1] - time.time()
+
+    def set(self, namespace: str, key: str, value: str, ttl: float):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+            (namespace, key, value, time.time() + ttl),
+        )
+
+    def purge(self) -> int:
+        """
+        Deletes all expired entries, then the entries closest to expiring until the rest
+        fit in `max_bytes`. Returns how many were removed.
+        """
+        # One write transaction, so entries written by other processes meanwhile are counted
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            removed = self.connection.execute("DELETE FROM cache WHERE expires < ?", (time.time(),)).rowcount
+            if self.max_bytes:
+                rows = self.connection.execute(
+                    "SELECT namespace, key, LENGTH(value) FROM cache ORDER BY expires DESC"
+                ).fetchall()
+                size = 0
+                evicted = []
+                for namespace, key, length in rows:
+                    size += length
+                    if size > self.max_bytes:
+                        evicted.append((namespace, key))
+                self.connection.executemany("DELETE FROM cache WHERE namespace = ? AND key = ?", evicted)
+                removed += len(evicted)
+        return removed
+
+    def _loop(self, interval: float):
+        while not self._stop.is_set():
+            try:
+                removed = self.purge()
+                self.log.debug("Purged %s disk cache entries.", removed)
+            except sqlite3.Error as e:
+                self.log.warning("Disk cache purge failed: %s", e)
+            self._stop.wait(interval)
+
+    def start_purging(self, interval: float):
+        """Purges the cache every `interval` seconds on a background thread; the first pass runs right away."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, args=(interval,), name="disk-cache-purge", daemon=True)
+            self._thread.start()
+
+    def stop_purging(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class ContentCache:
+    """
+    Two-tier cache for plugin results: a size-bounded in-memory LRU, optionally backed by
+    a `DiskCache`. Concurrent lookups of the same missing key are coalesced, so only
+    one caller computes the value and the others wait for it.
+
+    :param namespace: Name of the cache, e.g. the plugin name. Separates entries on disk.
+    :param ttl: Seconds an entry stays valid.
+    :param max_entries: Maximum number of entries kept in memory.
+    :param max_bytes: Maximum total size of the values kept in memory, in characters.
+    :param disk: Optional disk tier.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        max_entries: int = 1024,
+        max_bytes: int = 64_000_000,
+        disk: Opt[DiskCache] = None,
+    ):
+        self.log = GlobalLogger("ContentCache")
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk = disk
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Opt[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    CACHE_LOOKUPS.inc(namespace=self.namespace, result="hit")
+                    return value
+                self._remove(key)
+
+        if self.disk is not None:
+            try:
+                found = self.disk.get(self.namespace, key)
+            except sqlite3.Error as e:
+                self.log.warning("Disk cache lookup failed: %s", e)
+                found = None
+            if found is not None:
+                value, ttl = found
+                CACHE_LOOKUPS.inc(namespace=self.namespace, result="disk_hit")
+                self._remember(key, value, ttl)
+                return value
+
+        CACHE_LOOKUPS.inc(namespace=self.namespace, result="miss")
+        return None
+
+    def set(self, key: str, value: str):
+        self._remember(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(self.namespace, key, value, self.ttl)
+            except sqlite3.Error as e:
+                self.log.warning("Disk cache write failed: %s", e)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], str],
+        cacheable: Opt[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        Returns the cached value for `key`, or computes it with `compute()` and caches
+        it. If another thread is already computing `key`, waits for its result instead.
+        Results for which `cacheable(value)` is false are returned but not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            CACHE_LOOKUPS.inc(namespace=self.namespace, result="coalesced")
+            return future.result()
+
+        try:
+            value = compute()
+            if value and (cacheable is None or cacheable(value)):
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _remember(self, key: str, value: str, ttl: Opt[float] = None):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._size += len(value)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                CACHE_EVICTIONS.inc(namespace=self.namespace)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
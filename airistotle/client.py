@@ -0,0 +1,179 @@
+# Built-ins
+import threading
+import time
+
+from concurrent.futures import Future
+
+# Third-party
+import httpx
+import openai
+
+# AIRISTOTLE
+from .logger import GlobalLogger
+from .ratelimit import AsyncRateLimitedTransport, RateLimitedTransport, RateLimiter
+from .settings import (
+    OPENAI_BASE_URL,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_MAX_RETRIES,
+    OPENAI_REQUESTS_PER_MINUTE,
+    OPENAI_TOKENS_PER_MINUTE,
+    ASSISTANT_REFRESH_INTERVAL,
+)
+
+log = GlobalLogger("Client")
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+_async_clients = {}
+
+_rate_limiters = {}
+
+_definitions = {}
+_definitions_pending = {}  # assistant_id -> Future of the retrieve in flight
+_definitions_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_rate_limiter(openai_api_key: str) -> RateLimiter:
+    """Returns the `RateLimiter` shared by the sync and async clients of an API key."""
+    with _clients_lock:
+        limiter = _rate_limiters.get(openai_api_key)
+        if limiter is None:
+            limiter = RateLimiter(OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE)
+            _rate_limiters[openai_api_key] = limiter
+        return limiter
+
+
+def get_client(openai_api_key: str) -> openai.Client:
+    """Returns the process-wide OpenAI client for the given API key.
+
+    All callers share one client, and therefore one keep-alive connection pool, so
+    repeated requests reuse already established TLS connections. Every request goes
+    through the key's `RateLimiter`; 429 and 5xx responses are retried by the client,
+    after the limiter has held traffic for as long as the server asked.
+    """
+    limiter = get_rate_limiter(openai_api_key)
+    with _clients_lock:
+        client = _clients.get(openai_api_key)
+        if client is None:
+            log.debug("Creating shared OpenAI client.")
+            http_client = httpx.Client(
+                transport=RateLimitedTransport(limiter, httpx.HTTPTransport(limits=_limits())),
+            )
+            client = openai.Client(
+                api_key=openai_api_key,
+                base_url=OPENAI_BASE_URL,
+                http_client=http_client,
+                max_retries=OPENAI_MAX_RETRIES,
+            )
+            _clients[openai_api_key] = client
+        return client
+
+
+def get_async_client(openai_api_key: str) -> openai.AsyncClient:
+    """Returns the process-wide async OpenAI client for the given API key."""
+    limiter = get_rate_limiter(openai_api_key)
+    with _clients_lock:
+        client = _async_clients.get(openai_api_key)
+        if client is None:
+            log.debug("Creating shared async OpenAI client.")
+            http_client = httpx.AsyncClient(
+                transport=AsyncRateLimitedTransport(
+                    limiter, httpx.AsyncHTTPTransport(limits=_limits())
+                ),
+            )
+            client = openai.AsyncClient(
+                api_key=openai_api_key,
+                base_url=OPENAI_BASE_URL,
+                http_client=http_client,
+                max_retries=OPENAI_MAX_RETRIES,
+            )
+            _async_clients[openai_api_key] = client
+        return client
+
+
+def get_assistant_definition(client: openai.Client, assistant_id: str):
+    """Returns the assistant definition for `assistant_id`.
+
+    The definition is retrieved once and then served from memory until it is older
+    than `ASSISTANT_REFRESH_INTERVAL` seconds. If a refresh fails, the stale
+    definition is kept rather than failing the caller. Only one retrieve per
+    assistant is in flight at a time: while it runs, other callers get the stale
+    definition, or wait for the first one if there is none yet.
+    """
+    with _definitions_lock:
+        cached = _definitions.get(assistant_id)
+        if cached and time.monotonic() - cached[0] < ASSISTANT_REFRESH_INTERVAL:
+            return cached[1]
+        pending = _definitions_pending.get(assistant_id)
+        if pending is not None and cached:
+            return cached[1]
+        retrieving = pending is None
+        if retrieving:
+            pending = _definitions_pending[assistant_id] = Future()
+
+    if not retrieving:
+        return pending.result()
+
+    try:
+        definition = client.beta.assistants.retrieve(assistant_id=assistant_id)
+    except openai.OpenAIError as e:
+        if not cached:
+            _settle_definition(assistant_id, pending, exception=e)
+            raise
+        log.warning("Could not refresh assistant %s, using cached definition.", assistant_id)
+        definition = cached[1]
+    except BaseException as e:
+        _settle_definition(assistant_id, pending, exception=e)
+        raise
+    else:
+        log.debug("Cached assistant definition: %s", assistant_id)
+        with _definitions_lock:
+            _definitions[assistant_id] = (time.monotonic(), definition)
+
+    _settle_definition(assistant_id, pending, result=definition)
+    return definition
+
+
+def _settle_definition(assistant_id: str, pending: Future, result=None, exception=None):
+    with _definitions_lock:
+        del _definitions_pending[assistant_id]
+    if exception is not None:
+        pending.set_exception(exception)
+    else:
+        pending.set_result(result)
+
+
+async def get_async_assistant_definition(client: openai.AsyncClient, assistant_id: str):
+    """Async counterpart of `get_assistant_definition`, sharing the same cache."""
+    cached = _definitions.get(assistant_id)
+    if cached and time.monotonic() - cached[0] < ASSISTANT_REFRESH_INTERVAL:
+        return cached[1]
+
+    try:
+        definition = await client.beta.assistants.retrieve(assistant_id=assistant_id)
+    except openai.OpenAIError:
+        if not cached:
+            raise
+        log.warning("Could not refresh assistant %s, using cached definition.", assistant_id)
+        return cached[1]
+
+    log.debug("Cached assistant definition: %s", assistant_id)
+    with _definitions_lock:
+        _definitions[assistant_id] = (time.monotonic(), definition)
+    return definition
+
+
+def warm(openai_api_key: str, assistant_id: str):
+    """Opens the shared connection pool and caches the assistant definition up front."""
+    get_assistant_definition(get_client(openai_api_key), assistant_id)
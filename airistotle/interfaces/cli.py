@@ -1,6 +1,7 @@
 from ..assistant import Assistant
-from ..settings import OPENAI_API_KEY, ASSISTANT_ID
+from ..settings import OPENAI_API_KEY, ASSISTANT_ID, configure_logging
 
+configure_logging()
 assistant = Assistant(OPENAI_API_KEY, ASSISTANT_ID)
 
 while True:
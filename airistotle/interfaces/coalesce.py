@@ -0,0 +1,160 @@
+# Built-ins
+import asyncio
+import itertools
+import threading
+import time
+
+from concurrent.futures import Executor
+from typing import Callable, Optional as Opt
+
+# AIRISTOTLE
+from ..telemetry import METRICS
+
+COALESCED_MESSAGES = METRICS.counter(
+    "airistotle_slack_coalesced_messages_total", "Slack messages folded into a later message's run."
+)
+
+
+def combine(prompts: list) -> str:
+    """Joins buffered messages into the one message sent to the assistant."""
+    return "\n\n".join(prompt for prompt in prompts if prompt)
+
+
+class _Buffers:
+    """Per-conversation buffer state of `AsyncMessageCoalescer`. Callers hold its lock."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self.prompts = {}
+        self.latest = {}
+        self.arrivals = {}
+        self.active = set()
+        self.sequence = itertools.count()
+
+    def add(self, key: str, prompt: str) -> int:
+        sequence = next(self.sequence)
+        now = time.monotonic()
+        # Only a message following another one closely waits out the window; a lone one goes at once
+        burst = now - self.arrivals.get(key, float("-inf")) < self.window
+        self.arrivals[key] = now
+        if len(self.arrivals) > 1024:
+            self.arrivals = {key: at for key, at in self.arrivals.items() if now - at < self.window}
+        self.prompts.setdefault(key, []).append(prompt)
+        self.latest[key] = (sequence, now if burst else now - self.window)
+        return sequence
+
+    def wait_time(self, key: str, sequence: int) -> Opt[float]:
+        """
+        None if a newer message took over the buffer, 0 if `sequence` may send it now,
+        otherwise how long to wait before checking again (-1 for until notified).
+        """
+        # A newer message may already have taken the buffer, leaving no entry at all
+        latest, arrived = self.latest.get(key, (None, 0))
+        if latest != sequence:
+            COALESCED_MESSAGES.inc()
+            return None
+        if key in self.active:
+            return -1
+        return max(arrived + self.window - time.monotonic(), 0)
+
+    def take(self, key: str) -> list:
+        del self.latest[key]
+        self.active.add(key)
+        return self.prompts.pop(key)
+
+
+class MessageCoalescer:
+    """
+    Folds messages which arrive in the same conversation while its run is active, or
+    within `window` seconds of each other, into one message. A message arriving within
+    the window of the previous one waits for `window` seconds of quiet before it is
+    sent. Nothing blocks the caller: `add` buffers a message with the function that
+    answers it, and once the batch may go, the latest message's function is called
+    with all of them on `executor`. It must call `release` when done.
+
+    :param window: Debounce window, in seconds.
+    :param executor: Runs the answering functions.
+    """
+
+    def __init__(self, window: float, executor: Executor):
+        self.window = window
+        self.executor = executor
+        self._prompts = {}
+        self._answers = {}
+        self._due = {}
+        self._arrivals = {}
+        self._active = set()
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, prompt: str, answer: Callable[[list], None]):
+        with self._lock:
+            now = time.monotonic()
+            # Only a message following another one closely waits out the window; a lone one goes at once
+            burst = now - self._arrivals.get(key, float("-inf")) < self.window
+            self._arrivals[key] = now
+            if len(self._arrivals) > 1024:
+                self._arrivals = {key: at for key, at in self._arrivals.items() if now - at < self.window}
+            if key in self._prompts:
+                COALESCED_MESSAGES.inc()
+            self._prompts.setdefault(key, []).append(prompt)
+            self._answers[key] = answer
+            self._due[key] = now + self.window if burst else now
+            if key not in self._active:
+                self._schedule(key)
+
+    def release(self, key: str):
+        """Marks the conversation's run finished, letting the next batch go."""
+        with self._lock:
+            self._active.discard(key)
+            if key in self._prompts:
+                self._schedule(key)
+
+    def _schedule(self, key: str):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        delay = self._due[key] - time.monotonic()
+        if delay > 0:
+            timer = threading.Timer(delay, self._expire, (key,))
+            timer.daemon = True
+            self._timers[key] = timer
+            timer.start()
+            return
+        del self._due[key]
+        self._active.add(key)
+        self.executor.submit(self._answers.pop(key), self._prompts.pop(key))
+
+    def _expire(self, key: str):
+        with self._lock:
+            # A timer cancelled too late finds the batch gone, or checks the new due time
+            if key in self._prompts and key not in self._active:
+                self._schedule(key)
+
+
+class AsyncMessageCoalescer:
+    """Async counterpart of `MessageCoalescer`. Create it inside the running event loop."""
+
+    def __init__(self, window: float):
+        self._buffers = _Buffers(window)
+        self._cond = asyncio.Condition()
+
+    async def collect(self, key: str, prompt: str) -> Opt[list]:
+        async with self._cond:
+            sequence = self._buffers.add(key, prompt)
+            self._cond.notify_all()
+            while True:
+                wait = self._buffers.wait_time(key, sequence)
+                if wait is None:
+                    return None
+                if not wait:
+                    return self._buffers.take(key)
+                try:
+                    await asyncio.wait_for(self._cond.wait(), None if wait < 0 else wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, key: str):
+        async with self._cond:
+            self._buffers.active.discard(key)
+            self._cond.notify_all()
@@ -0,0 +1,39 @@
+# AIRISTOTLE
+from ..logger import GlobalLogger
+from ..storage import get_seen_events
+from ..telemetry import METRICS
+
+log = GlobalLogger("Slack Events")
+DUPLICATE_EVENTS = METRICS.counter(
+    "airistotle_slack_duplicate_events_total", "Slack event deliveries dropped as duplicates, by type."
+)
+
+
+def event_keys(body: dict) -> list:
+    """
+    Keys identifying a delivery: the event id, which Slack keeps across retries, and
+    the message's channel and timestamp, which other events about it share.
+    """
+    event = body.get("event") or {}
+    keys = []
+    if body.get("event_id"):
+        keys.append(f"event:{body['event_id']}")
+    if event.get("channel") and event.get("ts"):
+        keys.append(f"message:{event['channel']}:{event['ts']}")
+    return keys
+
+
+def first_delivery(body: dict) -> bool:
+    """
+    Returns True the first time a Slack event, or any event about the same message, is
+    delivered. Redeliveries are counted and should be dropped by the caller, instead of
+    starting a second run on the same OpenAI thread.
+    """
+    seen = get_seen_events()
+    keys = event_keys(body)
+    if seen is None or not keys or seen.claim(keys):
+        return True
+    event_type = (body.get("event") or {}).get("type", "unknown")
+    DUPLICATE_EVENTS.inc(type=event_type)
+    log.info("Dropping duplicate delivery of %s event %s.", event_type, body.get("event_id"))
+    return False
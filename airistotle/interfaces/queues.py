@@ -0,0 +1,66 @@
+# Built-ins
+import asyncio
+
+from typing import Awaitable, Callable
+
+# AIRISTOTLE
+from ..logger import GlobalLogger
+
+
+class ConversationQueues:
+    """
+    Per-conversation work queues for asyncio interfaces. Jobs submitted under the same
+    key run one at a time, in order, while jobs for different keys run concurrently up
+    to a global cap. A key's worker exits once its queue has been idle for
+    `idle_timeout` seconds.
+
+    :param max_concurrency: Maximum number of jobs running at once across all keys.
+    :param idle_timeout: Seconds an empty queue is kept around before it is dropped.
+    """
+
+    def __init__(self, max_concurrency: int, idle_timeout: float = 300):
+        self.log = GlobalLogger("ConversationQueues")
+        self.idle_timeout = idle_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queues = {}
+        self._workers = {}
+
+    def submit(self, key: str, job: Callable[[], Awaitable]):
+        """Queues `job`, a coroutine function taking no arguments, under `key`."""
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = asyncio.Queue()
+            self._workers[key] = asyncio.create_task(self._work(key, queue))
+        queue.put_nowait(job)
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    @property
+    def pending(self) -> int:
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    async def drain(self):
+        """Waits until every job submitted so far has finished."""
+        await asyncio.gather(*(queue.join() for queue in list(self._queues.values())))
+
+    async def _work(self, key: str, queue: asyncio.Queue):
+        while True:
+            try:
+                job = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                # Nothing can be queued between this check and the removal, as
+                # there is no await in between.
+                if queue.empty():
+                    del self._queues[key]
+                    del self._workers[key]
+                    return
+                continue
+
+            async with self._semaphore:
+                try:
+                    await job()
+                except Exception as e:
+                    self.log.error("Error handling job for %s: %s", key, e)
+                finally:
+                    queue.task_done()
@@ -2,99 +2,240 @@ import backoff
 import re
 import time
 import requests
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
-from tinydb import TinyDB, Query
-from ..settings import SLACK_BOT_TOKEN, SLACK_APP_TOKEN, SLACK_SIGNING_SECRET, OPENAI_API_KEY, ASSISTANT_ID, DB_LOCATION
-from ..assistant import Assistant
+from slack_sdk import WebClient
+from ..settings import SLACK_BOT_TOKEN, SLACK_APP_TOKEN, SLACK_SIGNING_SECRET, SLACK_API_URL, OPENAI_API_KEY, ASSISTANT_ID
+from ..settings import SLACK_STREAMING, SLACK_UPDATE_INTERVAL, AVAILABLE_PLUGINS, PLUGIN_WARMUP, METRICS_PORT, METRICS_HOST
+from ..settings import SLACK_COALESCE_WINDOW, SLACK_MAX_CONCURRENCY, configure_logging, get_blob_store
+from ..assistant import AssistantCache
+from ..client import warm
 from ..logger import GlobalLogger
+from ..media import known_content_type, remember_content_type, image_filename
+from ..ratelimit import DEFAULT, INTERACTIVE, request_priority
+from ..storage import get_thread_map_store, start_thread_map_maintenance
+from ..telemetry import METRICS, serve_metrics, span
+from .coalesce import MessageCoalescer, combine
+from .dedup import first_delivery
 
-app = App(token=SLACK_BOT_TOKEN, signing_secret=SLACK_SIGNING_SECRET)
+app = App(client=WebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL), signing_secret=SLACK_SIGNING_SECRET)
 handler = SocketModeHandler(app, SLACK_APP_TOKEN)
 log = GlobalLogger("Slack App")
-db = TinyDB(DB_LOCATION)
-ThreadMap = Query()
+thread_map = get_thread_map_store()
+STREAMING_PLACEHOLDER = "_Thinking..._"
+assistants = AssistantCache(OPENAI_API_KEY, ASSISTANT_ID)
+# Replies run here rather than on Bolt's listener threads, which are few
+reply_pool = ThreadPoolExecutor(SLACK_MAX_CONCURRENCY, thread_name_prefix="slack-replies")
+coalescer = MessageCoalescer(SLACK_COALESCE_WINDOW, reply_pool)
+MARKDOWN_IMAGE_REGEX = r'!\[.*?\]\((.*?)\)'
+SLACK_EVENTS = METRICS.counter("airistotle_slack_events_total", "Slack events handled, by type.")
+
+http = requests.Session()
+http.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=8))
+http.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=8))
+image_pool = ThreadPoolExecutor(8, thread_name_prefix="slack-images")
 
 def process_image_links(text, channel_id, thread_ts) -> bool:
     # Regex to capture Markdown image syntax
-    markdown_image_regex = r'!\[.*?\]\((.*?)\)'
-    markdown_images = re.findall(markdown_image_regex, text)
-    posted = False
-    for url in markdown_images:
-        if is_image_url(url):
-            try:
-                text = re.sub(r'!\[.*?\]\('+re.escape(url)+r'\)', '', text)
-                upload_image_to_slack(url, channel_id, thread_ts, text=text)
-                posted = True
-            except Exception as e:
-                log.error(f"Error processing image URL {url}: {e}")
-    return posted
-
-def is_image_url(url):
+    markdown_images = list(dict.fromkeys(re.findall(MARKDOWN_IMAGE_REGEX, text)))
+    if not markdown_images:
+        return False
+
+    # Check and download every candidate at once; non-images are dropped after their headers
+    with span("slack.images.fetch", count=len(markdown_images)):
+        fetched = [(url, image) for url, image in zip(markdown_images, image_pool.map(fetch_image, markdown_images)) if image]
+    if not fetched:
+        return False
+
+    for url, _ in fetched:
+        text = re.sub(r'!\[.*?\]\('+re.escape(url)+r'\)', '', text)
     try:
-        response = requests.head(url, allow_redirects=True, timeout=5)
-        return 'image' in response.headers.get('Content-Type', '')
-    except requests.RequestException as e:
-        log.error(f"Request error for URL {url}: {e}")
+        with span("slack.images.upload", count=len(fetched)):
+            upload_images_to_slack([image for _, image in fetched], channel_id, thread_ts, text=text)
+        return True
+    except Exception as e:
+        log.error("Error uploading images %s: %s", [url for url, _ in fetched], e)
         return False
 
-def upload_image_to_slack(url, channel_id, thread_ts, text="Image: "):
-    response = requests.get(url, timeout=5)
-    image_bytes = BytesIO(response.content)
-    upload_response = app.client.files_upload(
-        channels=channel_id, 
-        file=image_bytes, 
-        filename='image.png', 
+def fetch_image(url):
+    """
+    Returns `(content, content_type)` if `url` is an image, or None if it isn't. Images
+    in the blob store, or being prefetched into it, are read from disk. Others are
+    downloaded with a single GET, checking the headers before the body is read, and
+    stored.
+    """
+    blobs = get_blob_store()
+    if blobs is not None:
+        blob = blobs.get(url)
+        if blob is not None:
+            return blob
+    known = known_content_type(url)
+    if known is not None and 'image' not in known:
+        return None
+    try:
+        with http.get(url, allow_redirects=True, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            content_type = known or response.headers.get('Content-Type', '')
+            remember_content_type(url, content_type)
+            if 'image' not in content_type:
+                return None
+            if blobs is not None:
+                blobs.put(response.content, content_type, url=url)
+            return response.content, content_type
+    except requests.RequestException as e:
+        log.error("Request error for URL %s: %s", url, e)
+        return None
+
+def upload_images_to_slack(images, channel_id, thread_ts, text="Image: "):
+    """Posts `(content, content_type)` images to the thread in a single upload."""
+    upload_response = app.client.files_upload_v2(
+        channel=channel_id,
+        file_uploads=[
+            {"content": content, "filename": image_filename(content_type, index)}
+            for index, (content, content_type) in enumerate(images)
+        ],
         thread_ts=thread_ts,
         initial_comment=text
     )
     if upload_response["ok"]:
-        return upload_response['file']['permalink']
+        return [file['permalink'] for file in upload_response['files']]
     else:
         raise Exception("Failed to upload image to Slack")
 
 @app.event("app_mention")
-def handle_app_mention(event, say):
+def handle_app_mention(event, say, body):
+    if not first_delivery(body):
+        return
     log.debug("Handling app mention.")
+    SLACK_EVENTS.inc(type="app_mention")
     prompt = re.sub(r"(?:\s)<@[^, ]*|(?:^)<@[^, ]*", "", event.get("text", ""))
     thread_ts = event.get("thread_ts") or event.get("ts")
     channel_id = event['channel']
 
-    response = get_response_from_assistant(prompt, thread_ts)
-    posted_image = process_image_links(response, channel_id, thread_ts)
-    if not posted_image:
-        post_message(response, channel_id, thread_ts, say)
+    queue_reply(prompt, channel_id, thread_ts, say)
 
 
 @app.event("message")
-def handle_message(event, say, context):
+def handle_message(event, say, context, body):
     # Filter out messages that are not direct messages
-    if event.get("channel_type") == "im":
+    if event.get("channel_type") == "im" and first_delivery(body):
         log.debug("Handling DM.")
+        SLACK_EVENTS.inc(type="im")
         thread_ts = event.get("ts")  # In DMs, the thread_ts is just the timestamp of the message
         channel_id = event['channel']
 
         # Direct messages don't require removal of @ mention, so we can use the text directly
         prompt = event.get("text", "")
 
-        response = get_response_from_assistant(prompt, thread_ts)
-        posted_image = process_image_links(response, channel_id, thread_ts)
-        if not posted_image:
-            post_message(response, channel_id, thread_ts, say)
+        # Someone is waiting on the other end of a DM; let its OpenAI calls go first
+        queue_reply(prompt, channel_id, thread_ts, say, priority=INTERACTIVE)
+
+def queue_reply(prompt, channel_id, thread_ts, say, priority=DEFAULT):
+    """
+    Buffers the message with any others arriving in the thread while its run is active,
+    or in quick succession, and answers them all at once on the reply pool.
+    """
+    def answer(prompts):
+        try:
+            respond(combine(prompts), channel_id, thread_ts, say, priority=priority)
+        except Exception as e:
+            # Nobody waits on the reply pool's futures
+            log.error("Failed to answer in thread %s: %s", thread_ts, e)
+    coalescer.add(thread_ts, prompt, answer)
+
+def respond(prompt, channel_id, thread_ts, say, priority=DEFAULT):
+    try:
+        with span("slack.respond", channel=channel_id, streaming=SLACK_STREAMING), request_priority(priority):
+            if SLACK_STREAMING:
+                stream_response(prompt, channel_id, thread_ts, say)
+                return
+
+            response = get_response_from_assistant(prompt, thread_ts)
+            posted_image = process_image_links(response, channel_id, thread_ts)
+            if not posted_image:
+                post_message(response, channel_id, thread_ts, say)
+    finally:
+        # Lets the messages that arrived meanwhile go, as one batch
+        coalescer.release(thread_ts)
+
+def stream_response(prompt, channel_id, thread_ts, say):
+    """Posts a placeholder reply and edits it in place as the assistant's reply streams in."""
+    with span("slack.post", placeholder=True):
+        placeholder = say({"text": STREAMING_PLACEHOLDER, "channel": channel_id, "thread_ts": str(thread_ts), "reply_broadcast": False})
+    updater = ThrottledUpdater(channel_id, placeholder["ts"], SLACK_UPDATE_INTERVAL)
+    try:
+        response = get_response_from_assistant(prompt, thread_ts, on_text=updater)
+    except Exception:
+        updater.flush("Sorry, something went wrong while answering.")
+        raise
+
+    if process_image_links(response or "", channel_id, thread_ts):
+        app.client.chat_delete(channel=channel_id, ts=placeholder["ts"])
+    else:
+        updater.flush(response)
+
+class ThrottledUpdater:
+    """
+    Callback for `Assistant.stream_message` which edits a posted Slack message with the
+    reply so far, at most once every `interval` seconds to stay under Slack's rate limits.
+    """
+
+    def __init__(self, channel_id, ts, interval):
+        self.channel_id = channel_id
+        self.ts = ts
+        self.interval = interval
+        self.last_update = 0.0
+        self.last_text = STREAMING_PLACEHOLDER
+
+    def __call__(self, delta, text):
+        if time.monotonic() - self.last_update >= self.interval:
+            self.update(text + " ...")
+
+    def update(self, text):
+        if not text or text == self.last_text:
+            return
+        try:
+            with span("slack.update"):
+                app.client.chat_update(channel=self.channel_id, ts=self.ts, text=text)
+            self.last_text = text
+        except Exception as e:
+            log.warning("Could not update streamed message: %s", e)
+        self.last_update = time.monotonic()
+
+    def flush(self, text):
+        self.update(text or "I don't have a response for that.")
 
 @backoff.on_exception(backoff.expo, ValueError, max_time=30)
-def get_response_from_assistant(prompt, thread_ts):
-    mappings = db.search(ThreadMap.slack_thread_id == thread_ts)
-    log.debug(f"Found mappings: {mappings}")
-    assistant = Assistant(OPENAI_API_KEY, ASSISTANT_ID, thread_id=mappings[0]["openai_thread_id"]) if mappings else Assistant(OPENAI_API_KEY, ASSISTANT_ID)
-    if not mappings:
-        db.insert({"slack_thread_id": thread_ts, "openai_thread_id": assistant.thread_id, "last_message_time": time.time()})
+def get_response_from_assistant(prompt, thread_ts, on_text=None):
+    with span("mapping.lookup"):
+        mapping = thread_map.get(thread_ts)
+    log.debug("Found mapping: %s", mapping)
+    with span("assistant.init"):
+        assistant = assistants.get(mapping["openai_thread_id"] if mapping else "")
+    if not mapping:
+        with span("mapping.put"):
+            thread_map.put(thread_ts, assistant.thread_id, time.time())
+    else:
+        with span("mapping.touch"):
+            thread_map.touch(thread_ts, time.time())
+    if on_text:
+        return assistant.stream_message(prompt, on_text=on_text)
     return assistant.send_message(prompt)
 
 def post_message(text, channel_id, thread_ts, say_function):
-    say_function({"text": text, "channel": channel_id, "thread_ts": str(thread_ts), "reply_broadcast": False})
+    with span("slack.post"):
+        say_function({"text": text, "channel": channel_id, "thread_ts": str(thread_ts), "reply_broadcast": False})
 
 def run():
+    configure_logging()
     log.info("Starting Slack App.")
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT, METRICS_HOST)
+    start_thread_map_maintenance(on_expired=lambda record: assistants.discard(record["openai_thread_id"]))
+    warm(OPENAI_API_KEY, ASSISTANT_ID)
+    get_blob_store()
+    if PLUGIN_WARMUP:
+        AVAILABLE_PLUGINS.warm()
     handler.start()
@@ -0,0 +1,265 @@
+import asyncio
+import re
+import time
+import aiohttp
+import backoff
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from slack_sdk.web.async_client import AsyncWebClient
+from ..settings import SLACK_BOT_TOKEN, SLACK_APP_TOKEN, SLACK_SIGNING_SECRET, SLACK_API_URL, OPENAI_API_KEY, ASSISTANT_ID
+from ..settings import SLACK_STREAMING, SLACK_UPDATE_INTERVAL, SLACK_MAX_CONCURRENCY, SLACK_QUEUE_IDLE_TIMEOUT, SLACK_COALESCE_WINDOW
+from ..settings import AVAILABLE_PLUGINS, PLUGIN_WARMUP, METRICS_PORT, METRICS_HOST, configure_logging, get_blob_store
+from ..async_assistant import AsyncAssistantCache
+from ..client import get_async_client, get_async_assistant_definition
+from ..logger import GlobalLogger
+from ..media import known_content_type, remember_content_type, image_filename
+from ..ratelimit import DEFAULT, INTERACTIVE, request_priority
+from ..storage import get_thread_map_store, start_thread_map_maintenance
+from ..telemetry import METRICS, serve_metrics, span
+from .coalesce import AsyncMessageCoalescer, combine
+from .dedup import first_delivery
+from .queues import ConversationQueues
+
+app = AsyncApp(client=AsyncWebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL), signing_secret=SLACK_SIGNING_SECRET)
+log = GlobalLogger("Async Slack App")
+thread_map = get_thread_map_store()
+assistants = AsyncAssistantCache(OPENAI_API_KEY, ASSISTANT_ID)
+STREAMING_PLACEHOLDER = "_Thinking..._"
+MARKDOWN_IMAGE_REGEX = r'!\[.*?\]\((.*?)\)'
+SLACK_EVENTS = METRICS.counter("airistotle_slack_events_total", "Slack events handled, by type.")
+
+# Created inside the running event loop, see start()
+queues = None
+http = None
+coalescer = None
+_collecting = set()
+
+async def process_image_links(text, channel_id, thread_ts) -> bool:
+    markdown_images = list(dict.fromkeys(re.findall(MARKDOWN_IMAGE_REGEX, text)))
+    if not markdown_images:
+        return False
+
+    with span("slack.images.fetch", count=len(markdown_images)):
+        images = await asyncio.gather(*[fetch_image(url) for url in markdown_images])
+    fetched = [(url, image) for url, image in zip(markdown_images, images) if image]
+    if not fetched:
+        return False
+
+    for url, _ in fetched:
+        text = re.sub(r'!\[.*?\]\('+re.escape(url)+r'\)', '', text)
+    try:
+        with span("slack.images.upload", count=len(fetched)):
+            await upload_images_to_slack([image for _, image in fetched], channel_id, thread_ts, text=text)
+        return True
+    except Exception as e:
+        log.error("Error uploading images %s: %s", [url for url, _ in fetched], e)
+        return False
+
+async def fetch_image(url):
+    """Async counterpart of `slack.fetch_image`."""
+    blobs = get_blob_store()
+    if blobs is not None:
+        pending = blobs.pending(url)
+        if pending is not None:
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(pending), blobs.fetch_timeout)
+            except Exception:
+                pass  # Logged by the prefetch; download it below instead
+        blob = blobs.get(url, wait=False)
+        if blob is not None:
+            return blob
+    known = known_content_type(url)
+    if known is not None and 'image' not in known:
+        return None
+    try:
+        async with http.get(url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=30)) as response:
+            response.raise_for_status()
+            content_type = known or response.headers.get('Content-Type', '')
+            remember_content_type(url, content_type)
+            if 'image' not in content_type:
+                return None
+            content = await response.read()
+            if blobs is not None:
+                await asyncio.to_thread(blobs.put, content, content_type, url)
+            return content, content_type
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        log.error("Request error for URL %s: %s", url, e)
+        return None
+
+async def upload_images_to_slack(images, channel_id, thread_ts, text="Image: "):
+    upload_response = await app.client.files_upload_v2(
+        channel=channel_id,
+        file_uploads=[
+            {"content": content, "filename": image_filename(content_type, index)}
+            for index, (content, content_type) in enumerate(images)
+        ],
+        thread_ts=thread_ts,
+        initial_comment=text
+    )
+    if upload_response["ok"]:
+        return [file['permalink'] for file in upload_response['files']]
+    else:
+        raise Exception("Failed to upload image to Slack")
+
+@app.event("app_mention")
+async def handle_app_mention(event, say, body):
+    # The dedup and thread map stores are SQLite; keep their locks off the event loop
+    if not await asyncio.to_thread(first_delivery, body):
+        return
+    log.debug("Handling app mention.")
+    SLACK_EVENTS.inc(type="app_mention")
+    prompt = re.sub(r"(?:\s)<@[^, ]*|(?:^)<@[^, ]*", "", event.get("text", ""))
+    thread_ts = event.get("thread_ts") or event.get("ts")
+    channel_id = event['channel']
+
+    # Return straight away so the event is acked; the reply is produced by the
+    # conversation's queue worker, in order with the thread's other messages.
+    queue_reply(prompt, channel_id, thread_ts, say)
+
+
+@app.event("message")
+async def handle_message(event, say, context, body):
+    # Filter out messages that are not direct messages
+    if event.get("channel_type") == "im" and await asyncio.to_thread(first_delivery, body):
+        log.debug("Handling DM.")
+        SLACK_EVENTS.inc(type="im")
+        thread_ts = event.get("ts")  # In DMs, the thread_ts is just the timestamp of the message
+        channel_id = event['channel']
+
+        # Direct messages don't require removal of @ mention, so we can use the text directly
+        prompt = event.get("text", "")
+
+        # Someone is waiting on the other end of a DM; let its OpenAI calls go first
+        queue_reply(prompt, channel_id, thread_ts, say, priority=INTERACTIVE)
+
+def queue_reply(prompt, channel_id, thread_ts, say, priority=DEFAULT):
+    """
+    Buffers the message with any others arriving in the thread while its run is active,
+    or in quick succession, and queues a single reply to them all.
+    """
+    async def collect():
+        prompts = await coalescer.collect(thread_ts, prompt)
+        if prompts is not None:
+            queues.submit(thread_ts, lambda: respond(combine(prompts), channel_id, thread_ts, say, priority=priority))
+        else:
+            log.debug("Message folded into a later one in the thread.")
+    task = asyncio.create_task(collect())
+    _collecting.add(task)
+    task.add_done_callback(_collecting.discard)
+
+async def respond(prompt, channel_id, thread_ts, say, priority=DEFAULT):
+    try:
+        with span("slack.respond", channel=channel_id, streaming=SLACK_STREAMING), request_priority(priority):
+            if SLACK_STREAMING:
+                await stream_response(prompt, channel_id, thread_ts, say)
+                return
+
+            response = await get_response_from_assistant(prompt, thread_ts)
+            posted_image = await process_image_links(response or "", channel_id, thread_ts)
+            if not posted_image:
+                await post_message(response, channel_id, thread_ts, say)
+    finally:
+        # Lets the messages that arrived meanwhile go, as one batch
+        await coalescer.release(thread_ts)
+
+async def stream_response(prompt, channel_id, thread_ts, say):
+    """Posts a placeholder reply and edits it in place as the assistant's reply streams in."""
+    with span("slack.post", placeholder=True):
+        placeholder = await say({"text": STREAMING_PLACEHOLDER, "channel": channel_id, "thread_ts": str(thread_ts), "reply_broadcast": False})
+    updater = ThrottledUpdater(channel_id, placeholder["ts"], SLACK_UPDATE_INTERVAL)
+    try:
+        response = await get_response_from_assistant(prompt, thread_ts, on_text=updater)
+    except Exception:
+        await updater.flush("Sorry, something went wrong while answering.")
+        raise
+
+    if await process_image_links(response or "", channel_id, thread_ts):
+        await app.client.chat_delete(channel=channel_id, ts=placeholder["ts"])
+    else:
+        await updater.flush(response)
+
+class ThrottledUpdater:
+    """Async counterpart of `slack.ThrottledUpdater`."""
+
+    def __init__(self, channel_id, ts, interval):
+        self.channel_id = channel_id
+        self.ts = ts
+        self.interval = interval
+        self.last_update = 0.0
+        self.last_text = STREAMING_PLACEHOLDER
+
+    async def __call__(self, delta, text):
+        if time.monotonic() - self.last_update >= self.interval:
+            await self.update(text + " ...")
+
+    async def update(self, text):
+        if not text or text == self.last_text:
+            return
+        try:
+            with span("slack.update"):
+                await app.client.chat_update(channel=self.channel_id, ts=self.ts, text=text)
+            self.last_text = text
+        except Exception as e:
+            log.warning("Could not update streamed message: %s", e)
+        self.last_update = time.monotonic()
+
+    async def flush(self, text):
+        await self.update(text or "I don't have a response for that.")
+
+@backoff.on_exception(backoff.expo, ValueError, max_time=30)
+async def get_response_from_assistant(prompt, thread_ts, on_text=None):
+    with span("mapping.lookup"):
+        mapping = await asyncio.to_thread(thread_map.get, thread_ts)
+    log.debug("Found mapping: %s", mapping)
+    with span("assistant.init"):
+        assistant = await assistants.get(mapping["openai_thread_id"] if mapping else "")
+    if not mapping:
+        with span("mapping.put"):
+            await asyncio.to_thread(thread_map.put, thread_ts, assistant.thread_id, time.time())
+    else:
+        with span("mapping.touch"):
+            await asyncio.to_thread(thread_map.touch, thread_ts, time.time())
+    if on_text:
+        return await assistant.stream_message(prompt, on_text=on_text)
+    return await assistant.send_message(prompt)
+
+async def post_message(text, channel_id, thread_ts, say_function):
+    with span("slack.post"):
+        await say_function({"text": text, "channel": channel_id, "thread_ts": str(thread_ts), "reply_broadcast": False})
+
+async def start(metrics_port=METRICS_PORT):
+    """Sets up what handling events needs; must run inside the event loop that will handle them."""
+    global queues, http, coalescer
+    queues = ConversationQueues(SLACK_MAX_CONCURRENCY, idle_timeout=SLACK_QUEUE_IDLE_TIMEOUT)
+    http = aiohttp.ClientSession()
+    coalescer = AsyncMessageCoalescer(SLACK_COALESCE_WINDOW)
+    if metrics_port:
+        serve_metrics(metrics_port, METRICS_HOST)
+    await get_async_assistant_definition(get_async_client(OPENAI_API_KEY), ASSISTANT_ID)
+    # Opening it scans the blob directory
+    await asyncio.to_thread(get_blob_store)
+    if PLUGIN_WARMUP:
+        AVAILABLE_PLUGINS.warm()
+
+async def stop():
+    """Waits for the replies already queued, then closes the HTTP session."""
+    await asyncio.gather(*_collecting)
+    await queues.drain()
+    await http.close()
+
+async def main():
+    loop = asyncio.get_running_loop()
+    # Expiry runs on the maintenance thread; the handle cache belongs to the event loop
+    start_thread_map_maintenance(
+        on_expired=lambda record: loop.call_soon_threadsafe(assistants.discard, record["openai_thread_id"])
+    )
+    await start()
+    try:
+        await AsyncSocketModeHandler(app, SLACK_APP_TOKEN).start_async()
+    finally:
+        await http.close()
+
+def run():
+    configure_logging()
+    log.info("Starting async Slack App.")
+    asyncio.run(main())
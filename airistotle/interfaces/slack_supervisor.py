@@ -0,0 +1,265 @@
+"""
+Multi-process Slack interface. The supervisor process owns the Socket Mode
+connection: it acknowledges every event straight away and hands it to one of
+`SLACK_WORKERS` worker processes, picked by a hash of the event's Slack thread, so a
+conversation is always answered by the same worker, in order. Workers run the
+`slack_async` event handlers without a socket of their own and share the thread map,
+caches and blob store through their files.
+
+    from airistotle.interfaces import slack_supervisor
+    slack_supervisor.run()
+"""
+
+# Built-ins
+import asyncio
+import collections
+import multiprocessing
+import signal
+import threading
+import time
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Third-party
+from slack_sdk import WebClient
+from slack_sdk.socket_mode import SocketModeClient
+from slack_sdk.socket_mode.response import SocketModeResponse
+
+# AIRISTOTLE
+from ..logger import GlobalLogger
+from ..settings import SLACK_BOT_TOKEN, SLACK_APP_TOKEN, SLACK_API_URL, THREAD_MAP_BACKEND, METRICS_PORT, METRICS_HOST
+from ..settings import (
+    SLACK_WORKERS,
+    SLACK_WORKER_HEALTH_INTERVAL,
+    SLACK_WORKER_HEALTH_TIMEOUT,
+    SLACK_WORKER_DRAIN_TIMEOUT,
+)
+from ..settings import configure_logging
+from ..storage import start_thread_map_maintenance
+from ..telemetry import METRICS, serve_metrics
+
+log = GlobalLogger("Slack Supervisor")
+WORKERS_ALIVE = METRICS.gauge("airistotle_slack_workers_alive", "Worker processes currently running.")
+WORKER_RESTARTS = METRICS.counter("airistotle_slack_worker_restarts_total", "Worker processes restarted, by reason.")
+DISPATCHED = METRICS.counter("airistotle_slack_events_dispatched_total", "Slack events handed to workers, by worker.")
+
+
+def routing_key(body: dict) -> str:
+    """The Slack thread an event belongs to, as the handlers key conversations."""
+    event = body.get("event") or {}
+    return event.get("thread_ts") or event.get("ts") or body.get("event_id", "")
+
+
+def worker_main(index: int, inbox, received, heartbeat):
+    """Entry point of a worker process."""
+    # The supervisor decides when workers stop, and drains them first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    configure_logging()
+    asyncio.run(_work(index, inbox, received, heartbeat))
+
+
+async def _work(index: int, inbox, received, heartbeat):
+    from slack_bolt.request.async_request import AsyncBoltRequest
+
+    from . import slack_async
+
+    worker_log = GlobalLogger(f"Slack Worker {index}")
+    beat = asyncio.create_task(_beat(heartbeat))
+    await slack_async.start(metrics_port=METRICS_PORT + 1 + index if METRICS_PORT else 0)
+    worker_log.info("Worker ready.")
+
+    loop = asyncio.get_running_loop()
+    reader = ThreadPoolExecutor(1, thread_name_prefix="worker-inbox")
+    while True:
+        item = await loop.run_in_executor(reader, inbox.get)
+        if item is None:
+            break
+        sequence, body = item
+        received.value = sequence
+        await slack_async.app.async_dispatch(AsyncBoltRequest(body=body, mode="socket_mode"))
+
+    worker_log.info("Draining.")
+    await slack_async.stop()
+    beat.cancel()
+    worker_log.info("Worker stopped.")
+
+
+async def _beat(heartbeat):
+    # Stops updating if the event loop is blocked, which the supervisor takes as a hang
+    while True:
+        heartbeat.value = time.time()
+        await asyncio.sleep(1)
+
+
+class Supervisor:
+    """
+    Starts, watches and stops the worker processes, and routes events to them.
+
+    Every event is numbered per worker and kept until the worker has taken it off its
+    inbox, so when a worker dies the events still waiting for it are passed to its
+    replacement rather than lost. A worker whose process has exited, or whose
+    heartbeat is older than `health_timeout` seconds, is replaced.
+
+    :param workers: Number of worker processes.
+    :param health_interval: Seconds between health checks.
+    :param health_timeout: Seconds without a heartbeat after which a worker is killed.
+    :param drain_timeout: Seconds workers get to finish their queued replies on shutdown.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        health_interval: float = 5,
+        health_timeout: float = 30,
+        drain_timeout: float = 120,
+    ):
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.drain_timeout = drain_timeout
+        self.context = multiprocessing.get_context("spawn")
+        # Written by one process each and read by the other, so no locks; a worker
+        # killed while holding one would otherwise take the supervisor down with it
+        self.received = [self.context.Value("q", 0, lock=False) for _ in range(workers)]
+        self.heartbeats = [self.context.Value("d", 0.0, lock=False) for _ in range(workers)]
+        self.inboxes = [None] * workers
+        self.processes = [None] * workers
+        self._unreceived = [collections.deque() for _ in range(workers)]
+        self._sequence = [0] * workers
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._monitor = threading.Thread(target=self._watch, name="worker-monitor", daemon=True)
+
+    def start(self):
+        for index in range(len(self.processes)):
+            self._install(index, *self._spawn(index))
+        self._monitor.start()
+        log.info("Started %s workers.", len(self.processes))
+
+    def _spawn(self, index: int) -> tuple:
+        """Starts a worker process for slot `index` and returns its inbox and process."""
+        # A fresh inbox each time: a process killed while reading one can leave it locked
+        inbox = self.context.Queue()
+        self.heartbeats[index].value = time.time()
+        process = self.context.Process(
+            target=worker_main,
+            args=(index, inbox, self.received[index], self.heartbeats[index]),
+            name=f"airistotle-worker-{index}",
+        )
+        process.start()
+        return inbox, process
+
+    def _install(self, index: int, inbox, process):
+        """Routes slot `index` to a started worker, passing it the events its predecessor never took."""
+        with self._lock:
+            previous, self.inboxes[index] = self.inboxes[index], inbox
+            self.processes[index] = process
+            unreceived = self._unreceived[index]
+            while unreceived and unreceived[0][0] <= self.received[index].value:
+                unreceived.popleft()
+            for item in unreceived:
+                inbox.put(item)
+            if self._stopping.is_set():
+                # Draining began while the worker started up
+                inbox.put(None)
+        if previous is not None:
+            # Nobody reads it any more; don't let its feeder thread hold up exiting
+            previous.cancel_join_thread()
+            previous.close()
+        if unreceived:
+            log.info("Passed %s waiting events to the new worker %s.", len(unreceived), index)
+
+    def dispatch(self, body: dict):
+        """Queues an Events API payload on the worker owning its Slack thread."""
+        index = zlib.crc32(routing_key(body).encode()) % len(self.processes)
+        with self._lock:
+            self._sequence[index] += 1
+            item = (self._sequence[index], body)
+            unreceived = self._unreceived[index]
+            while unreceived and unreceived[0][0] <= self.received[index].value:
+                unreceived.popleft()
+            unreceived.append(item)
+            self.inboxes[index].put(item)
+        DISPATCHED.inc(worker=str(index))
+
+    def check(self):
+        """Replaces workers which have exited or stopped sending heartbeats."""
+        # Events keep flowing to the other workers, and queue up for this one, while
+        # it is replaced; only swapping in the new worker takes the dispatch lock
+        for index, process in enumerate(list(self.processes)):
+            if self._stopping.is_set():
+                return
+            if not process.is_alive():
+                reason = "exited"
+                log.error("Worker %s exited with code %s; restarting it.", index, process.exitcode)
+            elif time.time() - self.heartbeats[index].value > self.health_timeout:
+                reason = "unresponsive"
+                log.error("Worker %s sent no heartbeat for %gs; restarting it.", index, self.health_timeout)
+                process.kill()
+                process.join(5)
+            else:
+                continue
+            WORKER_RESTARTS.inc(reason=reason)
+            self._install(index, *self._spawn(index))
+        WORKERS_ALIVE.set(sum(process.is_alive() for process in self.processes))
+
+    def _watch(self):
+        while not self._stopping.wait(self.health_interval):
+            try:
+                self.check()
+            except Exception as e:
+                log.error("Worker health check failed: %s", e)
+
+    def drain(self):
+        """Stops the workers once they have answered everything already queued."""
+        with self._lock:
+            self._stopping.set()
+            for inbox in self.inboxes:
+                inbox.put(None)
+        log.info("Draining workers, for up to %gs.", self.drain_timeout)
+        deadline = time.monotonic() + self.drain_timeout
+        for index, process in enumerate(self.processes):
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                log.warning("Worker %s did not finish in time; terminating it.", index)
+                process.terminate()
+                process.join(5)
+        WORKERS_ALIVE.set(0)
+
+
+def run():
+    configure_logging()
+    log.info("Starting Slack supervisor.")
+    if THREAD_MAP_BACKEND == "tinydb":
+        raise ValueError("Worker processes can't share a TinyDB thread map; use the SQLite backend.")
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT, METRICS_HOST)
+    # Once for all workers, rather than once per worker
+    start_thread_map_maintenance()
+
+    supervisor = Supervisor(
+        SLACK_WORKERS,
+        health_interval=SLACK_WORKER_HEALTH_INTERVAL,
+        health_timeout=SLACK_WORKER_HEALTH_TIMEOUT,
+        drain_timeout=SLACK_WORKER_DRAIN_TIMEOUT,
+    )
+    supervisor.start()
+
+    def on_request(client: SocketModeClient, request):
+        client.send_socket_mode_response(SocketModeResponse(envelope_id=request.envelope_id))
+        if request.type == "events_api":
+            supervisor.dispatch(request.payload)
+
+    client = SocketModeClient(app_token=SLACK_APP_TOKEN, web_client=WebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL))
+    client.socket_mode_request_listeners.append(on_request)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+    client.connect()
+    stopped.wait()
+
+    log.info("Shutting down; no longer accepting events.")
+    client.close()
+    supervisor.drain()
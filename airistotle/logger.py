@@ -12,7 +12,12 @@ through different modules of a larger project.
 """
 
 # Standard library imports
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import threading
 import traceback
 
 # Third Party Imports
@@ -27,39 +32,51 @@ class LogFormatter(logging.Formatter):
     """
     Custom formatter that adds color to log messages based on the log level.
     Adds an additional style for level 5 messages (AUDIT in the GlobalLogger class).
+    Keeps one precompiled formatter per level, so formatting never mutates shared
+    state and is safe across threads.
 
     :param record: Log record to format.
     """
 
+    FORMATS = {
+        5: f"{Fore.MAGENTA}[#] %(asctime)s - %(name)s - %(levelname)s : %(message)s",
+        10: f"{Fore.LIGHTMAGENTA_EX}[%%] %(asctime)s - %(name)s - %(levelname)s : %(message)s",
+        20: f"{Fore.LIGHTWHITE_EX}[*] %(asctime)s - %(name)s - %(levelname)s : %(message)s",
+        30: f"{Fore.LIGHTYELLOW_EX}[!] %(asctime)s - %(name)s - %(levelname)s : %(message)s",
+        40: f"{Fore.LIGHTRED_EX}[X] %(asctime)s - %(name)s - %(levelname)s : %(message)s",
+        # We'll use a cross here because if you see a critical error only the gods can help you
+        50: f"{Fore.RED}[†] %(asctime)s - %(name)s - %(levelname)s : %(message)s",
+    }
+
     def __init__(self):
         """Initializes the formatter, initializes colorama."""
         super().__init__(fmt="%(message)s", datefmt=None, style="%")
         colorama.init(autoreset=True)  # Auto reverts line colors to default
+        self._formatters = {
+            level: logging.Formatter(fmt=fmt, style="%") for level, fmt in self.FORMATS.items()
+        }
 
     def format(self, record: logging.LogRecord) -> str:
         """Overrides the format method of the logging.Formatter class. Adds color and per-level formatting."""
-        format_orig = self._style._fmt
-
-        if record.levelno == 5:
-            self._style._fmt = f"{Fore.MAGENTA}[#] %(asctime)s - %(name)s - %(levelname)s : %(message)s"
-        elif record.levelno == 10:
-            self._style._fmt = f"{Fore.LIGHTMAGENTA_EX}[%%] %(asctime)s - %(name)s - %(levelname)s : %(message)s"
-        elif record.levelno == 20:
-            self._style._fmt = f"{Fore.LIGHTWHITE_EX}[*] %(asctime)s - %(name)s - %(levelname)s : %(message)s"
-        elif record.levelno == 30:
-            self._style._fmt = f"{Fore.LIGHTYELLOW_EX}[!] %(asctime)s - %(name)s - %(levelname)s : %(message)s"
-        elif record.levelno == 40:
-            self._style._fmt = f"{Fore.LIGHTRED_EX}[X] %(asctime)s - %(name)s - %(levelname)s : %(message)s"
-        elif record.levelno == 50:
-            # We'll use a cross here because if you see a critical error only the gods can help you
-            self._style._fmt = (
-                f"{Fore.RED}[†] %(asctime)s - %(name)s - %(levelname)s : %(message)s"
-            )
+        formatter = self._formatters.get(record.levelno)
+        if formatter is None:
+            return logging.Formatter.format(self, record)
+        return formatter.format(record)
+
 
-        result = logging.Formatter.format(self, record)
-        self._style._fmt = format_orig
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single line of JSON, for log shippers."""
 
-        return result
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
 
 
 class GlobalLogger(logging.Logger):
@@ -71,6 +88,15 @@ class GlobalLogger(logging.Logger):
     Adds a custom AUDIT level to the logger, which is treated as being one level
     below DEBUG.
 
+    Loggers are cached by name, so instantiating the same name twice returns the same
+    logger. Only the base logger owns handlers; every other logger propagates to it
+    (plus a file handler of its own if it names a different log file). Call
+    `use_queue()` to hand records to a background thread instead of writing them on
+    the caller's thread.
+
+    Pass arguments separately (`log.debug("Got %s", value)`) rather than as f-strings
+    on hot paths, so messages are only built when their level is enabled.
+
     :param name: Name of the logger. Defaults to the name of the base logger.
     :param level: Logging level. Defaults to the level of the base logger.
     :param log_file: Path to the log file. If provided, will create a file handler.
@@ -81,6 +107,10 @@ class GlobalLogger(logging.Logger):
     logging.addLevelName(5, "AUDIT")
 
     _base_logger = None
+    _loggers = {}
+    _file_handlers = {}
+    _listener = None
+    _lock = threading.RLock()
 
     _defaults = {
         "name": "GlobalLogger",
@@ -96,28 +126,43 @@ class GlobalLogger(logging.Logger):
         log_file: Opt[str] = None,
         formatter: Opt[logging.Formatter] = None,
     ):
+        if getattr(self, "_initialized", False):
+            return
+
         self.__set_parameters(
             name=name, level=level, log_file=log_file, formatter=formatter
         )
         super().__init__(self.name, self.level)
 
-        # Setup file handling if a log file is specified.
-        if self.log_file:  # type: ignore
-            self.fhandler = logging.FileHandler(self.log_file)  # type: ignore
-            self.fhandler.setFormatter(self.formatter)  # type: ignore
+        if self is not self.__class__._base_logger:
+            self.parent = self.__class__._base_logger
+        else:
+            self.shandler = logging.StreamHandler()
+            self.shandler.setFormatter(self.formatter)  # type: ignore
+            self.addHandler(self.shandler)
+
+        # Setup file handling if a log file is specified, and not already handled by the base logger.
+        if self.log_file and (  # type: ignore
+            self is self.__class__._base_logger
+            or self.log_file != self.__class__._base_logger.log_file  # type: ignore
+        ):
+            self.fhandler = self.__file_handler(self.log_file, self.formatter)  # type: ignore
             self.addHandler(self.fhandler)
 
-        self.shandler = logging.StreamHandler()
-        self.shandler.setFormatter(self.formatter)  # type: ignore
-        self.addHandler(self.shandler)
+        self._initialized = True
 
-    def __new__(cls, *args, **kwargs) -> "GlobalLogger":
-        new_logger = super().__new__(cls)
-        if cls._base_logger:
-            new_logger.parent = cls._base_logger
-        else:
-            cls._base_logger = new_logger
-        return new_logger
+    def __new__(cls, name: Opt[str] = None, *args, **kwargs) -> "GlobalLogger":
+        with cls._lock:
+            key = name or (cls._base_logger.name if cls._base_logger else cls._defaults["name"])
+            existing = cls._loggers.get(key)
+            if existing is not None:
+                return existing
+
+            new_logger = super().__new__(cls)
+            if not cls._base_logger:
+                cls._base_logger = new_logger
+            cls._loggers[key] = new_logger
+            return new_logger
 
     def __set_parameters(self, **kwargs):
         for key, value in kwargs.items():
@@ -128,10 +173,51 @@ class GlobalLogger(logging.Logger):
             else:
                 setattr(self, key, self._defaults[key])
 
+    @classmethod
+    def __file_handler(cls, log_file: str, formatter: logging.Formatter) -> logging.Handler:
+        with cls._lock:
+            if log_file not in cls._file_handlers:
+                # Opened on the first record, so creating loggers doesn't touch the disk
+                handler = logging.FileHandler(log_file, delay=True)
+                handler.setFormatter(formatter)
+                cls._file_handlers[log_file] = handler
+            return cls._file_handlers[log_file]
+
     def audit(self, msg: str, *args, **kwargs):
         if self.isEnabledFor(5):
             self._log(5, msg, args, **kwargs)
 
+    @classmethod
+    def use_queue(cls):
+        """
+        Moves the base logger's handlers behind a queue drained by a background thread,
+        so logging calls only enqueue the record. Flushed on interpreter exit.
+        """
+        with cls._lock:
+            base = cls._base_logger
+            if base is None or cls._listener is not None:
+                return
+
+            log_queue = queue.SimpleQueue()
+            handlers = list(base.handlers)
+            for handler in handlers:
+                base.removeHandler(handler)
+            base.addHandler(logging.handlers.QueueHandler(log_queue))
+
+            cls._listener = logging.handlers.QueueListener(
+                log_queue, *handlers, respect_handler_level=True
+            )
+            cls._listener.start()
+            atexit.register(cls.stop_queue)
+
+    @classmethod
+    def stop_queue(cls):
+        """Flushes queued records and stops the background logging thread, if running."""
+        with cls._lock:
+            listener, cls._listener = cls._listener, None
+        if listener is not None:
+            listener.stop()
+
 
 class HandleErrorsMeta(type):
     """
@@ -151,11 +237,11 @@ class HandleErrorsMeta(type):
     def wrap_method_with_handle_errors(method):
         @functools.wraps(method)
         def wrapper(*args, **kwargs):
-            log = GlobalLogger(__name__)
             try:
                 return method(*args, **kwargs)
             except Exception as e:
-                log.warning(f"Error in method: {method.__name__}")
+                log = GlobalLogger(__name__)
+                log.warning("Error in method: %s", method.__name__)
                 log.error(e)
                 log.debug(traceback.format_exc())
 
@@ -0,0 +1,214 @@
+# Built-ins
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional as Opt
+
+# AIRISTOTLE
+from .logger import GlobalLogger
+from .telemetry import METRICS
+
+BLOB_REQUESTS = METRICS.counter("airistotle_blob_requests_total", "Blob store lookups, by result.")
+BLOB_BYTES = METRICS.gauge("airistotle_blob_store_bytes", "Size of the blob store on disk.")
+BLOB_KEY_REGEX = re.compile(r"^blob:([0-9a-f]{64})$")
+
+_content_types = OrderedDict()
+_content_types_lock = threading.Lock()
+MAX_KNOWN_URLS = 4096
+
+
+def remember_content_type(url: str, content_type: str):
+    """Records the content type of a URL we produced or already checked, e.g. a generated image."""
+    with _content_types_lock:
+        _content_types[url] = content_type
+        _content_types.move_to_end(url)
+        while len(_content_types) > MAX_KNOWN_URLS:
+            _content_types.popitem(last=False)
+
+
+def known_content_type(url: str) -> Opt[str]:
+    with _content_types_lock:
+        return _content_types.get(url)
+
+
+def image_filename(content_type: str, index: int = 0) -> str:
+    extension = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ".png"
+    return f"image{index or ''}{extension}"
+
+
+class BlobStore:
+    """
+    Content-addressed store for downloaded media, such as generated images. Each blob
+    is a file named after the SHA-256 of its content, so it is kept once however many
+    URLs point at it, and can be referred to by the stable key `blob:<sha256>`. URLs
+    blobs were fetched from resolve to them too. The least recently used blobs are
+    evicted once the store grows past `max_bytes`.
+
+    :param path: Directory to keep the blobs in.
+    :param max_bytes: Size limit of the store.
+    :param fetch_timeout: Timeout of background downloads, see `prefetch`.
+    """
+
+    def __init__(self, path, max_bytes: int = 512_000_000, fetch_timeout: float = 60):
+        # Not at module level, so that importing settings doesn't pull in requests
+        import requests
+
+        self.log = GlobalLogger("BlobStore")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.fetch_timeout = fetch_timeout
+        self._blobs = OrderedDict()  # digest -> (size, content_type), least recently used first
+        self._aliases = OrderedDict()  # url -> digest
+        self._pending = {}  # url -> Future of a running prefetch
+        self._size = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(4, thread_name_prefix="blob-fetch")
+        self._http = requests.Session()
+        self._load()
+
+    def _load(self):
+        # Files left by earlier runs, or other processes sharing the directory
+        files = sorted((file for file in self.path.iterdir() if file.is_file()), key=lambda file: file.stat().st_mtime)
+        for file in files:
+            if file.name.startswith("."):
+                continue  # Partial write
+            digest, _, extension = file.name.partition(".")
+            content_type = mimetypes.types_map.get(f".{extension}", "application/octet-stream")
+            self._blobs[digest] = (file.stat().st_size, content_type)
+            self._size += file.stat().st_size
+        BLOB_BYTES.set(self._size)
+
+    def _file(self, digest: str, content_type: str) -> Path:
+        extension = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ".bin"
+        return self.path / f"{digest}{extension}"
+
+    def put(self, content: bytes, content_type: str, url: str = "") -> str:
+        """Stores `content`, under `url` as well if given, and returns its key."""
+        digest = hashlib.sha256(content).hexdigest()
+        if url:
+            remember_content_type(url, content_type)
+        if len(content) > self.max_bytes:
+            return f"blob:{digest}"
+
+        file = self._file(digest, content_type)
+        with self._lock:
+            stored = digest in self._blobs
+        if not stored:
+            # Write under a temporary name, so readers never see a partial file
+            partial = file.with_name(f".{file.name}.{threading.get_ident()}")
+            partial.write_bytes(content)
+            os.replace(partial, file)
+
+        with self._lock:
+            if digest not in self._blobs:
+                self._blobs[digest] = (len(content), content_type)
+                self._size += len(content)
+            self._blobs.move_to_end(digest)
+            if url:
+                self._aliases[url] = digest
+                self._aliases.move_to_end(url)
+                while len(self._aliases) > MAX_KNOWN_URLS:
+                    self._aliases.popitem(last=False)
+            self._evict()
+        return f"blob:{digest}"
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._blobs:
+            digest, (size, content_type) = self._blobs.popitem(last=False)
+            self._size -= size
+            self._file(digest, content_type).unlink(missing_ok=True)
+        BLOB_BYTES.set(self._size)
+
+    def digest(self, ref: str) -> Opt[str]:
+        """Returns the digest a key or URL refers to, if it is stored."""
+        match = BLOB_KEY_REGEX.match(ref)
+        with self._lock:
+            digest = match.group(1) if match else self._aliases.get(ref)
+            return digest if digest in self._blobs else None
+
+    def pending(self, ref: str) -> Opt[Future]:
+        """Returns the running prefetch of a URL, if any."""
+        with self._lock:
+            return self._pending.get(ref)
+
+    def get(self, ref: str, wait: bool = True) -> Opt[tuple]:
+        """
+        Returns `(content, content_type)` for a key or URL, or None if it isn't stored.
+
+        :param wait: Wait for a running prefetch of `ref` first.
+        """
+        future = self.pending(ref) if wait else None
+        if future is not None:
+            try:
+                future.result(timeout=self.fetch_timeout)
+            except Exception:
+                pass  # Logged by the prefetch; the caller falls back to fetching it itself
+
+        digest = self.digest(ref)
+        if digest is None:
+            BLOB_REQUESTS.inc(result="miss")
+            return None
+        with self._lock:
+            size, content_type = self._blobs[digest]
+            self._blobs.move_to_end(digest)
+        try:
+            content = self._file(digest, content_type).read_bytes()
+        except FileNotFoundError:
+            # Evicted by another process sharing the directory
+            with self._lock:
+                if self._blobs.pop(digest, None):
+                    self._size -= size
+            BLOB_REQUESTS.inc(result="miss")
+            return None
+        BLOB_REQUESTS.inc(result="hit")
+        return content, content_type
+
+    def prefetch(self, url: str, content_type: str = "") -> Future:
+        """
+        Downloads `url` into the store in the background. Until it finishes, `get`
+        on the URL waits for it rather than downloading it again.
+
+        :param content_type: The content type, if known; otherwise the server's is used.
+        """
+        with self._lock:
+            future = self._pending.get(url)
+            if future is not None or url in self._aliases:
+                return future or _done()
+            future = self._pool.submit(self._fetch, url, content_type)
+            self._pending[url] = future
+        future.add_done_callback(lambda _: self._finish(url))
+        return future
+
+    def _fetch(self, url: str, content_type: str) -> str:
+        import requests
+
+        try:
+            with self._http.get(url, timeout=self.fetch_timeout) as response:
+                response.raise_for_status()
+                return self.put(response.content, content_type or response.headers.get("Content-Type", ""), url=url)
+        except requests.RequestException as e:
+            self.log.warning("Could not prefetch %s: %s", url, e)
+            raise
+
+    def _finish(self, url: str):
+        with self._lock:
+            self._pending.pop(url, None)
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def size_bytes(self) -> int:
+        return self._size
+
+
+def _done() -> Future:
+    future = Future()
+    future.set_result(None)
+    return future
@@ -1,3 +1,15 @@
-from .web_search import WebSearch
-from .dalle import Dalle
-from .url_viewer import UrlViewer
\ No newline at end of file
+# Plugins are imported on first access, so that importing one of them (or the
+# registry) doesn't import the heavy dependencies of all the others.
+_PLUGINS = {
+    "WebSearch": ".web_search",
+    "Dalle": ".dalle",
+    "UrlViewer": ".url_viewer",
+}
+
+
+def __getattr__(name):
+    if name in _PLUGINS:
+        import importlib
+
+        return getattr(importlib.import_module(_PLUGINS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,6 +4,8 @@ from abc import ABC, abstractmethod
 class BasePlugin(ABC):
     name: str
     description: str
+    max_concurrency: int = 0  # Concurrent calls allowed; 0 uses TOOL_PLUGIN_CONCURRENCY
+    output_token_budget: int = 0  # Tokens of output submitted; 0 uses TOOL_OUTPUT_TOKEN_BUDGET
 
     def __call__(self, *args, **kwargs):
         return self.run(*args, **kwargs)
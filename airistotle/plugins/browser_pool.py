@@ -0,0 +1,162 @@
+# Built-ins
+import atexit
+import queue
+import threading
+
+from contextlib import contextmanager
+from typing import Optional as Opt
+
+# Third Party
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.support.ui import WebDriverWait
+from webdriver_manager.chrome import ChromeDriverManager
+
+# AIRISTOTLE
+from ..logger import GlobalLogger
+
+
+class PooledBrowser:
+    """A headless Chrome instance and the number of pages it has served."""
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.uses = 0
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except WebDriverException:
+            pass
+
+
+class BrowserPool:
+    """
+    Pool of persistent headless Chrome instances. The chromedriver binary is resolved
+    once, instances are launched ahead of time in the background, and each instance is
+    replaced after `max_uses` pages or as soon as it fails.
+
+    :param size: Maximum number of browsers, and so of pages being loaded at once.
+    :param max_uses: Pages a browser serves before it is recycled.
+    :param page_load_timeout: Seconds a page may take to load.
+    :param prewarm: Launch all `size` browsers in the background right away.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_uses: int = 50,
+        page_load_timeout: float = 20,
+        prewarm: bool = True,
+    ):
+        self.log = GlobalLogger("BrowserPool")
+        self.size = size
+        self.max_uses = max_uses
+        self.page_load_timeout = page_load_timeout
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._driver_path = None
+        self._driver_path_lock = threading.Lock()
+        self._closed = False
+
+        atexit.register(self.close)
+        if prewarm:
+            threading.Thread(target=self._prewarm, name="browser-pool-warm", daemon=True).start()
+
+    @property
+    def driver_path(self) -> str:
+        with self._driver_path_lock:
+            if self._driver_path is None:
+                self._driver_path = ChromeDriverManager().install()
+                self.log.debug("Resolved chromedriver at %s", self._driver_path)
+            return self._driver_path
+
+    @contextmanager
+    def browser(self, timeout: Opt[float] = None):
+        """
+        Checks a browser out of the pool for the duration of the `with` block, launching
+        one if none is idle. Waits up to `timeout` seconds for a free slot.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("No browser became available in time.")
+
+        try:
+            browser = self._checkout()
+            crashed = False
+            try:
+                yield browser.driver
+            except WebDriverException:
+                self.log.warning("Browser failed, recycling it.")
+                crashed = True
+                raise
+            finally:
+                self._checkin(browser, crashed)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().quit()
+            except queue.Empty:
+                break
+
+    def _launch(self) -> PooledBrowser:
+        options = Options()
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        driver = webdriver.Chrome(service=Service(self.driver_path), options=options)
+        driver.set_page_load_timeout(self.page_load_timeout)
+        return PooledBrowser(driver)
+
+    def _checkout(self) -> PooledBrowser:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._launch()
+
+    def _checkin(self, browser: PooledBrowser, crashed: bool):
+        browser.uses += 1
+        if crashed or browser.uses >= self.max_uses or not self._reset(browser):
+            self.log.debug("Recycling browser after %s uses.", browser.uses)
+            browser.quit()
+        elif self._closed or self._idle.qsize() >= self.size:
+            browser.quit()
+        else:
+            self._idle.put(browser)
+
+    def _reset(self, browser: PooledBrowser) -> bool:
+        """Clears state left by the last page. Returns False if the browser is unusable."""
+        try:
+            browser.driver.delete_all_cookies()
+            browser.driver.get("about:blank")
+            return True
+        except WebDriverException:
+            return False
+
+    def _prewarm(self):
+        try:
+            for _ in range(self.size):
+                # Hold a slot while launching so warm and checked out browsers
+                # together never exceed the pool size.
+                if self._closed or not self._slots.acquire(blocking=False):
+                    return
+                try:
+                    self._idle.put(self._launch())
+                finally:
+                    self._slots.release()
+            self.log.debug("Pre-launched %s browser(s).", self.size)
+        except Exception as e:
+            self.log.warning("Could not pre-launch browsers: %s", e)
+
+
+def wait_until_ready(driver: webdriver.Chrome, timeout: float):
+    """Waits for the current page's document to finish loading."""
+    WebDriverWait(driver, timeout).until(
+        lambda d: d.execute_script("return document.readyState") == "complete"
+    )
@@ -1,7 +1,8 @@
-import openai
 import json
 
 from .base import BasePlugin
+from ..client import get_client
+from ..media import BlobStore, remember_content_type
 
 
 class Dalle(BasePlugin):
@@ -34,8 +35,9 @@ class Dalle(BasePlugin):
     name = "dalle"
     description = "DALL·E generates images from textual descriptions."
 
-    def __init__(self, openai_api_key: str):
-        self.client = openai.Client(api_key=openai_api_key)
+    def __init__(self, openai_api_key: str, blobs: BlobStore = None):
+        self.client = get_client(openai_api_key)
+        self.blobs = blobs
 
     def run(self, *args, **kwargs) -> str:
         prompt_prefix = \
@@ -46,4 +48,12 @@ class Dalle(BasePlugin):
         kwargs["style"] = "vivid"
         image = self.client.images.generate(**kwargs)
 
-        return str([image.url for image in image.data])
+        urls = [image.url for image in image.data]
+        for url in urls:
+            # Lets the Slack interface skip checking what these URLs point to
+            remember_content_type(url, "image/png")
+            if self.blobs is not None:
+                # Download while the run goes on, so the reply can be uploaded straight from disk
+                self.blobs.prefetch(url, "image/png")
+
+        return str(urls)
@@ -0,0 +1,99 @@
+# Built-ins
+import re
+
+# Third Party
+import numpy as np
+
+# AIRISTOTLE
+from ..shaping import tokenize
+
+NO_RESULTS = "No results found."
+
+
+class ExtractiveSummarizer:
+    """
+    Local, CPU-only alternative to summarizing search results with an LLM. Splits the
+    retrieved pages into passages, scores them against the query with Okapi BM25 and
+    returns the best passages with their source URLs.
+
+    :param passage_words: Approximate number of words per passage.
+    :param top_n: Number of passages returned.
+    :param k1: BM25 term frequency saturation.
+    :param b: BM25 length normalization.
+    """
+
+    def __init__(self, passage_words: int = 120, top_n: int = 6, k1: float = 1.5, b: float = 0.75):
+        self.passage_words = passage_words
+        self.top_n = top_n
+        self.k1 = k1
+        self.b = b
+
+    def split(self, documents: list) -> list:
+        """Splits haystack `Document`s into unique `(passage, url)` pairs on sentence boundaries."""
+        passages = []
+        seen = set()
+        for document in documents:
+            url = document.meta.get("url", "")
+            current = []
+            words = 0
+            for sentence in re.split(r"(?<=[.!?])\s+|\n\s*\n", document.content):
+                sentence = " ".join(sentence.split())
+                if not sentence:
+                    continue
+                current.append(sentence)
+                words += sentence.count(" ") + 1
+                if words >= self.passage_words:
+                    passages.append((" ".join(current), url))
+                    current, words = [], 0
+            if current:
+                passages.append((" ".join(current), url))
+
+        unique = []
+        for passage, url in passages:
+            if passage not in seen:
+                seen.add(passage)
+                unique.append((passage, url))
+        return unique
+
+    def score(self, query: str, passages: list) -> np.ndarray:
+        """Returns the BM25 score of each passage for `query`."""
+        query_terms = sorted(set(tokenize(query)))
+        if not passages or not query_terms:
+            return np.zeros(len(passages))
+
+        columns = {term: index for index, term in enumerate(query_terms)}
+        tokenized = [tokenize(passage) for passage in passages]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=float)
+
+        # Term frequency matrix restricted to the query's terms: passages x query terms
+        tf = np.zeros((len(passages), len(query_terms)))
+        for row, tokens in enumerate(tokenized):
+            indices = [columns[token] for token in tokens if token in columns]
+            np.add.at(tf[row], indices, 1)
+
+        n = len(passages)
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log((n - df + 0.5) / (df + 0.5) + 1)
+        norm = self.k1 * (1 - self.b + self.b * lengths / (lengths.mean() or 1))
+        return (tf * (self.k1 + 1) / (tf + norm[:, None])) @ idf
+
+    def best(self, query: str, documents: list) -> list:
+        """Returns the `top_n` `(passage, url)` pairs most relevant to `query`, best first."""
+        passages = self.split(documents)
+        if not passages:
+            return []
+
+        scores = self.score(query, [passage for passage, _ in passages])
+        best = [index for index in np.argsort(-scores, kind="stable")[: self.top_n] if scores[index] > 0]
+        best = best or list(range(min(self.top_n, len(passages))))
+        return [passages[index] for index in best]
+
+    def summarize(self, query: str, documents: list) -> str:
+        """Returns the `top_n` passages most relevant to `query`, each with its source."""
+        best = self.best(query, documents)
+        if not best:
+            return NO_RESULTS
+
+        return "\n\n".join(
+            f"[{rank}] {passage} (source: {url})" for rank, (passage, url) in enumerate(best, start=1)
+        )
@@ -0,0 +1,150 @@
+# Built-ins
+import ast
+import importlib
+import importlib.util
+import json
+import threading
+
+from collections.abc import Mapping
+from importlib.metadata import entry_points
+from typing import Callable, Optional as Opt
+
+# AIRISTOTLE
+from ..logger import GlobalLogger
+
+ENTRY_POINT_GROUP = "airistotle.plugins"
+
+
+class PluginSpec:
+    """
+    What the registry knows about a plugin before it is imported: where it lives, its
+    `name` and `description`, and the function definition JSON from its docstring.
+    """
+
+    def __init__(self, module: str, class_name: str, name: str, description: str, schema: Opt[dict]):
+        self.module = module
+        self.class_name = class_name
+        self.name = name
+        self.description = description
+        self.schema = schema
+
+    @classmethod
+    def read(cls, module: str, class_name: str) -> "PluginSpec":
+        """
+        Reads a plugin's metadata by parsing its module's source, without importing it
+        or any of its dependencies.
+        """
+        spec = importlib.util.find_spec(module)
+        if spec is None or not spec.origin:
+            raise ImportError(f"Could not find plugin module '{module}'.")
+        with open(spec.origin) as f:
+            tree = ast.parse(f.read(), filename=spec.origin)
+
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef) and node.name == class_name:
+                break
+        else:
+            raise ImportError(f"Could not find plugin class '{class_name}' in '{module}'.")
+
+        attributes = {}
+        for statement in node.body:
+            if (
+                isinstance(statement, ast.Assign)
+                and len(statement.targets) == 1
+                and isinstance(statement.targets[0], ast.Name)
+                and isinstance(statement.value, ast.Constant)
+            ):
+                attributes[statement.targets[0].id] = statement.value.value
+
+        docstring = ast.get_docstring(node)
+        try:
+            schema = json.loads(docstring) if docstring else None
+        except json.JSONDecodeError:
+            schema = None
+
+        name = attributes.get("name") or (schema or {}).get("name")
+        if not name:
+            raise ImportError(f"Plugin class '{class_name}' in '{module}' has no name.")
+        return cls(module, class_name, name, attributes.get("description", ""), schema)
+
+    def load(self):
+        """Imports and returns the plugin class."""
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+
+class PluginRegistry(Mapping):
+    """
+    Mapping of function name to plugin instance which only imports and instantiates a
+    plugin the first time it is looked up, or when `warm()` is called. Metadata is
+    available without importing anything, see `PluginSpec`.
+
+    Plugins are registered explicitly with `register()`, or discovered from the
+    `airistotle.plugins` entry point group with `discover()`.
+    """
+
+    def __init__(self):
+        self.log = GlobalLogger("PluginRegistry")
+        self.specs = {}
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+
+    def register(self, module: str, class_name: str, factory: Opt[Callable] = None) -> PluginSpec:
+        """
+        Registers the plugin class `class_name` from `module`. `factory` is called with
+        the class to create the instance; by default the class is called without
+        arguments.
+        """
+        spec = PluginSpec.read(module, class_name)
+        self.specs[spec.name] = spec
+        self._factories[spec.name] = factory or (lambda plugin_class: plugin_class())
+        self._locks[spec.name] = threading.Lock()
+        return spec
+
+    def discover(self, group: str = ENTRY_POINT_GROUP):
+        """Registers plugins advertised by installed packages as `module:Class` entry points."""
+        for entry_point in entry_points(group=group):
+            module, _, class_name = entry_point.value.partition(":")
+            try:
+                spec = self.register(module.strip(), class_name.strip())
+                self.log.debug("Discovered plugin '%s' from %s.", spec.name, entry_point.value)
+            except ImportError as e:
+                self.log.warning("Could not register plugin entry point %s: %s", entry_point.value, e)
+
+    def warm(self, background: bool = True):
+        """Instantiates every plugin now, in a background thread unless told otherwise."""
+        if background:
+            threading.Thread(target=self.warm, args=(False,), name="plugin-warm", daemon=True).start()
+            return
+        for name in list(self.specs):
+            try:
+                self[name]
+            except Exception as e:
+                self.log.warning("Could not warm plugin '%s': %s", name, e)
+
+    def definitions(self) -> list:
+        """Returns the function definitions of all registered plugins."""
+        return [spec.schema for spec in self.specs.values() if spec.schema]
+
+    def __getitem__(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if name not in self.specs:
+            raise KeyError(name)
+
+        with self._locks[name]:
+            if name not in self._instances:
+                self.log.debug("Loading plugin '%s'.", name)
+                plugin_class = self.specs[name].load()
+                self._instances[name] = self._factories[name](plugin_class)
+            return self._instances[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self.specs
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def __len__(self) -> int:
+        return len(self.specs)
@@ -0,0 +1,105 @@
+# Built-ins
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+
+# Third Party
+import html2text
+import requests
+
+from haystack.schema import Document
+from requests.adapters import HTTPAdapter
+
+# AIRISTOTLE
+from ..logger import GlobalLogger
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+
+class ConcurrentPageRetriever:
+    """
+    Fetches the pages behind a list of search results concurrently. Each page gets
+    `page_timeout` seconds and the whole fan-out gets `deadline` seconds; retrieval
+    stops as soon as `top_k` usable pages are in hand.
+
+    :param top_k: Number of pages to return.
+    :param page_timeout: Seconds allowed for a single page.
+    :param deadline: Seconds allowed for all pages together.
+    :param min_length: Pages with less text than this are skipped.
+    :param max_length: Page text is cut off after this many characters.
+    :param max_workers: Maximum number of pages fetched at once.
+    """
+
+    def __init__(
+        self,
+        top_k: int = 4,
+        page_timeout: float = 5,
+        deadline: float = 10,
+        min_length: int = 500,
+        max_length: int = 20000,
+        max_workers: int = 16,
+    ):
+        self.log = GlobalLogger("PageRetriever")
+        self.top_k = top_k
+        self.page_timeout = page_timeout
+        self.deadline = deadline
+        self.min_length = min_length
+        self.max_length = max_length
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="page-fetch")
+
+    def retrieve(self, results: list) -> list:
+        """
+        Fetches the pages for `results`, haystack search engine `Document`s with a
+        `link` in their meta, and returns up to `top_k` page `Document`s in search
+        rank order.
+        """
+        started = time.monotonic()
+        futures = {
+            self._pool.submit(self._fetch, result.meta.get("link")): rank
+            for rank, result in enumerate(results)
+            if result.meta.get("link")
+        }
+
+        documents = []
+        try:
+            for future in as_completed(futures, timeout=self.deadline):
+                document = future.result()
+                if document is not None:
+                    documents.append((futures[future], document))
+                if len(documents) >= self.top_k:
+                    break
+        except FutureTimeoutError:
+            self.log.debug("Page retrieval hit its %ss deadline.", self.deadline)
+
+        for future in futures:
+            future.cancel()
+
+        self.log.debug(
+            "Retrieved %s/%s pages in %.2fs.", len(documents), len(futures), time.monotonic() - started
+        )
+        return [document for _, document in sorted(documents, key=lambda item: item[0])]
+
+    def _fetch(self, url: str):
+        try:
+            response = self.session.get(url, timeout=self.page_timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self.log.debug("Could not fetch %s: %s", url, e)
+            return None
+
+        if "html" not in response.headers.get("Content-Type", ""):
+            return None
+        try:
+            text = html2text.html2text(response.text)
+        except Exception as e:
+            self.log.debug("Could not convert %s: %s", url, e)
+            return None
+        if len(text) < self.min_length:
+            return None
+        return Document(content=text[: self.max_length], meta={"url": url})
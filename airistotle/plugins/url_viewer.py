@@ -1,16 +1,23 @@
-import openai
-import json
+from typing import Optional as Opt
+
 import html2text
-import time
+import requests
 
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
+from requests.adapters import HTTPAdapter
 
 from .base import BasePlugin
+from .browser_pool import BrowserPool, wait_until_ready
+from ..cache import ContentCache, canonicalize_url
+from ..logger import GlobalLogger
+from ..telemetry import METRICS
+
+HTML_CONTENT_TYPES = ["text/html", "application/xhtml+xml"]
+TEXT_CONTENT_TYPES = ["text/plain", "application/json", "text/markdown"]
+JS_SHELL_MARKERS = ["enable javascript", "javascript is required", "javascript is disabled"]
+NO_CONTENT = "Could not retrieve content from the URL."
+PAGES_SERVED = METRICS.counter("airistotle_url_viewer_pages_total", "Pages the URL viewer fetched, by tier.")
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
 
 
 class UrlViewer(BasePlugin):
@@ -35,18 +42,125 @@ class UrlViewer(BasePlugin):
     name = "url_viewer"
     description = "UrlViewer browses a specified URL and returns the content of the page."
 
+    def __init__(
+        self,
+        pool_size: int = 2,
+        max_uses: int = 50,
+        page_load_timeout: float = 20,
+        http_timeout: float = 10,
+        max_bytes: int = 2_000_000,
+        min_text_length: int = 200,
+        cache: Opt[ContentCache] = None,
+    ):
+        """Initializes a UrlViewer Plugin Function Object.
+
+        Pages are first fetched over plain HTTP. Only if the result looks like a
+        JavaScript-only shell, or isn't HTML or text, is the page rendered in a browser.
+
+        ## Params:
+            - pool_size: Number of headless browsers kept running. Also the number of
+                                pages that can be rendered at once; plain HTTP
+                                fetches aren't limited by it.
+            - max_uses: Pages a browser serves before it is replaced.
+            - page_load_timeout: Seconds to wait for a page to load in the browser.
+
+            - http_timeout: Seconds to wait for the plain HTTP fetch.
+            - max_bytes: Bytes of the body read over plain HTTP before it is cut off.
+            - min_text_length: Pages with less visible text than this are rendered in
+                                the browser.
+
+            - cache: Optional cache for page contents, keyed by canonical URL.
+        """
+        self.log = GlobalLogger("UrlViewer")
+        self.page_load_timeout = page_load_timeout
+        self.http_timeout = http_timeout
+        self.max_bytes = max_bytes
+        self.min_text_length = min_text_length
+        self.cache = cache
+
+        self.pool = BrowserPool(
+            size=pool_size, max_uses=max_uses, page_load_timeout=page_load_timeout
+        )
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
     def run(self, *args, **kwargs) -> str:
         url = kwargs["url"]
-        options = Options()
-        options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-        time.sleep(1)
-        driver.get(url)
-        time.sleep(1)
-        text = html2text.html2text(driver.page_source)
-
-        driver.quit()
-
-        return text or "Could not retrieve content from the URL."
\ No newline at end of file
+        if self.cache is None:
+            return self._view(url)
+        return self.cache.get_or_compute(
+            canonicalize_url(url),
+            lambda: self._view(url),
+            cacheable=lambda result: result != NO_CONTENT,
+        )
+
+    def _view(self, url: str) -> str:
+        text = self._fetch_http(url)
+        tier = "http"
+        if text is None:
+            with self.pool.browser(timeout=self.page_load_timeout) as driver:
+                driver.get(url)
+                wait_until_ready(driver, self.page_load_timeout)
+                text = html2text.html2text(driver.page_source)
+            tier = "browser"
+
+        PAGES_SERVED.inc(tier=tier)
+        self.log.debug("Served %s from the %s tier.", url, tier)
+
+        if not text:
+            return NO_CONTENT
+        return f"(Retrieved via {tier})\n\n{text}"
+
+    def _fetch_http(self, url: str):
+        """
+        Fetches `url` without a browser. Returns None if the browser is needed, and an
+        empty string if the page can't be had at all.
+        """
+        try:
+            with self.session.get(url, timeout=self.http_timeout, stream=True) as response:
+                if 400 <= response.status_code < 500:
+                    # A browser would be refused too
+                    self.log.debug("Not escalating %s: HTTP %s.", url, response.status_code)
+                    return ""
+                response.raise_for_status()
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if content_type not in HTML_CONTENT_TYPES + TEXT_CONTENT_TYPES:
+                    self.log.debug("Escalating %s: content type '%s'.", url, content_type)
+                    return None
+
+                body = bytearray()
+                for chunk in response.iter_content(chunk_size=65536):
+                    body += chunk
+                    if len(body) >= self.max_bytes:
+                        self.log.debug("Truncated %s at %s bytes.", url, self.max_bytes)
+                        del body[self.max_bytes :]
+                        break
+                # Without a declared charset requests assumes latin-1; most pages are utf-8
+                has_charset = "charset" in response.headers.get("Content-Type", "")
+                encoding = response.encoding if has_charset else "utf-8"
+        except requests.RequestException as e:
+            self.log.debug("Escalating %s: %s", url, e)
+            return None
+
+        document = body.decode(encoding, errors="replace")
+        if content_type in TEXT_CONTENT_TYPES:
+            return document
+
+        if self._is_js_shell(document):
+            self.log.debug("Escalating %s: page needs JavaScript.", url)
+            return None
+        return html2text.html2text(document)
+
+    def _is_js_shell(self, document: str) -> bool:
+        soup = BeautifulSoup(document, "html.parser")
+        noscript = " ".join(tag.get_text(" ") for tag in soup.find_all("noscript")).lower()
+        if any(marker in noscript for marker in JS_SHELL_MARKERS):
+            return True
+
+        for tag in soup(["script", "style", "noscript", "template"]):
+            tag.decompose()
+        body = soup.body or soup
+        return len(body.get_text(" ", strip=True)) < self.min_text_length
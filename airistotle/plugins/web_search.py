@@ -2,13 +2,21 @@
 from typing import Optional as Opt
 
 # Third Party
-from haystack.nodes import WebRetriever, PromptNode
-from haystack.pipelines import Pipeline
+from haystack.nodes import PromptNode
+from haystack.schema import Document
 from haystack.nodes.search_engine.providers import GoogleAPI, SerperDev
 
 # AIRISTOTLE
 from .base import BasePlugin
+from .extractive import ExtractiveSummarizer, NO_RESULTS
+from .retrieval import ConcurrentPageRetriever
+from ..cache import ContentCache, normalize_query
+from ..similarity import SimilarQueryCache
 from ..logger import GlobalLogger
+from ..telemetry import span
+
+# What a search with no usable pages, or an empty Prompt Node answer, comes back as
+DEGRADED_RESULTS = {NO_RESULTS, "None", "[]", ""}
 
 
 class WebSearch(BasePlugin):
@@ -41,6 +49,14 @@ class WebSearch(BasePlugin):
         serper_api_key: Opt[str] = None,
         prompt_node_model: Opt[str] = None,
         prompt_node_template: Opt[str] = None,
+        cache: Opt[ContentCache] = None,
+        fan_out: int = 10,
+        top_k: int = 4,
+        page_timeout: float = 5,
+        deadline: float = 10,
+        summarizer: str = "prompt_node",
+        prompt_passages: int = 8,
+        similar_cache: Opt[SimilarQueryCache] = None,
     ):
         """Initializes a WebSearch Plugin Function Object.
 
@@ -57,6 +73,23 @@ class WebSearch(BasePlugin):
 
             - prompt_node_model: The model to use for the Prompt Node (e.g. "gpt-3.5-turbo")
             - prompt_node_template: The template to use for the Prompt Node. Must be from https://prompthub.deepset.ai/
+
+            - cache: Optional cache for search results, keyed by normalized query.
+
+            - fan_out: Number of search results whose pages are fetched.
+            - top_k: Number of pages passed on for summarization. Fetching stops once
+                                this many usable pages have been retrieved.
+            - page_timeout: Seconds allowed for fetching a single page.
+            - deadline: Seconds allowed for fetching all pages.
+
+            - summarizer: "prompt_node" to summarize the pages with an LLM, or "extractive"
+                                to return the passages most relevant to the query, scored
+                                locally with BM25. The latter needs no OpenAI API Key.
+            - prompt_passages: Number of passages, ranked against the query with BM25,
+                                which the Prompt Node summarizes instead of whole pages.
+
+            - similar_cache: Optional cache which reuses the results of recent, similarly
+                                worded queries.
         """
         self.log = GlobalLogger("WebSearch")
         self.log.debug("Initializing WebSearch Plugin Function.")
@@ -67,54 +100,102 @@ class WebSearch(BasePlugin):
         self.serper_api_key = serper_api_key
         self.prompt_node_model = prompt_node_model or "gpt-3.5-turbo-16k"
         self.prompt_node_template = prompt_node_template or "deepset/summarization"
+        self.cache = cache
+        self.fan_out = fan_out
+        self.top_k = top_k
+        self.page_timeout = page_timeout
+        self.deadline = deadline
+        self.summarizer = summarizer
+        self.prompt_passages = prompt_passages
+        self.similar_cache = similar_cache
 
-        print([self.google_api_key and self.google_cse_id, self.serper_api_key])
         assert any(
             [self.google_api_key and self.google_cse_id, self.serper_api_key]
         ), "Must specify either Google API Key and Google CSE ID or Serper API Key."
 
-        self.pipeline = self._setup_pipeline()
+        self._setup_pipeline()
 
-        self.log.audit(f"Using prompt model: {self.prompt_node_model}")
+        if self.summarizer != "extractive":
+            self.log.audit("Using prompt model: %s", self.prompt_node_model)
 
     def run(self, query: str) -> str:
-        self.log.debug("Running WebSearch Plugin Function with query: {query}")
-
-        result = self.pipeline.run(query=query) or {}
-        summarized_results = str(result.get("results"))
+        if self.similar_cache is not None:
+            result = self.similar_cache.get(query)
+            if result is not None:
+                return result
 
-        self.log.audit(f"WebSearch Plugin Function returned: {summarized_results}")
+        if self.cache is None:
+            result = self._search(query)
+        else:
+            result = self.cache.get_or_compute(
+                normalize_query(query),
+                lambda: self._search(query),
+                cacheable=lambda result: result not in DEGRADED_RESULTS,
+            )
+
+        if self.similar_cache is not None and result not in DEGRADED_RESULTS:
+            self.similar_cache.add(query, result)
+        return result
+
+    def _search(self, query: str) -> str:
+        self.log.debug("Running WebSearch Plugin Function with query: %s", query)
+
+        # Each stage's latency ends up in airistotle_span_seconds
+        with span("web_search.search") as current:
+            results = self.search_engine.search(query=query)
+            current.set(results=len(results))
+        with span("web_search.retrieve") as current:
+            documents = self.retriever.retrieve(results)
+            current.set(pages=len(documents))
+        with span("web_search.summarize", summarizer=self.summarizer):
+            if self.summarizer == "extractive":
+                summarized_results = self.extractive_summarizer.summarize(query, documents)
+            else:
+                summarized_results = self._summarize(query, documents)
+
+        self.log.audit("WebSearch Plugin Function returned: %s", summarized_results)
         return summarized_results
 
+    def _summarize(self, query: str, documents: list) -> str:
+        # Only the most relevant passages, so the prompt stays well inside the model's context
+        passages = [
+            Document(content=passage, meta={"url": url})
+            for passage, url in self.extractive_summarizer.best(query, documents)
+        ]
+        if not passages:
+            return NO_RESULTS
+        output, _ = self.prompt_node.run(query=query, documents=passages)
+        return str((output or {}).get("results"))
+
     def _setup_pipeline(self):
         api_key = self.google_api_key or self.serper_api_key or ""
 
         if self.google_api_key:
             self.log.debug("Using Google API for WebSearch Plugin Function.")
-            search_engine = GoogleAPI(api_key=api_key, engine_id=self.google_cse_id)
+            self.search_engine = GoogleAPI(
+                top_k=self.fan_out, api_key=api_key, engine_id=self.google_cse_id
+            )
         else:
             self.log.debug("Using Serper API for WebSearch Plugin Function.")
-            search_engine = SerperDev(api_key=api_key)
-
-        retriever = WebRetriever(
-            api_key=api_key,
-            search_engine_provider=search_engine,
-            top_search_results=40,
-            top_k=4,
-            mode="preprocessed_documents",
+            self.search_engine = SerperDev(top_k=self.fan_out, api_key=api_key)
+
+        self.retriever = ConcurrentPageRetriever(
+            top_k=self.top_k,
+            page_timeout=self.page_timeout,
+            deadline=self.deadline,
+            max_workers=self.fan_out,
         )
 
-        prompt_node = PromptNode(
+        if self.summarizer == "extractive":
+            self.log.debug("Using local extractive summarization.")
+            self.extractive_summarizer = ExtractiveSummarizer(top_n=self.top_k * 2)
+            return
+
+        self.extractive_summarizer = ExtractiveSummarizer(top_n=self.prompt_passages)
+
+        self.prompt_node = PromptNode(
             self.prompt_node_model,
             api_key=self.openai_api_key,
             max_length=4000,
             default_prompt_template=self.prompt_node_template,
         )
-
-        pipeline = Pipeline()
-        pipeline.add_node(component=retriever, name="Retriever", inputs=["Query"])
-        pipeline.add_node(
-            component=prompt_node, name="PromptNode", inputs=["Retriever"]
-        )
-
-        return pipeline
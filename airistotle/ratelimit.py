@@ -0,0 +1,277 @@
+# Built-ins
+import asyncio
+import contextvars
+import json
+import re
+import threading
+import time
+
+from contextlib import contextmanager
+
+# Third-party
+import httpx
+
+# AIRISTOTLE
+from .logger import GlobalLogger
+from .shaping import estimate_tokens
+from .telemetry import METRICS
+
+INTERACTIVE = 0  # A user is waiting on this call: creating messages and runs, submitting tool outputs
+DEFAULT = 1
+BACKGROUND = 2  # Nobody is waiting on this particular call: polling, maintenance
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", DEFAULT: "default", BACKGROUND: "background"}
+
+QUEUE_DEPTH = METRICS.gauge(
+    "airistotle_openai_queue_depth", "OpenAI requests waiting for rate limit capacity, by priority."
+)
+QUEUE_SECONDS = METRICS.histogram(
+    "airistotle_openai_queue_seconds", "Time OpenAI requests waited for rate limit capacity, by priority."
+)
+THROTTLE_EVENTS = METRICS.counter(
+    "airistotle_openai_throttle_events_total", "Times OpenAI requests were held back or rejected, by reason."
+)
+
+_priority = contextvars.ContextVar("airistotle_openai_priority", default=DEFAULT)
+
+
+def current_priority() -> int:
+    """The priority OpenAI requests made from the current context are sent with."""
+    return _priority.get()
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Sends the OpenAI requests made in the enclosed block with `priority`."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def parse_reset(value: str) -> float:
+    """Parses OpenAI's reset durations, like `1s`, `6m0s` or `20ms`, into seconds."""
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    seconds = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value or ""):
+        seconds += float(amount) * units[unit]
+    return seconds
+
+
+class TokenBucket:
+    """
+    Allows `rate` units per minute, in bursts of up to a minute's worth. A rate of 0
+    means unlimited.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.level = float(rate)
+        self.updated = time.monotonic()
+
+    def wait_time(self, cost: float, now: float) -> float:
+        """Seconds until `cost` units are available; refills the bucket up to `now`."""
+        if not self.rate:
+            return 0.0
+        self.level = min(self.rate, self.level + (now - self.updated) * self.rate / 60)
+        self.updated = now
+        cost = min(cost, self.rate)
+        return 0.0 if self.level >= cost else (cost - self.level) * 60 / self.rate
+
+    def take(self, cost: float):
+        if self.rate:
+            self.level -= min(cost, self.rate)
+
+    def reconcile(self, remaining: int):
+        """Lowers the bucket to what the server says is left, which counts the real usage."""
+        if self.rate:
+            self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """
+    Client-side gate in front of every OpenAI request. Requests and estimated prompt
+    tokens are metered with token buckets, which are brought down to the remaining
+    quota reported by each response; `x-ratelimit-*` response headers and
+    `Retry-After` on 429 and 5xx responses pause the affected traffic until the
+    server says it will recover. While capacity is short, higher priority requests
+    (see `request_priority`) go first.
+
+    :param requests_per_minute: Request budget. 0 relies on the response headers only.
+    :param tokens_per_minute: Token budget. 0 relies on the response headers only.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.log = GlobalLogger("RateLimiter")
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = {"requests": 0.0, "tokens": 0.0}
+        self._waiting = {priority: 0 for priority in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+
+    def _try_acquire(self, cost: float, priority: int) -> float:
+        """Takes capacity and returns 0, or returns the seconds to wait before trying again."""
+        now = time.monotonic()
+        pause = max(self.paused_until["requests"], self.paused_until["tokens"] if cost else 0) - now
+        if pause > 0:
+            return pause
+        if any(self._waiting[higher] for higher in PRIORITY_NAMES if higher < priority):
+            # Leave the capacity to the more urgent requests; they'll notify us when done
+            return 0.25
+        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(cost, now))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(cost)
+        return 0.0
+
+    def _enter(self, priority: int):
+        self._waiting[priority] += 1
+        QUEUE_DEPTH.set(self._waiting[priority], priority=PRIORITY_NAMES[priority])
+
+    def _leave(self, priority: int, started: float):
+        self._waiting[priority] -= 1
+        QUEUE_DEPTH.set(self._waiting[priority], priority=PRIORITY_NAMES[priority])
+        QUEUE_SECONDS.observe(time.monotonic() - started, priority=PRIORITY_NAMES[priority])
+        self._cond.notify_all()
+
+    def acquire(self, cost: float = 0, priority: int = None):
+        """Blocks until a request costing `cost` tokens may be sent."""
+        priority = _priority.get() if priority is None else priority
+        started = time.monotonic()
+        with self._cond:
+            wait = self._try_acquire(cost, priority)
+            if wait:
+                THROTTLE_EVENTS.inc(reason="queued")
+                self._enter(priority)
+                try:
+                    while wait:
+                        self._cond.wait(timeout=wait)
+                        wait = self._try_acquire(cost, priority)
+                finally:
+                    self._leave(priority, started)
+
+    async def acquire_async(self, cost: float = 0, priority: int = None):
+        """`acquire` for the event loop: sleeps instead of blocking the thread."""
+        priority = _priority.get() if priority is None else priority
+        started = time.monotonic()
+        with self._cond:
+            wait = self._try_acquire(cost, priority)
+            if not wait:
+                return
+            THROTTLE_EVENTS.inc(reason="queued")
+            self._enter(priority)
+        try:
+            while wait:
+                await asyncio.sleep(min(wait, 0.25))
+                with self._cond:
+                    wait = self._try_acquire(cost, priority)
+        finally:
+            with self._cond:
+                self._leave(priority, started)
+
+    def update(self, status_code: int, headers):
+        """Applies what a response says about the remaining quota."""
+        now = time.monotonic()
+        with self._cond:
+            for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is not None and remaining.isdigit():
+                    # Runs use far more tokens than their request bodies show
+                    bucket.reconcile(int(remaining))
+                if remaining is not None and remaining.isdigit() and int(remaining) == 0:
+                    reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}", ""))
+                    if reset and now + reset > self.paused_until[kind]:
+                        THROTTLE_EVENTS.inc(reason=f"{kind}_exhausted")
+                        self.paused_until[kind] = now + reset
+
+            if status_code == 429 or status_code >= 500:
+                THROTTLE_EVENTS.inc(reason="429" if status_code == 429 else "5xx")
+                retry_after = headers.get("retry-after")
+                try:
+                    delay = float(retry_after) if retry_after is not None else 0.0
+                except ValueError:
+                    delay = 0.0
+                if status_code == 429 and not delay:
+                    delay = 1.0
+                if delay:
+                    self.log.warning(
+                        "OpenAI returned %s, holding requests for %.1fs.", status_code, delay
+                    )
+                    self.paused_until["requests"] = max(self.paused_until["requests"], now + delay)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "waiting": {PRIORITY_NAMES[priority]: count for priority, count in self._waiting.items()},
+                "paused_for": max(max(self.paused_until.values()) - time.monotonic(), 0.0),
+                "throttle_events": {dict(key).get("reason"): count for key, count in THROTTLE_EVENTS.snapshot().items()},
+            }
+
+
+PROMPT_FIELDS = ("content", "instructions", "additional_instructions", "output", "prompt", "input")
+
+
+def _prompt_text(value, prompt: bool = False):
+    """Yields the strings of a request body which end up in a prompt."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _prompt_text(item, prompt or key in PROMPT_FIELDS)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _prompt_text(item, prompt)
+    elif isinstance(value, str) and prompt:
+        yield value
+
+
+def request_cost(request: httpx.Request) -> int:
+    """
+    Estimated prompt tokens a request adds: the tokens of the message contents,
+    instructions and tool outputs it sends, rather than the size of the JSON around
+    them. What a run then uses is reconciled from the response headers.
+    """
+    if request.method == "GET":
+        return 0
+    try:
+        body = json.loads(request.content or b"null")
+    except httpx.RequestNotRead:
+        return 0
+    except ValueError:
+        # Uploads and other non-JSON bodies
+        return estimate_tokens(request.content.decode(errors="ignore"))
+    return sum(estimate_tokens(text) for text in _prompt_text(body))
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport which passes every request through a `RateLimiter`."""
+
+    def __init__(self, limiter: RateLimiter, transport: httpx.BaseTransport):
+        self.limiter = limiter
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.limiter.acquire(request_cost(request))
+        response = self.transport.handle_request(request)
+        self.limiter.update(response.status_code, response.headers)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of `RateLimitedTransport`."""
+
+    def __init__(self, limiter: RateLimiter, transport: httpx.AsyncBaseTransport):
+        self.limiter = limiter
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self.limiter.acquire_async(request_cost(request))
+        response = await self.transport.handle_async_request(request)
+        self.limiter.update(response.status_code, response.headers)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
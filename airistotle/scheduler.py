@@ -0,0 +1,197 @@
+# Built-ins
+import heapq
+import itertools
+import threading
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional as Opt
+
+# AIRISTOTLE
+from .logger import GlobalLogger
+from .settings import (
+    RUN_POLL_MIN_INTERVAL,
+    RUN_POLL_MAX_INTERVAL,
+    RUN_POLL_BACKOFF,
+    RUN_POLL_WORKERS,
+    RUN_ACTION_WORKERS,
+)
+from .ratelimit import BACKGROUND, current_priority, request_priority
+from .telemetry import METRICS, current_span, span
+
+TERMINAL_STATUSES = ["completed", "cancelled", "expired", "failed"]
+
+ACTIVE_RUNS = METRICS.gauge("airistotle_active_runs", "Runs currently tracked by the scheduler.")
+
+
+class TrackedRun:
+    """State the scheduler keeps for one active `(thread_id, run_id)` pair."""
+
+    def __init__(self, client, thread_id: str, run_id: str, on_requires_action: Opt[Callable]):
+        self.client = client
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.on_requires_action = on_requires_action
+        self.future = Future()
+        self.interval = RUN_POLL_MIN_INTERVAL
+        self.errors = 0
+        self.polls = 0
+        # Polls and tool calls happen on scheduler threads; keep them in the caller's trace
+        self.span = current_span()
+        # and submit tool outputs with the caller's priority
+        self.priority = current_priority()
+
+
+class RunScheduler:
+    """
+    Drives every in-flight run from a single loop. Each run is polled on its own
+    adaptive interval: fast right after creation and after tool outputs are submitted,
+    backing off while the model is busy. Polls are issued on a small, bounded pool of
+    workers and tool calls on a separate one, so waiting callers don't each hold a
+    polling thread.
+
+    :param min_interval: Poll interval for fresh runs, in seconds.
+    :param max_interval: Upper bound the poll interval backs off to, in seconds.
+    :param backoff: Factor the poll interval grows by after each unfinished poll.
+    :param poll_workers: Number of threads issuing `runs.retrieve` calls.
+    :param action_workers: Number of threads running `requires_action` callbacks.
+    :param max_errors: Consecutive failed polls after which a run's future fails.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = RUN_POLL_MIN_INTERVAL,
+        max_interval: float = RUN_POLL_MAX_INTERVAL,
+        backoff: float = RUN_POLL_BACKOFF,
+        poll_workers: int = RUN_POLL_WORKERS,
+        action_workers: int = RUN_ACTION_WORKERS,
+        max_errors: int = 5,
+    ):
+        self.log = GlobalLogger("RunScheduler")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_errors = max_errors
+
+        self._queue = []
+        self._counter = itertools.count()
+        self._active = {}
+        self._cond = threading.Condition()
+        self._poll_pool = ThreadPoolExecutor(poll_workers, thread_name_prefix="run-poll")
+        self._action_pool = ThreadPoolExecutor(action_workers, thread_name_prefix="run-action")
+        self._thread = None
+
+    def track(
+        self,
+        client,
+        thread_id: str,
+        run_id: str,
+        on_requires_action: Opt[Callable] = None,
+    ) -> Future:
+        """
+        Starts tracking a run and returns a future for it.
+
+        The future resolves with the run once it reaches a terminal status. If
+        `on_requires_action` is given it is called with the run whenever tool outputs
+        are required and is expected to submit them; otherwise the future resolves
+        with the run as soon as it requires action.
+        """
+        tracked = TrackedRun(client, thread_id, run_id, on_requires_action)
+        tracked.interval = self.min_interval
+        with self._cond:
+            self._active[(thread_id, run_id)] = tracked
+            ACTIVE_RUNS.set(len(self._active))
+            self._schedule(tracked, self.min_interval)
+            self._ensure_started()
+        return tracked.future
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="run-scheduler", daemon=True)
+            self._thread.start()
+
+    def _schedule(self, tracked: TrackedRun, delay: float):
+        with self._cond:
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._counter), tracked))
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                due, _, tracked = self._queue[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+                heapq.heappop(self._queue)
+            self._poll_pool.submit(self._poll, tracked)
+
+    def _poll(self, tracked: TrackedRun):
+        try:
+            with span("run.poll", parent=tracked.span, run_id=tracked.run_id) as poll, request_priority(BACKGROUND):
+                run = tracked.client.beta.threads.runs.retrieve(
+                    run_id=tracked.run_id, thread_id=tracked.thread_id
+                )
+                poll.set(status=run.status)
+        except Exception as e:
+            tracked.errors += 1
+            if tracked.errors >= self.max_errors:
+                self._finish(tracked, exception=e)
+            else:
+                self.log.warning("Error polling run %s: %s", tracked.run_id, e)
+                self._schedule(tracked, self.max_interval)
+            return
+
+        tracked.errors = 0
+        tracked.polls += 1
+        self.log.audit("Run %s is %s after %s polls.", tracked.run_id, run.status, tracked.polls)
+
+        if run.status in TERMINAL_STATUSES:
+            self._finish(tracked, result=run)
+        elif run.status == "requires_action":
+            if tracked.on_requires_action is None:
+                self._finish(tracked, result=run)
+            else:
+                self._action_pool.submit(self._act, tracked, run)
+        else:
+            self._schedule(tracked, tracked.interval)
+            tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+
+    def _act(self, tracked: TrackedRun, run):
+        try:
+            with span("run.requires_action", parent=tracked.span, run_id=tracked.run_id), request_priority(tracked.priority):
+                tracked.on_requires_action(run)
+        except Exception as e:
+            self._finish(tracked, exception=e)
+            return
+        # The model picks up right after tool outputs land, so check back quickly.
+        tracked.interval = self.min_interval
+        self._schedule(tracked, self.min_interval)
+
+    def _finish(self, tracked: TrackedRun, result=None, exception=None):
+        with self._cond:
+            self._active.pop((tracked.thread_id, tracked.run_id), None)
+            ACTIVE_RUNS.set(len(self._active))
+        if exception is not None:
+            tracked.future.set_exception(exception)
+        else:
+            tracked.future.set_result(result)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RunScheduler:
+    """Returns the process-wide `RunScheduler`."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RunScheduler()
+        return _scheduler
@@ -1,5 +1,8 @@
 # Built-ins
+import threading
+
 from pathlib import Path
+from typing import Optional as Opt
 
 # Third-party
 import dotenv
@@ -7,8 +10,11 @@ import pathlib
 import os
 
 # AIRISTOTLE
-from .logger import GlobalLogger
-from .plugins import WebSearch, Dalle, UrlViewer
+from .cache import ContentCache, DiskCache
+from .logger import GlobalLogger, JsonFormatter
+from .media import BlobStore
+from .plugins.registry import PluginRegistry
+from .telemetry import configure_trace_log
 
 
 dotenv.load_dotenv(Path(__file__).parent.parent / ".env", override=True)
@@ -21,26 +27,186 @@ def get_default(value: str) -> str:
     return value if DEBUG else ""
 
 LOG_LEVEL = int(env.get("AIRISTOTLE_LOG_LEVEL", get_default("5")) or 10)
+LOG_ASYNC = env.get("AIRISTOTLE_LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+LOG_JSON = env.get("AIRISTOTLE_LOG_JSON", "false").lower() in ("1", "true", "yes")
 OPENAI_API_KEY = str(env.get("AIRISTOTLE_OPENAI_API_KEY", get_default("debug")))
+OPENAI_BASE_URL = env.get("AIRISTOTLE_OPENAI_BASE_URL") or None
 GOOGLE_API_KEY = env.get("AIRISTOTLE_GOOGLE_API_KEY", get_default("debug"))
 GOOGLE_CSE_ID = env.get("AIRISTOTLE_GOOGLE_CSE_ID", get_default("debug"))
 SERPER_API_KEY = env.get("AIRISTOTLE_SERPER_API_KEY", get_default("debug"))
 SLACK_BOT_TOKEN = env.get("AIRISTOTLE_SLACK_BOT_TOKEN", get_default("debug"))
 SLACK_APP_TOKEN = env.get("AIRISTOTLE_SLACK_APP_TOKEN", get_default("debug"))
 SLACK_SIGNING_SECRET = env.get("AIRISTOTLE_SLACK_SIGNING_SECRET", get_default("debug"))
+SLACK_API_URL = env.get("AIRISTOTLE_SLACK_API_URL", "https://slack.com/api/")
 ASSISTANT_ID = str(env.get("AIRISTOTLE_ASSISTANT_ID", get_default("debug")))
 
+OPENAI_MAX_CONNECTIONS = int(env.get("AIRISTOTLE_OPENAI_MAX_CONNECTIONS", 64))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(env.get("AIRISTOTLE_OPENAI_MAX_KEEPALIVE_CONNECTIONS", 32))
+OPENAI_KEEPALIVE_EXPIRY = float(env.get("AIRISTOTLE_OPENAI_KEEPALIVE_EXPIRY", 120))
+OPENAI_MAX_RETRIES = int(env.get("AIRISTOTLE_OPENAI_MAX_RETRIES", 5))
+OPENAI_REQUESTS_PER_MINUTE = float(env.get("AIRISTOTLE_OPENAI_REQUESTS_PER_MINUTE", 0))
+OPENAI_TOKENS_PER_MINUTE = float(env.get("AIRISTOTLE_OPENAI_TOKENS_PER_MINUTE", 0))
+ASSISTANT_REFRESH_INTERVAL = float(env.get("AIRISTOTLE_ASSISTANT_REFRESH_INTERVAL", 600))
+ASSISTANT_CACHE_SIZE = int(env.get("AIRISTOTLE_ASSISTANT_CACHE_SIZE", 256))
+MESSAGE_MIRROR_SIZE = int(env.get("AIRISTOTLE_MESSAGE_MIRROR_SIZE", 20))
+RUN_POLL_MIN_INTERVAL = float(env.get("AIRISTOTLE_RUN_POLL_MIN_INTERVAL", 0.25))
+RUN_POLL_MAX_INTERVAL = float(env.get("AIRISTOTLE_RUN_POLL_MAX_INTERVAL", 4))
+RUN_POLL_BACKOFF = float(env.get("AIRISTOTLE_RUN_POLL_BACKOFF", 1.5))
+RUN_POLL_WORKERS = int(env.get("AIRISTOTLE_RUN_POLL_WORKERS", 8))
+RUN_ACTION_WORKERS = int(env.get("AIRISTOTLE_RUN_ACTION_WORKERS", 16))
+
+TOOL_WORKERS = int(env.get("AIRISTOTLE_TOOL_WORKERS", 16))
+TOOL_TIMEOUT = float(env.get("AIRISTOTLE_TOOL_TIMEOUT", 300))
+TOOL_PLUGIN_CONCURRENCY = int(env.get("AIRISTOTLE_TOOL_PLUGIN_CONCURRENCY", 4))
+TOOL_OUTPUT_TOKEN_BUDGET = int(env.get("AIRISTOTLE_TOOL_OUTPUT_TOKEN_BUDGET", 3000))
+
+URL_VIEWER_POOL_SIZE = int(env.get("AIRISTOTLE_URL_VIEWER_POOL_SIZE", 2))
+URL_VIEWER_MAX_USES = int(env.get("AIRISTOTLE_URL_VIEWER_MAX_USES", 50))
+URL_VIEWER_PAGE_LOAD_TIMEOUT = float(env.get("AIRISTOTLE_URL_VIEWER_PAGE_LOAD_TIMEOUT", 20))
+URL_VIEWER_HTTP_TIMEOUT = float(env.get("AIRISTOTLE_URL_VIEWER_HTTP_TIMEOUT", 10))
+URL_VIEWER_MAX_BYTES = int(env.get("AIRISTOTLE_URL_VIEWER_MAX_BYTES", 2_000_000))
+
+WEB_SEARCH_FAN_OUT = int(env.get("AIRISTOTLE_WEB_SEARCH_FAN_OUT", 10))
+WEB_SEARCH_TOP_K = int(env.get("AIRISTOTLE_WEB_SEARCH_TOP_K", 4))
+WEB_SEARCH_PAGE_TIMEOUT = float(env.get("AIRISTOTLE_WEB_SEARCH_PAGE_TIMEOUT", 5))
+WEB_SEARCH_DEADLINE = float(env.get("AIRISTOTLE_WEB_SEARCH_DEADLINE", 10))
+WEB_SEARCH_SUMMARIZER = env.get("AIRISTOTLE_WEB_SEARCH_SUMMARIZER", "prompt_node")
+WEB_SEARCH_PROMPT_PASSAGES = int(env.get("AIRISTOTLE_WEB_SEARCH_PROMPT_PASSAGES", 8))
+
+CACHE_MAX_ENTRIES = int(env.get("AIRISTOTLE_CACHE_MAX_ENTRIES", 1024))
+CACHE_MAX_BYTES = int(env.get("AIRISTOTLE_CACHE_MAX_BYTES", 64_000_000))
+CACHE_DISK_LOCATION = env.get("AIRISTOTLE_CACHE_DISK_LOCATION", str(Path(__file__).parent / "storage" / "cache.sqlite3"))
+CACHE_DISK_MAX_BYTES = int(env.get("AIRISTOTLE_CACHE_DISK_MAX_BYTES", 256_000_000))  # 0 for no limit
+CACHE_DISK_PURGE_INTERVAL = float(env.get("AIRISTOTLE_CACHE_DISK_PURGE_INTERVAL", 600))
+WEB_SEARCH_CACHE_TTL = float(env.get("AIRISTOTLE_WEB_SEARCH_CACHE_TTL", 3600))
+URL_VIEWER_CACHE_TTL = float(env.get("AIRISTOTLE_URL_VIEWER_CACHE_TTL", 900))
+BLOB_STORE_LOCATION = env.get("AIRISTOTLE_BLOB_STORE_LOCATION", str(Path(__file__).parent / "storage" / "blobs"))
+BLOB_STORE_MAX_BYTES = int(env.get("AIRISTOTLE_BLOB_STORE_MAX_BYTES", 512_000_000))
+WEB_SEARCH_SIMILARITY_THRESHOLD = float(env.get("AIRISTOTLE_WEB_SEARCH_SIMILARITY_THRESHOLD", 0.7))
+WEB_SEARCH_SIMILARITY_TTL = float(env.get("AIRISTOTLE_WEB_SEARCH_SIMILARITY_TTL", 0))
+
+PLUGIN_DISCOVERY = env.get("AIRISTOTLE_PLUGIN_DISCOVERY", "true").lower() in ("1", "true", "yes")
+PLUGIN_WARMUP = env.get("AIRISTOTLE_PLUGIN_WARMUP", "true").lower() in ("1", "true", "yes")
+
+SLACK_STREAMING = env.get("AIRISTOTLE_SLACK_STREAMING", "true").lower() in ("1", "true", "yes")
+SLACK_UPDATE_INTERVAL = float(env.get("AIRISTOTLE_SLACK_UPDATE_INTERVAL", 1.5))
+SLACK_MAX_CONCURRENCY = int(env.get("AIRISTOTLE_SLACK_MAX_CONCURRENCY", 32))
+SLACK_QUEUE_IDLE_TIMEOUT = float(env.get("AIRISTOTLE_SLACK_QUEUE_IDLE_TIMEOUT", 300))
+SLACK_COALESCE_WINDOW = float(env.get("AIRISTOTLE_SLACK_COALESCE_WINDOW", 0.5))
+SLACK_DEDUP_WINDOW = float(env.get("AIRISTOTLE_SLACK_DEDUP_WINDOW", 3600))  # 0 handles every delivery
+SLACK_DEDUP_MAX_ENTRIES = int(env.get("AIRISTOTLE_SLACK_DEDUP_MAX_ENTRIES", 100_000))
+SLACK_WORKERS = int(env.get("AIRISTOTLE_SLACK_WORKERS", os.cpu_count() or 1))
+SLACK_WORKER_HEALTH_INTERVAL = float(env.get("AIRISTOTLE_SLACK_WORKER_HEALTH_INTERVAL", 5))
+SLACK_WORKER_HEALTH_TIMEOUT = float(env.get("AIRISTOTLE_SLACK_WORKER_HEALTH_TIMEOUT", 30))
+SLACK_WORKER_DRAIN_TIMEOUT = float(env.get("AIRISTOTLE_SLACK_WORKER_DRAIN_TIMEOUT", 120))
+
 DB_LOCATION = Path(__file__).parent / "storage" / "database.json"
+THREAD_MAP_BACKEND = env.get("AIRISTOTLE_THREAD_MAP_BACKEND", "sqlite")
+THREAD_MAP_LOCATION = Path(env.get("AIRISTOTLE_THREAD_MAP_LOCATION", Path(__file__).parent / "storage" / "thread_map.sqlite3"))
+THREAD_MAP_CACHE_SIZE = int(env.get("AIRISTOTLE_THREAD_MAP_CACHE_SIZE", 4096))
+THREAD_MAP_TTL = float(env.get("AIRISTOTLE_THREAD_MAP_TTL", 0))  # 0 keeps mappings forever
+THREAD_MAP_MAINTENANCE_INTERVAL = float(env.get("AIRISTOTLE_THREAD_MAP_MAINTENANCE_INTERVAL", 3600))
+THREAD_MAP_DELETE_THREADS = env.get("AIRISTOTLE_THREAD_MAP_DELETE_THREADS", "false").lower() in ("1", "true", "yes")
+THREAD_MAP_DELETE_INTERVAL = float(env.get("AIRISTOTLE_THREAD_MAP_DELETE_INTERVAL", 0.5))
 LOG_FILE_LOCATION = str(Path(__file__).parent.parent / "airistotle.log")
+TRACE_LOG_LOCATION = env.get("AIRISTOTLE_TRACE_LOG", "")
+METRICS_PORT = int(env.get("AIRISTOTLE_METRICS_PORT", 0))
+METRICS_HOST = env.get("AIRISTOTLE_METRICS_HOST", "127.0.0.1")
+
+LOGGER = GlobalLogger(
+    "AIRISTOTLE",
+    log_file=LOG_FILE_LOCATION,
+    level=LOG_LEVEL,
+    formatter=JsonFormatter() if LOG_JSON else None,
+)
+
+_disk_cache = None
+_blob_store = None
+_shared_lock = threading.Lock()
+
+
+def configure_logging():
+    """
+    Starts the background log writer and the trace log, as configured. The interfaces
+    call this when they start, rather than it happening on import.
+    """
+    if LOG_ASYNC:
+        GlobalLogger.use_queue()
+    if TRACE_LOG_LOCATION:
+        configure_trace_log(TRACE_LOG_LOCATION)
 
-LOGGER = GlobalLogger("AIRISTOTLE", log_file=LOG_FILE_LOCATION, level=LOG_LEVEL)
 
-AVAILABLE_PLUGINS = {
-    WebSearch.name: WebSearch(
+def get_disk_cache() -> Opt[DiskCache]:
+    """Returns the process-wide disk cache, opened on first use, or None if it is disabled."""
+    global _disk_cache
+    with _shared_lock:
+        if _disk_cache is None and CACHE_DISK_LOCATION:
+            _disk_cache = DiskCache(CACHE_DISK_LOCATION, max_bytes=CACHE_DISK_MAX_BYTES)
+            if CACHE_DISK_PURGE_INTERVAL > 0:
+                _disk_cache.start_purging(CACHE_DISK_PURGE_INTERVAL)
+        return _disk_cache
+
+
+def get_blob_store() -> Opt[BlobStore]:
+    """Returns the process-wide blob store, opened on first use, or None if it is disabled."""
+    global _blob_store
+    with _shared_lock:
+        if _blob_store is None and BLOB_STORE_LOCATION:
+            _blob_store = BlobStore(BLOB_STORE_LOCATION, BLOB_STORE_MAX_BYTES)
+        return _blob_store
+
+
+def plugin_cache(name: str, ttl: float):
+    """Returns a `ContentCache` for a plugin, or None if its TTL disables caching."""
+    if ttl <= 0:
+        return None
+    return ContentCache(
+        name,
+        ttl,
+        max_entries=CACHE_MAX_ENTRIES,
+        max_bytes=CACHE_MAX_BYTES,
+        disk=get_disk_cache(),
+    )
+
+
+def _web_search(plugin_class):
+    from .similarity import SimilarQueryCache
+
+    return plugin_class(
         openai_api_key=OPENAI_API_KEY,
         google_api_key=GOOGLE_API_KEY,
         google_cse_id=GOOGLE_CSE_ID,
-    ),
-    Dalle.name: Dalle(OPENAI_API_KEY),
-    UrlViewer.name: UrlViewer(),
-}
+        cache=plugin_cache(plugin_class.name, WEB_SEARCH_CACHE_TTL),
+        fan_out=WEB_SEARCH_FAN_OUT,
+        top_k=WEB_SEARCH_TOP_K,
+        page_timeout=WEB_SEARCH_PAGE_TIMEOUT,
+        deadline=WEB_SEARCH_DEADLINE,
+        summarizer=WEB_SEARCH_SUMMARIZER,
+        prompt_passages=WEB_SEARCH_PROMPT_PASSAGES,
+        similar_cache=SimilarQueryCache(
+            threshold=WEB_SEARCH_SIMILARITY_THRESHOLD,
+            ttl=WEB_SEARCH_SIMILARITY_TTL,
+            max_entries=CACHE_MAX_ENTRIES,
+        ) if WEB_SEARCH_SIMILARITY_TTL > 0 else None,
+    )
+
+
+def _url_viewer(plugin_class):
+    return plugin_class(
+        pool_size=URL_VIEWER_POOL_SIZE,
+        max_uses=URL_VIEWER_MAX_USES,
+        page_load_timeout=URL_VIEWER_PAGE_LOAD_TIMEOUT,
+        http_timeout=URL_VIEWER_HTTP_TIMEOUT,
+        max_bytes=URL_VIEWER_MAX_BYTES,
+        cache=plugin_cache(plugin_class.name, URL_VIEWER_CACHE_TTL),
+    )
+
+
+# Plugins are imported and instantiated on first use (or by AVAILABLE_PLUGINS.warm()),
+# so importing settings doesn't pull in Haystack, Selenium and friends.
+AVAILABLE_PLUGINS = PluginRegistry()
+AVAILABLE_PLUGINS.register("airistotle.plugins.web_search", "WebSearch", _web_search)
+AVAILABLE_PLUGINS.register("airistotle.plugins.dalle", "Dalle", lambda plugin_class: plugin_class(OPENAI_API_KEY, blobs=get_blob_store()))
+AVAILABLE_PLUGINS.register("airistotle.plugins.url_viewer", "UrlViewer", _url_viewer)
+if PLUGIN_DISCOVERY:
+    AVAILABLE_PLUGINS.discover()
@@ -0,0 +1,147 @@
+"""
+Tool output shaping: trims plugin results to a token budget before they are submitted
+to the assistant, keeping the passages most relevant to the call's arguments.
+"""
+
+# Built-ins
+import math
+import re
+
+from collections import Counter
+
+CHARS_PER_TOKEN = 4
+WORD_REGEX = re.compile(r"[a-z0-9]+")
+MARKDOWN_LINK_REGEX = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+BOILERPLATE_REGEX = re.compile(
+    r"^(skip to (main )?content|menu|search|sign in|log in|sign up|subscribe|share|"
+    r"accept( all)?( cookies)?|cookie (settings|policy)|privacy policy|terms of (use|service)|"
+    r"back to top|advertisement|\* \* \*)$",
+    re.IGNORECASE,
+)
+STOPWORDS = set(
+    "a an and are as at be by for from has have how i in is it its of on or that the "
+    "this to was were what when where which who why will with you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def tokenize(text: str) -> list:
+    return [word for word in WORD_REGEX.findall(text.lower()) if word not in STOPWORDS]
+
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Removes navigation and boilerplate from html2text output: lines that are mostly
+    links, common menu/cookie phrases, repeated lines and runs of blank lines.
+    """
+    lines = []
+    seen = set()
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            if lines and lines[-1]:
+                lines.append("")
+            continue
+
+        plain = MARKDOWN_LINK_REGEX.sub(r"\1", stripped).strip(" *-|#>")
+        if BOILERPLATE_REGEX.match(plain):
+            continue
+        # Menus and footers: short lines made up almost entirely of link markup
+        link_chars = sum(len(match.group(0)) for match in MARKDOWN_LINK_REGEX.finditer(stripped))
+        if link_chars >= len(stripped) * 0.6 and len(plain.split()) <= 8:
+            continue
+        if len(stripped) < 200 and stripped in seen:
+            continue
+
+        seen.add(stripped)
+        lines.append(MARKDOWN_LINK_REGEX.sub(r"\1", line.rstrip()))
+
+    return "\n".join(lines).strip()
+
+
+def chunk(text: str, chunk_tokens: int) -> list:
+    """Splits `text` into chunks of roughly `chunk_tokens`, on paragraph boundaries where possible."""
+    limit = chunk_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > limit:
+            cut = paragraph.rfind(" ", 0, limit)
+            cut = cut if cut > limit // 2 else limit
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if current and len(current) + len(paragraph) + 2 > limit:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def rank(chunks: list, query: str) -> list:
+    """
+    Scores each chunk against `query` with a TF-IDF weighted term overlap. Returns the
+    chunk indices, best first. Chunks tie on score in document order.
+    """
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return list(range(len(chunks)))
+
+    counts = [Counter(tokenize(c)) for c in chunks]
+    document_frequency = Counter(term for count in counts for term in set(count) & query_terms)
+    scores = []
+    for index, count in enumerate(counts):
+        length = sum(count.values()) or 1
+        score = sum(
+            (count[term] / length) * math.log(1 + len(chunks) / document_frequency[term])
+            for term in query_terms
+            if count[term]
+        )
+        scores.append((-score, index))
+    return [index for _, index in sorted(scores)]
+
+
+def shape(text: str, query: str, budget: int, chunk_tokens: int = 300) -> str:
+    """
+    Fits `text` into `budget` tokens. Boilerplate is stripped first; if the text is
+    still too long, it is chunked and the chunks most relevant to `query` are kept, in
+    their original order, with an omission marker between gaps.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+
+    text = strip_boilerplate(text)
+    if estimate_tokens(text) <= budget:
+        return text
+
+    chunks = chunk(text, min(chunk_tokens, budget))
+    kept = []
+    used = 0
+    for index in rank(chunks, query):
+        cost = estimate_tokens(chunks[index])
+        if used + cost > budget:
+            continue
+        kept.append(index)
+        used += cost
+
+    parts = []
+    previous = -1
+    for index in sorted(kept):
+        if index != previous + 1:
+            parts.append("[...]")
+        parts.append(chunks[index])
+        previous = index
+    if previous != len(chunks) - 1:
+        parts.append("[...]")
+    return "\n\n".join(parts)
@@ -0,0 +1,194 @@
+# Built-ins
+import hashlib
+import re
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Optional as Opt
+
+# Third-party
+import numpy as np
+
+# AIRISTOTLE
+from .cache import normalize_query
+from .logger import GlobalLogger
+from .shaping import STOPWORDS
+from .telemetry import METRICS
+
+SIMILAR_LOOKUPS = METRICS.counter(
+    "airistotle_similar_query_lookups_total", "Similar-query cache lookups, by result (hit, miss)."
+)
+MERSENNE_PRIME = (1 << 31) - 1
+# Versions such as "3.11" or "v1.2" stay one word
+QUERY_WORD_REGEX = re.compile(r"[a-z]*\d+(?:\.\d+)+|[a-z0-9]+")
+FILLER_WORDS = STOPWORDS | set("about can could did do does me my please s should tell there would".split())
+
+
+def query_words(query: str) -> list:
+    """The query's normalized words in order, without filler words and with plurals folded."""
+    words = []
+    for word in QUERY_WORD_REGEX.findall(normalize_query(query)):
+        if word in FILLER_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss") and word[-2].isalpha():
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def shingles(query: str) -> set:
+    """
+    The query's words and pairs of neighbouring words, so that queries only match when
+    they share most of their words and much of their phrasing.
+    """
+    words = query_words(query)
+    return set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+
+def key_terms(query: str) -> set:
+    """
+    Words a similar query has to contain as well: numbers, versions and other words
+    with digits, such as model names, and capitalized names after the first word.
+    Those are what tells most otherwise alike queries apart.
+    """
+    names = " ".join(word for word in query.split()[1:] if word[:1].isupper())
+    return {word for word in query_words(query) if any(c.isdigit() for c in word)} | set(query_words(names))
+
+
+class MinHasher:
+    """
+    MinHash signatures over 31-bit shingle hashes, using `num_perm` random universal
+    hash functions.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = generator.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self.b = generator.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+
+    def signature(self, items: set) -> np.ndarray:
+        if not items:
+            return np.full(self.num_perm, MERSENNE_PRIME, dtype=np.uint64)
+        hashes = np.array(
+            [
+                int.from_bytes(hashlib.blake2b(item.encode(), digest_size=4).digest(), "little")
+                & MERSENNE_PRIME
+                for item in items
+            ],
+            dtype=np.uint64,
+        )
+        # (a * h + b) mod p for every permutation and shingle, then the column minimum
+        return ((np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME).min(axis=0)
+
+
+class SimilarQueryCache:
+    """
+    Cache of recent query results that also matches reworded queries. Queries are
+    fingerprinted with MinHash over word shingles and indexed with LSH banding, so a
+    lookup only compares against queries that share at least one band. A candidate is
+    only used if each query contains the other's `key_terms`, so "python 3.11 release
+    date" never answers "python 3.12 release date".
+
+    :param threshold: Minimum estimated Jaccard similarity for a hit, from 0 to 1.
+    :param ttl: Seconds an entry may be reused for.
+    :param max_entries: Number of recent queries kept.
+    :param num_perm: MinHash signature length. Must be divisible by `bands`.
+    :param bands: Number of LSH bands. More bands find less similar candidates.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        ttl: float = 3600,
+        max_entries: int = 1024,
+        num_perm: int = 64,
+        bands: int = 16,
+    ):
+        self.log = GlobalLogger("SimilarQueryCache")
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Opt[str]:
+        """Returns the result of the most similar recent query above the threshold, if any."""
+        items = shingles(query)
+        if not items:
+            return None
+        signature = self.hasher.signature(items)
+        words, keys = set(query_words(query)), key_terms(query)
+        now = time.monotonic()
+        with self._lock:
+            best, best_similarity = None, self.threshold
+            for entry_id in self._candidates(signature):
+                expires, _, cached_signature, cached_words, cached_keys, _ = self._entries[entry_id]
+                if expires < now:
+                    self._evict(entry_id)
+                    continue
+                if not (keys <= cached_words and cached_keys <= words):
+                    continue
+                similarity = float(np.mean(signature == cached_signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = entry_id, similarity
+
+            if best is None:
+                SIMILAR_LOOKUPS.inc(result="miss")
+                return None
+
+            SIMILAR_LOOKUPS.inc(result="hit")
+            self._entries.move_to_end(best)
+            _, cached_query, _, _, _, value = self._entries[best]
+
+        self.log.debug("Reusing results of '%s' (%.2f similar).", cached_query, best_similarity)
+        return value
+
+    def add(self, query: str, value: str):
+        items = shingles(query)
+        if not items:
+            return
+        signature = self.hasher.signature(items)
+        with self._lock:
+            self._counter += 1
+            entry_id = self._counter
+            self._entries[entry_id] = (
+                time.monotonic() + self.ttl,
+                query,
+                signature,
+                set(query_words(query)),
+                key_terms(query),
+                value,
+            )
+            for band in self._bands(signature):
+                self._buckets.setdefault(band, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+
+    def _bands(self, signature: np.ndarray) -> list:
+        return [
+            (band, signature[band * self.rows : (band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _candidates(self, signature: np.ndarray) -> set:
+        candidates = set()
+        for band in self._bands(signature):
+            candidates |= self._buckets.get(band, set())
+        return candidates
+
+    def _evict(self, entry_id: int):
+        signature = self._entries.pop(entry_id)[2]
+        for band in self._bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band]
@@ -0,0 +1,101 @@
+# Built-ins
+import threading
+
+# Third-party
+import openai
+
+# AIRISTOTLE
+from .create import open_store
+from .events import SeenEvents, MemorySeenEvents, SQLiteSeenEvents
+from .maintenance import ThreadMapMaintainer
+from .thread_map import (
+    ThreadMapStore,
+    SQLiteThreadMapStore,
+    TinyDBThreadMapStore,
+    CachedThreadMapStore,
+)
+from ..client import get_client
+from ..ratelimit import BACKGROUND, request_priority
+from ..settings import THREAD_MAP_BACKEND, THREAD_MAP_LOCATION, THREAD_MAP_CACHE_SIZE, DB_LOCATION
+from ..settings import (
+    OPENAI_API_KEY,
+    THREAD_MAP_TTL,
+    THREAD_MAP_MAINTENANCE_INTERVAL,
+    THREAD_MAP_DELETE_THREADS,
+    THREAD_MAP_DELETE_INTERVAL,
+    SLACK_DEDUP_WINDOW,
+    SLACK_DEDUP_MAX_ENTRIES,
+)
+
+_store = None
+_store_lock = threading.Lock()
+_maintainer = None
+_seen_events = None
+
+
+def get_thread_map_store() -> ThreadMapStore:
+    """
+    Returns the process-wide thread map store configured by `THREAD_MAP_BACKEND`. A new
+    SQLite store starts out with the mappings of an existing TinyDB `database.json`.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if THREAD_MAP_BACKEND == "tinydb":
+                backend = TinyDBThreadMapStore(DB_LOCATION)
+            else:
+                backend = open_store(THREAD_MAP_LOCATION, import_from=DB_LOCATION)
+            _store = CachedThreadMapStore(backend, maxsize=THREAD_MAP_CACHE_SIZE, ttl=THREAD_MAP_TTL)
+        return _store
+
+
+def get_seen_events() -> SeenEvents:
+    """
+    Returns the process-wide seen-set of Slack deliveries, or None if `SLACK_DEDUP_WINDOW`
+    is 0. It shares the SQLite thread map's database file, and with it every process
+    using that file; with the TinyDB backend it is kept in memory.
+    """
+    global _seen_events
+    if not SLACK_DEDUP_WINDOW:
+        return None
+    store = get_thread_map_store()
+    with _store_lock:
+        if _seen_events is None:
+            if isinstance(store.backend, SQLiteThreadMapStore):
+                _seen_events = SQLiteSeenEvents(store.backend, SLACK_DEDUP_WINDOW)
+            else:
+                _seen_events = MemorySeenEvents(SLACK_DEDUP_WINDOW, maxsize=SLACK_DEDUP_MAX_ENTRIES)
+        return _seen_events
+
+
+def _delete_openai_thread(thread_id: str):
+    with request_priority(BACKGROUND):
+        try:
+            get_client(OPENAI_API_KEY).beta.threads.delete(thread_id)
+        except openai.NotFoundError:
+            pass  # Already deleted
+
+
+def start_thread_map_maintenance(on_expired=None):
+    """
+    Starts the process-wide `ThreadMapMaintainer` for the configured store, unless
+    `THREAD_MAP_TTL` is 0. Returns the maintainer, or None.
+
+    :param on_expired: Called with each expired record.
+    """
+    global _maintainer
+    if not THREAD_MAP_TTL:
+        return None
+    store = get_thread_map_store()
+    with _store_lock:
+        if _maintainer is None:
+            _maintainer = ThreadMapMaintainer(
+                store,
+                ttl=THREAD_MAP_TTL,
+                interval=THREAD_MAP_MAINTENANCE_INTERVAL,
+                delete_thread=_delete_openai_thread if THREAD_MAP_DELETE_THREADS else None,
+                delete_interval=THREAD_MAP_DELETE_INTERVAL,
+                on_expired=on_expired,
+            )
+            _maintainer.start()
+        return _maintainer
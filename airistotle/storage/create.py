@@ -1,9 +1,68 @@
-from tinydb import TinyDB
-from ..settings import DB_LOCATION
+"""
+Creates the thread map database, or migrates it to the current schema, and imports
+the mappings from an existing TinyDB `database.json`.
 
-if DB_LOCATION.exists():
-    raise RuntimeError(
-        "Database already exists. Remove it if you'd like to re-create it."
+    python -m airistotle.storage.create [--import-json PATH]
+"""
+
+# Built-ins
+import argparse
+import json
+
+from pathlib import Path
+from typing import Optional as Opt
+
+# AIRISTOTLE
+from .thread_map import SQLiteThreadMapStore
+from ..logger import GlobalLogger
+from ..settings import DB_LOCATION, THREAD_MAP_LOCATION
+
+log = GlobalLogger("Storage")
+
+
+def import_json(store: SQLiteThreadMapStore, path: Path) -> int:
+    """Imports the `_default` table of a TinyDB file into `store`. Returns the record count."""
+    with open(path) as f:
+        data = json.load(f)
+    records = list(data.get("_default", {}).values())
+    store.put_many(records)
+    return len(records)
+
+
+def open_store(path: Path, import_from: Opt[Path] = None) -> SQLiteThreadMapStore:
+    """
+    Opens the thread map database at `path`. If this creates it, the mappings of the
+    TinyDB file `import_from` are imported, if there is one, so that upgrading from the
+    TinyDB backend keeps every conversation.
+    """
+    created = not Path(path).exists()
+    store = SQLiteThreadMapStore(path)
+    if created and import_from and Path(import_from).exists():
+        count = import_json(store, import_from)
+        log.info("Imported %s mappings from %s into the new thread map at %s.", count, import_from, path)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database", type=Path, default=THREAD_MAP_LOCATION)
+    parser.add_argument(
+        "--import-json",
+        type=Path,
+        default=DB_LOCATION,
+        help="TinyDB file to import mappings from, if it exists.",
     )
+    args = parser.parse_args()
+
+    store = SQLiteThreadMapStore(args.database)
+    log.info("Thread map schema is up to date at %s.", args.database)
+
+    if args.import_json and args.import_json.exists():
+        count = import_json(store, args.import_json)
+        log.info("Imported %s mappings from %s.", count, args.import_json)
+
+    store.close()
+
 
-db = TinyDB(DB_LOCATION)
+if __name__ == "__main__":
+    main()
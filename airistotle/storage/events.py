@@ -0,0 +1,88 @@
+# Built-ins
+import itertools
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+# AIRISTOTLE
+from .thread_map import SQLiteThreadMapStore
+
+
+class SeenEvents(ABC):
+    """
+    Remembers which Slack deliveries were already handled, for `window` seconds, so
+    that redeliveries of the same event can be dropped.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+
+    @abstractmethod
+    def claim(self, keys: list) -> bool:
+        """
+        Marks `keys` as seen. Returns True if none of them had been seen within the
+        window, i.e. the caller should handle the event, and False otherwise.
+        """
+        raise NotImplementedError
+
+
+class MemorySeenEvents(SeenEvents):
+    """
+    In-process seen-set, bounded to the `maxsize` most recent keys.
+    """
+
+    def __init__(self, window: float, maxsize: int = 100_000):
+        super().__init__(window)
+        self.maxsize = maxsize
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, keys: list) -> bool:
+        now = time.time()
+        with self._lock:
+            while self._seen and next(iter(self._seen.values())) < now - self.window:
+                self._seen.popitem(last=False)
+            if any(key in self._seen for key in keys):
+                return False
+            for key in keys:
+                self._seen[key] = now
+            while len(self._seen) > self.maxsize:
+                self._seen.popitem(last=False)
+        return True
+
+
+class SQLiteSeenEvents(SeenEvents):
+    """
+    Seen-set in the `seen_events` table of the thread map database, so that every
+    process sharing the file drops deliveries another one already took. Keys older
+    than the window are pruned every `prune_every` claims.
+    """
+
+    def __init__(self, store: SQLiteThreadMapStore, window: float, prune_every: int = 256):
+        super().__init__(window)
+        self.store = store
+        self.prune_every = prune_every
+        self._claims = itertools.count(1)
+
+    def claim(self, keys: list) -> bool:
+        now = time.time()
+        connection = self.store.connection
+        with connection:
+            # Take the write lock up front, so two processes can't both see the keys as new
+            connection.execute("BEGIN IMMEDIATE")
+            placeholders = ", ".join("?" for _ in keys)
+            seen = connection.execute(
+                f"SELECT 1 FROM seen_events WHERE key IN ({placeholders}) AND seen_at >= ? LIMIT 1",
+                (*keys, now - self.window),
+            ).fetchone()
+            if seen:
+                return False
+            connection.executemany(
+                "INSERT OR REPLACE INTO seen_events (key, seen_at) VALUES (?, ?)",
+                [(key, now) for key in keys],
+            )
+            if next(self._claims) % self.prune_every == 0:
+                connection.execute("DELETE FROM seen_events WHERE seen_at < ?", (now - self.window,))
+        return True
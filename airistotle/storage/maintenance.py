@@ -0,0 +1,153 @@
+# Built-ins
+import threading
+import time
+
+from typing import Callable, Optional as Opt
+
+# AIRISTOTLE
+from ..logger import GlobalLogger
+from ..telemetry import METRICS, span
+from .thread_map import ThreadMapStore
+
+STORE_ENTRIES = METRICS.gauge("airistotle_thread_map_entries", "Slack to OpenAI thread mappings in the store.")
+STORE_BYTES = METRICS.gauge("airistotle_thread_map_bytes", "Size of the thread map store on disk.")
+EXPIRED = METRICS.counter("airistotle_thread_map_expired_total", "Thread mappings removed after going idle.")
+RECLAIMED_BYTES = METRICS.counter(
+    "airistotle_thread_map_reclaimed_bytes_total", "Bytes returned to the file system by compacting the store."
+)
+DELETED_THREADS = METRICS.counter(
+    "airistotle_openai_threads_deleted_total", "Expired OpenAI threads deleted by maintenance, by result."
+)
+
+
+class ThreadMapMaintainer:
+    """
+    Expires thread mappings nobody has written in for longer than `ttl` seconds,
+    on a background thread. Expired OpenAI threads can be deleted too, paced so the
+    cleanup never competes with live conversations for API quota. Each mapping is then
+    claimed just before its thread is deleted, so a thread written in meanwhile is
+    left alone, and put back if the delete fails, so that thread is tried again on the
+    next pass.
+
+    :param store: The thread map to maintain.
+    :param ttl: Idle time, in seconds, after which a mapping expires.
+    :param interval: Seconds between maintenance passes.
+    :param batch_size: Mappings expired per store transaction.
+    :param delete_thread: Called with each expired OpenAI thread id, e.g. to delete it. Optional.
+    :param delete_interval: Seconds to wait between `delete_thread` calls.
+    :param on_expired: Called with each expired record, e.g. to drop cached handles. Optional.
+    :param compact_min_bytes: Only compact the store once at least this much space is unused.
+    """
+
+    def __init__(
+        self,
+        store: ThreadMapStore,
+        ttl: float,
+        interval: float = 3600,
+        batch_size: int = 500,
+        delete_thread: Opt[Callable[[str], None]] = None,
+        delete_interval: float = 0.5,
+        on_expired: Opt[Callable[[dict], None]] = None,
+        compact_min_bytes: int = 1_000_000,
+    ):
+        self.log = GlobalLogger("ThreadMapMaintainer")
+        self.store = store
+        self.ttl = ttl
+        self.interval = interval
+        self.batch_size = batch_size
+        self.delete_thread = delete_thread
+        self.delete_interval = delete_interval
+        self.on_expired = on_expired
+        self.compact_min_bytes = compact_min_bytes
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> dict:
+        """Runs one maintenance pass and returns what it did."""
+        stats = {"expired": 0, "deleted_threads": 0, "failed_deletes": 0, "reclaimed_bytes": 0}
+        with span("thread_map.maintenance", ttl=self.ttl) as current:
+            cutoff = time.time() - self.ttl
+            while not self._stop.is_set():
+                if self.delete_thread:
+                    failed = stats["failed_deletes"]
+                    records = self.store.expired(cutoff, self.batch_size)
+                    expired = self._delete_threads(records, cutoff, stats)
+                    # Failed mappings were put back, so the next batch would list them again
+                    retrying = stats["failed_deletes"] > failed
+                else:
+                    records = expired = self.store.expire(cutoff, self.batch_size)
+                    retrying = False
+                stats["expired"] += len(expired)
+                EXPIRED.inc(len(expired))
+                if self.on_expired:
+                    for record in expired:
+                        self.on_expired(record)
+                # Stop once a batch is short, had failures, or nothing in it could be deleted
+                if retrying or len(records) < self.batch_size or not expired:
+                    break
+
+            stats["reclaimed_bytes"] = self.store.compact(self.compact_min_bytes)
+            RECLAIMED_BYTES.inc(stats["reclaimed_bytes"])
+            stats["entries"] = len(self.store)
+            stats["bytes"] = self.store.size_bytes()
+            STORE_ENTRIES.set(stats["entries"])
+            STORE_BYTES.set(stats["bytes"])
+            current.set(**stats)
+
+        self.log.info(
+            "Thread map maintenance: %(expired)s expired, %(deleted_threads)s OpenAI threads deleted "
+            "(%(failed_deletes)s failed), %(reclaimed_bytes)s bytes reclaimed; "
+            "%(entries)s mappings, %(bytes)s bytes remain.",
+            stats,
+        )
+        return stats
+
+    def _delete_threads(self, records: list, cutoff: float, stats: dict) -> list:
+        """Claims each record's mapping, then deletes its OpenAI thread. Returns the records removed."""
+        expired = []
+        for record in records:
+            if self._stop.is_set():
+                break
+            # Skips threads written in since they were listed
+            if not self.store.claim(record["slack_thread_id"], cutoff):
+                continue
+            if self._delete(record["openai_thread_id"], stats):
+                expired.append(record)
+            else:
+                self.store.restore(record)
+            self._stop.wait(self.delete_interval)
+        return expired
+
+    def _delete(self, thread_id: str, stats: dict) -> bool:
+        try:
+            self.delete_thread(thread_id)
+        except Exception as e:
+            # Keeps the mapping, so the thread is tried again on the next pass
+            self.log.warning("Could not delete OpenAI thread %s: %s", thread_id, e)
+            stats["failed_deletes"] += 1
+            DELETED_THREADS.inc(result="failed")
+            return False
+        stats["deleted_threads"] += 1
+        DELETED_THREADS.inc(result="deleted")
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.log.error("Thread map maintenance failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Starts the maintenance thread; the first pass runs right away."""
+        if self._thread is None:
+            self.log.info("Expiring thread mappings idle for over %gs, checking every %gs.", self.ttl, self.interval)
+            self._thread = threading.Thread(target=self._loop, name="thread-map-maintenance", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,422 @@
+# Built-ins
+import sqlite3
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional as Opt
+
+# AIRISTOTLE
+from ..logger import GlobalLogger
+
+SCHEMA_VERSION = 2
+
+MIGRATIONS = {
+    1: [
+        """
+        CREATE TABLE IF NOT EXISTS thread_map (
+            slack_thread_id TEXT PRIMARY KEY,
+            openai_thread_id TEXT NOT NULL,
+            last_message_time REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS thread_map_last_message_time ON thread_map (last_message_time)",
+    ],
+    2: [
+        """
+        CREATE TABLE IF NOT EXISTS seen_events (
+            key TEXT PRIMARY KEY,
+            seen_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS seen_events_seen_at ON seen_events (seen_at)",
+    ],
+}
+
+
+class ThreadMapStore(ABC):
+    """
+    Maps Slack thread timestamps to OpenAI thread ids. Records are dicts with the keys
+    `slack_thread_id`, `openai_thread_id` and `last_message_time`, as in the original
+    TinyDB table.
+    """
+
+    @abstractmethod
+    def get(self, slack_thread_id: str) -> Opt[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, slack_thread_id: str, openai_thread_id: str, last_message_time: Opt[float] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, slack_thread_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def touch(self, slack_thread_id: str, last_message_time: Opt[float] = None):
+        """Records activity in a mapped thread."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def expire(self, older_than: float, limit: int = 500) -> list:
+        """
+        Deletes up to `limit` records whose `last_message_time` is before `older_than`,
+        oldest first, and returns them.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def expired(self, older_than: float, limit: int = 500) -> list:
+        """
+        Returns up to `limit` records whose `last_message_time` is before `older_than`,
+        oldest first, without deleting them.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, slack_thread_id: str, older_than: float) -> bool:
+        """
+        Deletes the record if its `last_message_time` is still before `older_than`.
+        Returns whether it did, so a thread written in since it was listed is kept.
+        """
+        raise NotImplementedError
+
+    def restore(self, record: dict):
+        """Puts a claimed record back, unless its Slack thread has been mapped again since."""
+        if self.get(record["slack_thread_id"]) is None:
+            self.put(record["slack_thread_id"], record["openai_thread_id"], record["last_message_time"])
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def size_bytes(self) -> int:
+        """Space the store takes up on disk."""
+        return 0
+
+    def compact(self, min_free_bytes: int = 0) -> int:
+        """Returns unused space to the file system, if at least `min_free_bytes` can be. Returns bytes reclaimed."""
+        return 0
+
+    def close(self):
+        pass
+
+
+class SQLiteThreadMapStore(ThreadMapStore):
+    """
+    SQLite backed store in WAL mode, so readers don't block the writer and several
+    processes can share one file. Lookups go through the `slack_thread_id` primary key
+    index. Each thread gets its own connection.
+
+    :param path: Location of the database file. Created, and migrated to the current
+        schema, if needed.
+    """
+
+    def __init__(self, path):
+        self.log = GlobalLogger("ThreadMapStore")
+        self.path = Path(path)
+        self._local = threading.local()
+        self.migrate()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    def migrate(self):
+        """Applies any schema migrations the database file is missing."""
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            self.log.info("Migrating thread map schema to version %s.", target)
+            with self.connection:
+                self.connection.execute("BEGIN")
+                for statement in MIGRATIONS[target]:
+                    self.connection.execute(statement)
+                self.connection.execute(f"PRAGMA user_version = {target}")
+
+    def get(self, slack_thread_id: str) -> Opt[dict]:
+        row = self.connection.execute(
+            "SELECT * FROM thread_map WHERE slack_thread_id = ?", (slack_thread_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def put(self, slack_thread_id: str, openai_thread_id: str, last_message_time: Opt[float] = None):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO thread_map VALUES (?, ?, ?)",
+            (slack_thread_id, openai_thread_id, last_message_time or time.time()),
+        )
+
+    def put_many(self, records):
+        """Inserts many records in one transaction."""
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO thread_map VALUES (?, ?, ?)",
+                [
+                    (
+                        record["slack_thread_id"],
+                        record["openai_thread_id"],
+                        record.get("last_message_time") or time.time(),
+                    )
+                    for record in records
+                ],
+            )
+
+    def delete(self, slack_thread_id: str):
+        self.connection.execute(
+            "DELETE FROM thread_map WHERE slack_thread_id = ?", (slack_thread_id,)
+        )
+
+    def touch(self, slack_thread_id: str, last_message_time: Opt[float] = None):
+        self.connection.execute(
+            "UPDATE thread_map SET last_message_time = ? WHERE slack_thread_id = ?",
+            (last_message_time or time.time(), slack_thread_id),
+        )
+
+    def expire(self, older_than: float, limit: int = 500) -> list:
+        # One write transaction, so a mapping touched by another process in the meantime survives
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            rows = self.connection.execute(
+                "SELECT * FROM thread_map WHERE last_message_time < ? ORDER BY last_message_time LIMIT ?",
+                (older_than, limit),
+            ).fetchall()
+            self.connection.executemany(
+                "DELETE FROM thread_map WHERE slack_thread_id = ?",
+                [(row["slack_thread_id"],) for row in rows],
+            )
+        return [dict(row) for row in rows]
+
+    def expired(self, older_than: float, limit: int = 500) -> list:
+        rows = self.connection.execute(
+            "SELECT * FROM thread_map WHERE last_message_time < ? ORDER BY last_message_time LIMIT ?",
+            (older_than, limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim(self, slack_thread_id: str, older_than: float) -> bool:
+        cursor = self.connection.execute(
+            "DELETE FROM thread_map WHERE slack_thread_id = ? AND last_message_time < ?",
+            (slack_thread_id, older_than),
+        )
+        return cursor.rowcount > 0
+
+    def restore(self, record: dict):
+        self.connection.execute(
+            "INSERT OR IGNORE INTO thread_map VALUES (?, ?, ?)",
+            (record["slack_thread_id"], record["openai_thread_id"], record["last_message_time"]),
+        )
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM thread_map").fetchone()[0]
+
+    def size_bytes(self) -> int:
+        return sum(
+            path.stat().st_size
+            for path in (self.path, self.path.with_name(self.path.name + "-wal"))
+            if path.exists()
+        )
+
+    def compact(self, min_free_bytes: int = 0) -> int:
+        page_size = self.connection.execute("PRAGMA page_size").fetchone()[0]
+        free_pages = self.connection.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free_pages or free_pages * page_size < min_free_bytes:
+            return 0
+
+        before = self.size_bytes()
+        self.connection.execute("VACUUM")
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        reclaimed = max(before - self.size_bytes(), 0)
+        self.log.info("Compacted thread map, reclaiming %s bytes.", reclaimed)
+        return reclaimed
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class TinyDBThreadMapStore(ThreadMapStore):
+    """
+    The original TinyDB JSON file, behind a lock so concurrent handlers can't corrupt
+    it. Every lookup is a scan and every write re-serializes the file, so prefer
+    `SQLiteThreadMapStore` for anything but small deployments.
+    """
+
+    def __init__(self, path):
+        from tinydb import TinyDB, Query
+
+        self.path = Path(path)
+        self.db = TinyDB(path)
+        self.query = Query()
+        self._lock = threading.Lock()
+
+    def get(self, slack_thread_id: str) -> Opt[dict]:
+        with self._lock:
+            mappings = self.db.search(self.query.slack_thread_id == slack_thread_id)
+        return dict(mappings[0]) if mappings else None
+
+    def put(self, slack_thread_id: str, openai_thread_id: str, last_message_time: Opt[float] = None):
+        record = {
+            "slack_thread_id": slack_thread_id,
+            "openai_thread_id": openai_thread_id,
+            "last_message_time": last_message_time or time.time(),
+        }
+        with self._lock:
+            self.db.upsert(record, self.query.slack_thread_id == slack_thread_id)
+
+    def delete(self, slack_thread_id: str):
+        with self._lock:
+            self.db.remove(self.query.slack_thread_id == slack_thread_id)
+
+    def touch(self, slack_thread_id: str, last_message_time: Opt[float] = None):
+        with self._lock:
+            self.db.update(
+                {"last_message_time": last_message_time or time.time()},
+                self.query.slack_thread_id == slack_thread_id,
+            )
+
+    def expire(self, older_than: float, limit: int = 500) -> list:
+        with self._lock:
+            records = self._expired(older_than, limit)
+            self.db.remove(doc_ids=[record.doc_id for record in records])
+        return [dict(record) for record in records]
+
+    def expired(self, older_than: float, limit: int = 500) -> list:
+        with self._lock:
+            return [dict(record) for record in self._expired(older_than, limit)]
+
+    def claim(self, slack_thread_id: str, older_than: float) -> bool:
+        with self._lock:
+            removed = self.db.remove(
+                (self.query.slack_thread_id == slack_thread_id) & (self.query.last_message_time < older_than)
+            )
+        return bool(removed)
+
+    def restore(self, record: dict):
+        with self._lock:
+            if not self.db.contains(self.query.slack_thread_id == record["slack_thread_id"]):
+                self.db.insert(dict(record))
+
+    def _expired(self, older_than: float, limit: int) -> list:
+        return sorted(
+            self.db.search(self.query.last_message_time < older_than),
+            key=lambda record: record["last_message_time"],
+        )[:limit]
+
+    def __len__(self) -> int:
+        return len(self.db)
+
+    def size_bytes(self) -> int:
+        # TinyDB rewrites the whole file on every write, so it never holds unused space
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    def close(self):
+        self.db.close()
+
+
+class CachedThreadMapStore(ThreadMapStore):
+    """
+    In-memory read-through LRU in front of another store. Writes go through to the
+    backend. Misses are not cached, so a mapping written by another process is picked
+    up on its next lookup. Cached records idle for longer than `ttl` are read from the
+    backend again, as another process may have expired them.
+
+    :param backend: The store to read through to.
+    :param maxsize: Maximum number of records kept in memory.
+    :param ttl: Idle time, in seconds, after which mappings expire. 0 if they never do.
+    """
+
+    def __init__(self, backend: ThreadMapStore, maxsize: int = 4096, ttl: float = 0):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, slack_thread_id: str) -> Opt[dict]:
+        with self._lock:
+            record = self._cache.get(slack_thread_id)
+            if record is not None and self.ttl and record["last_message_time"] < time.time() - self.ttl:
+                del self._cache[slack_thread_id]
+            elif record is not None:
+                self._cache.move_to_end(slack_thread_id)
+                return dict(record)
+
+        record = self.backend.get(slack_thread_id)
+        if record is not None:
+            self._remember(record)
+        return record
+
+    def put(self, slack_thread_id: str, openai_thread_id: str, last_message_time: Opt[float] = None):
+        last_message_time = last_message_time or time.time()
+        self.backend.put(slack_thread_id, openai_thread_id, last_message_time)
+        self._remember(
+            {
+                "slack_thread_id": slack_thread_id,
+                "openai_thread_id": openai_thread_id,
+                "last_message_time": last_message_time,
+            }
+        )
+
+    def delete(self, slack_thread_id: str):
+        self.backend.delete(slack_thread_id)
+        with self._lock:
+            self._cache.pop(slack_thread_id, None)
+
+    def touch(self, slack_thread_id: str, last_message_time: Opt[float] = None):
+        last_message_time = last_message_time or time.time()
+        self.backend.touch(slack_thread_id, last_message_time)
+        with self._lock:
+            record = self._cache.get(slack_thread_id)
+            if record is not None:
+                record["last_message_time"] = last_message_time
+
+    def expire(self, older_than: float, limit: int = 500) -> list:
+        records = self.backend.expire(older_than, limit)
+        with self._lock:
+            for record in records:
+                self._cache.pop(record["slack_thread_id"], None)
+        return records
+
+    def expired(self, older_than: float, limit: int = 500) -> list:
+        return self.backend.expired(older_than, limit)
+
+    def claim(self, slack_thread_id: str, older_than: float) -> bool:
+        claimed = self.backend.claim(slack_thread_id, older_than)
+        if claimed:
+            with self._lock:
+                self._cache.pop(slack_thread_id, None)
+        return claimed
+
+    def restore(self, record: dict):
+        self.backend.restore(record)
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    def size_bytes(self) -> int:
+        return self.backend.size_bytes()
+
+    def compact(self, min_free_bytes: int = 0) -> int:
+        return self.backend.compact(min_free_bytes)
+
+    def close(self):
+        self.backend.close()
+
+    def _remember(self, record: dict):
+        with self._lock:
+            self._cache[record["slack_thread_id"]] = record
+            self._cache.move_to_end(record["slack_thread_id"])
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
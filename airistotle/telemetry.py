@@ -0,0 +1,306 @@
+# Built-ins
+import atexit
+import bisect
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional as Opt
+
+# AIRISTOTLE
+from .logger import GlobalLogger
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_labels(key: tuple, extra: Opt[tuple] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(self.name, _render_labels(key), value) for key, value in self._values.items()]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: value for key, value in self._values.items()}
+
+
+class Gauge(Counter):
+    """Current value per label set, which may go up and down."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Distribution of observed values per label set, in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def quantile(self, q: float, **labels) -> float:
+        """Estimates the `q` quantile from the buckets, as Prometheus' histogram_quantile would."""
+        with self._lock:
+            entry = self._values.get(_label_key(labels))
+            if entry is None or not entry[2]:
+                return 0.0
+            counts = list(entry[0])
+            total = entry[2]
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def samples(self) -> list:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    samples.append((f"{self.name}_bucket", _render_labels(key, ("le", le)), cumulative))
+                samples.append((f"{self.name}_sum", _render_labels(key), total))
+                samples.append((f"{self.name}_count", _render_labels(key), count))
+        return samples
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: {"sum": total, "count": count} for key, (_, total, count) in self._values.items()}
+
+
+class MetricsRegistry:
+    """Named counters, gauges and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, metric_class, name: str, help: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, help, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name}{labels} {value}" for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+SPAN_SECONDS = METRICS.histogram(
+    "airistotle_span_seconds", "Duration of each traced stage of the message pipeline."
+)
+SPAN_ERRORS = METRICS.counter(
+    "airistotle_span_errors_total", "Traced stages which ended with an exception."
+)
+
+
+class Span:
+    """One timed stage of handling a message, with free-form attributes."""
+
+    def __init__(self, name: str, parent: Opt["Span"] = None, attributes: Opt[dict] = None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.duration = 0.0
+        self.status = "ok"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class TraceLog:
+    """
+    Appends finished spans to a file as JSON lines from a background thread, so
+    tracing never waits on disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write, name="trace-log", daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict):
+        self._queue.put(record)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _write(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                f.write(json.dumps(record, default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+
+_current_span = contextvars.ContextVar("airistotle_span", default=None)
+_trace_log = None
+
+
+def configure_trace_log(path: str):
+    """Starts writing every finished span to `path`. Flushed on interpreter exit."""
+    global _trace_log
+    if _trace_log is not None:
+        return
+    _trace_log = TraceLog(path)
+    atexit.register(_trace_log.close)
+
+
+def current_span() -> Opt[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, parent: Opt[Span] = None, **attributes):
+    """
+    Times the enclosed block as a span named `name`, a child of `parent` or of the
+    span currently active in this context. The duration is observed in
+    `airistotle_span_seconds{span=name}` and the span is written to the trace log,
+    if one is configured.
+    """
+    current = Span(name, parent or _current_span.get(), attributes)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.attributes.setdefault("error", repr(e))
+        SPAN_ERRORS.inc(span=name)
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _current_span.reset(token)
+        SPAN_SECONDS.observe(current.duration, span=name)
+        if _trace_log is not None:
+            _trace_log.write(current.record())
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serves `METRICS` at http://host:port/metrics from a background thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    GlobalLogger("Telemetry").info("Serving metrics on http://%s:%s/metrics", host, server.server_address[1])
+    return server
@@ -0,0 +1,128 @@
+# Built-ins
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# AIRISTOTLE
+from .logger import GlobalLogger
+from .settings import TOOL_WORKERS, TOOL_TIMEOUT, TOOL_PLUGIN_CONCURRENCY, TOOL_OUTPUT_TOKEN_BUDGET
+from .shaping import estimate_tokens, shape
+from .telemetry import span
+
+
+class ToolExecutor:
+    """
+    Runs all tool calls of a run concurrently on a bounded pool of threads. Each plugin
+    may additionally limit how many of its calls run at once through its
+    `max_concurrency` attribute (falling back to `TOOL_PLUGIN_CONCURRENCY`).
+
+    Results are shaped to the plugin's `output_token_budget` (falling back to
+    `TOOL_OUTPUT_TOKEN_BUDGET`) before they are returned, keeping the passages most
+    relevant to the call's arguments.
+
+    :param plugins: Mapping of function name to plugin instance.
+    :param max_workers: Size of the shared thread pool.
+    :param timeout: Seconds to wait for all calls of one run before giving up on the rest.
+    """
+
+    def __init__(self, plugins, max_workers: int = TOOL_WORKERS, timeout: float = TOOL_TIMEOUT):
+        self.log = GlobalLogger("ToolExecutor")
+        self.plugins = plugins
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="tool")
+        self._limits = {}
+        self._limits_lock = threading.Lock()
+
+    def run(self, tool_calls) -> list:
+        """
+        Executes `tool_calls` and returns one record per call, in order, with the keys
+        `tool_call_id`, `function`, `params`, `result`, `started` and `duration`.
+        """
+        started = time.monotonic()
+        # Each call runs in a copy of the caller's context, so its span joins the caller's trace
+        futures = [
+            self._pool.submit(contextvars.copy_context().run, self._call, tool_call)
+            for tool_call in tool_calls
+        ]
+
+        records = []
+        for tool_call, future in zip(tool_calls, futures):
+            remaining = max(self.timeout - (time.monotonic() - started), 0)
+            try:
+                records.append(future.result(timeout=remaining))
+            except FutureTimeoutError:
+                self.log.warning("Function call on '%s' timed out.", tool_call.function.name)
+                records.append(
+                    {
+                        "tool_call_id": tool_call.id,
+                        "function": tool_call.function.name,
+                        "params": tool_call.function.arguments,
+                        "result": f"An error occurred: function '{tool_call.function.name}' timed out.",
+                        "started": started,
+                        "duration": time.monotonic() - started,
+                    }
+                )
+
+        self.log.debug(
+            "Ran %s function call(s) in %.2fs.", len(records), time.monotonic() - started
+        )
+        return records
+
+    def _limit(self, name: str, plugin) -> threading.Semaphore:
+        with self._limits_lock:
+            if name not in self._limits:
+                limit = getattr(plugin, "max_concurrency", None) or TOOL_PLUGIN_CONCURRENCY
+                self._limits[name] = threading.BoundedSemaphore(limit)
+            return self._limits[name]
+
+    def _shape(self, name: str, plugin, result: str, params: dict) -> str:
+        budget = getattr(plugin, "output_token_budget", None) or TOOL_OUTPUT_TOKEN_BUDGET
+        original = estimate_tokens(result)
+        if original <= budget:
+            return result
+
+        query = " ".join(str(value) for value in params.values())
+        shaped = shape(result, query, budget)
+        if self.log.isEnabledFor(logging.DEBUG):
+            # Counting the tokens again is only worth it if the message is kept
+            self.log.debug("Shaped '%s' output from ~%s to ~%s tokens.", name, original, estimate_tokens(shaped))
+        return shaped
+
+    def _call(self, tool_call) -> dict:
+        func = tool_call.function
+        started = time.monotonic()
+        params = {}
+
+        try:
+            params = json.loads(func.arguments)
+            self.log.debug("Processing function call on '%s'", func.name)
+            self.log.audit("Function call params: %s", params)
+
+            if func.name in self.plugins:
+                with span(f"plugin.{func.name}") as call:
+                    plugin = self.plugins[func.name]
+                    limit = self._limit(func.name, plugin)
+                    waited = time.monotonic()
+                    with limit:
+                        call.set(queued=time.monotonic() - waited)
+                        result = plugin.run(**params)
+                    result = self._shape(func.name, plugin, str(result), params)
+            else:
+                result = f"An error occurred: function '{func.name}' could not be found."
+                self.log.warning("Function call on '%s' not found.", func.name)
+        except Exception as e:
+            self.log.error("Function call on '%s' failed: %s", func.name, e)
+            result = f"An error occurred: {e}"
+
+        return {
+            "tool_call_id": tool_call.id,
+            "function": func.name,
+            "params": params,
+            "result": str(result),
+            "started": started,
+            "duration": time.monotonic() - started,
+        }
@@ -0,0 +1,454 @@
+"""
+Local stand-in for the OpenAI Assistants endpoints airistotle uses: assistants,
+threads, messages and runs, including requires_action tool calls and streamed runs.
+Runs move through queued, in_progress, requires_action and completed on a clock, with
+configurable latencies, so polling and streaming behave as they would against the API.
+
+    python -m benchmarks.fake_openai [--port 8701] [--run-latency 1.0] [--tool-calls 1]
+"""
+
+# Built-ins
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TERMINAL_STATUSES = ["completed", "cancelled", "expired", "failed"]
+
+
+class Latencies:
+    """
+    Simulated timings of the fake API, in seconds.
+
+    :param api: Added to every request.
+    :param queue: Time a new run spends queued.
+    :param run: Time the model spends on each step of a run, before and after tool calls.
+    :param stream_chunks: Number of deltas a streamed reply is split into.
+    :param tool_calls: Tool calls requested per round; 0 completes runs without tools.
+    :param tool_rounds: Number of requires_action rounds per run.
+    :param tools: Function names the fake model calls, in turn.
+    :param tool_arguments: JSON arguments passed with each tool call.
+    :param error_rate: Fraction of requests answered with a 429 and a Retry-After header.
+    """
+
+    def __init__(
+        self,
+        api: float = 0.05,
+        queue: float = 0.2,
+        run: float = 1.0,
+        stream_chunks: int = 8,
+        tool_calls: int = 1,
+        tool_rounds: int = 1,
+        tools: tuple = ("sleep_tool",),
+        tool_arguments: str = "{}",
+        error_rate: float = 0.0,
+    ):
+        self.api = api
+        self.queue = queue
+        self.run = run
+        self.stream_chunks = stream_chunks
+        self.tool_calls = tool_calls
+        self.tool_rounds = tool_rounds
+        self.tools = tools
+        self.tool_arguments = tool_arguments
+        self.error_rate = error_rate
+
+
+class FakeAssistantsState:
+    """In-memory threads, messages and runs, advanced lazily whenever they are read."""
+
+    def __init__(self, latencies: Latencies):
+        self.latencies = latencies
+        self.threads = {}
+        self.runs = {}
+        self.lock = threading.RLock()
+        self.counts = {}
+        self._ids = itertools.count(1)
+
+    def new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids):012d}"
+
+    def count(self, name: str):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def create_thread(self) -> dict:
+        thread = {"id": self.new_id("thread"), "object": "thread", "created_at": int(time.time()), "metadata": {}}
+        with self.lock:
+            self.threads[thread["id"]] = {"thread": thread, "messages": [], "run": None}
+        return thread
+
+    def create_message(self, thread_id: str, role: str, text: str, run_id=None, assistant_id=None) -> dict:
+        message = {
+            "id": self.new_id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": role,
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            "assistant_id": assistant_id,
+            "run_id": run_id,
+            "status": "completed",
+            "attachments": [],
+            "metadata": {},
+        }
+        with self.lock:
+            self.threads[thread_id]["messages"].append(message)
+        return message
+
+    def active_run(self, thread_id: str):
+        with self.lock:
+            run_id = self.threads[thread_id]["run"]
+            if run_id is None:
+                return None
+            run = self.advance(self.runs[run_id])
+            return None if run["status"] in TERMINAL_STATUSES else run
+
+    def create_run(self, thread_id: str, assistant_id: str) -> dict:
+        now = time.time()
+        run = {
+            "id": self.new_id("run"),
+            "object": "thread.run",
+            "created_at": int(now),
+            "thread_id": thread_id,
+            "assistant_id": assistant_id,
+            "status": "queued",
+            "required_action": None,
+            "last_error": None,
+            "model": "fake",
+            "instructions": "",
+            "tools": [],
+            "metadata": {},
+            "_started": now,
+            "_step_due": now + self.latencies.queue + self.latencies.run,
+            "_rounds_left": self.latencies.tool_rounds if self.latencies.tool_calls else 0,
+        }
+        with self.lock:
+            self.runs[run["id"]] = run
+            self.threads[thread_id]["run"] = run["id"]
+        return run
+
+    def advance(self, run: dict) -> dict:
+        """Moves `run` along its timeline up to the current time."""
+        with self.lock:
+            if run["status"] in TERMINAL_STATUSES or run["status"] == "requires_action":
+                return run
+            now = time.time()
+            if now < run["_started"] + self.latencies.queue:
+                return run
+            if now < run["_step_due"]:
+                run["status"] = "in_progress"
+                return run
+
+            if run["_rounds_left"]:
+                run["status"] = "requires_action"
+                run["required_action"] = {
+                    "type": "submit_tool_outputs",
+                    "submit_tool_outputs": {
+                        "tool_calls": [
+                            {
+                                "id": self.new_id("call"),
+                                "type": "function",
+                                "function": {
+                                    "name": self.latencies.tools[index % len(self.latencies.tools)],
+                                    "arguments": self.latencies.tool_arguments,
+                                },
+                            }
+                            for index in range(self.latencies.tool_calls)
+                        ]
+                    },
+                }
+            else:
+                self.complete(run)
+            return run
+
+    def complete(self, run: dict):
+        with self.lock:
+            run["status"] = "completed"
+            run["completed_at"] = int(time.time())
+            self.create_message(
+                run["thread_id"],
+                "assistant",
+                f"This is a benchmark reply to run {run['id']}.",
+                run_id=run["id"],
+                assistant_id=run["assistant_id"],
+            )
+
+    def submit_tool_outputs(self, run: dict, tool_outputs: list) -> dict:
+        with self.lock:
+            if run["status"] != "requires_action":
+                raise ValueError(f"Runs in status {run['status']} do not accept tool outputs.")
+            expected = {call["id"] for call in run["required_action"]["submit_tool_outputs"]["tool_calls"]}
+            if expected != {output.get("tool_call_id") for output in tool_outputs}:
+                raise ValueError("Tool outputs do not match the requested tool calls.")
+            run["status"] = "in_progress"
+            run["required_action"] = None
+            run["_rounds_left"] -= 1
+            run["_step_due"] = time.time() + self.latencies.run
+            run["_started"] = 0
+        return run
+
+
+def public(item: dict) -> dict:
+    return {key: value for key, value in item.items() if not key.startswith("_")}
+
+
+class FakeAssistantsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: FakeAssistantsState = None
+
+    ROUTES = [
+        ("GET", r"/v1/_stats", "stats"),
+        ("GET", r"/v1/assistants/(?P<assistant_id>[^/]+)", "get_assistant"),
+        ("POST", r"/v1/threads", "create_thread"),
+        ("DELETE", r"/v1/threads/(?P<thread_id>[^/]+)", "delete_thread"),
+        ("POST", r"/v1/threads/(?P<thread_id>[^/]+)/messages", "create_message"),
+        ("GET", r"/v1/threads/(?P<thread_id>[^/]+)/messages", "list_messages"),
+        ("DELETE", r"/v1/threads/(?P<thread_id>[^/]+)/messages/(?P<message_id>[^/]+)", "delete_message"),
+        ("POST", r"/v1/threads/(?P<thread_id>[^/]+)/runs", "create_run"),
+        ("GET", r"/v1/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)", "get_run"),
+        (
+            "POST",
+            r"/v1/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/submit_tool_outputs",
+            "submit_tool_outputs",
+        ),
+    ]
+
+    def do_GET(self):
+        self.route("GET")
+
+    def do_POST(self):
+        self.route("POST")
+
+    def do_DELETE(self):
+        self.route("DELETE")
+
+    def log_message(self, format, *args):
+        pass
+
+    def route(self, method: str):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        time.sleep(self.state.latencies.api)
+        if random.random() < self.state.latencies.error_rate:
+            self.state.count("throttled")
+            self.send_json(429, {"error": {"message": "Rate limit reached.", "type": "requests"}}, {"Retry-After": "1"})
+            return
+
+        for route_method, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if route_method == method and match:
+                self.state.count(name)
+                try:
+                    getattr(self, name)(body=body, query=query, **match.groupdict())
+                except KeyError as e:
+                    self.send_json(404, {"error": {"message": f"No such object: {e}", "type": "invalid_request_error"}})
+                except ValueError as e:
+                    self.send_json(400, {"error": {"message": str(e), "type": "invalid_request_error"}})
+                return
+        self.send_json(404, {"error": {"message": f"Unknown route {method} {url.path}", "type": "invalid_request_error"}})
+
+    def send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def stats(self, **_):
+        """Requests served per route since startup; not part of the real API."""
+        with self.state.lock:
+            self.send_json(200, dict(self.state.counts))
+
+    def get_assistant(self, assistant_id: str, **_):
+        self.send_json(
+            200,
+            {
+                "id": assistant_id,
+                "object": "assistant",
+                "created_at": 0,
+                "name": "Benchmark",
+                "description": None,
+                "model": "fake",
+                "instructions": "",
+                "tools": [],
+                "metadata": {},
+            },
+        )
+
+    def create_thread(self, **_):
+        self.send_json(200, self.state.create_thread())
+
+    def delete_thread(self, thread_id: str, **_):
+        with self.state.lock:
+            del self.state.threads[thread_id]
+        self.send_json(200, {"id": thread_id, "object": "thread.deleted", "deleted": True})
+
+    def create_message(self, thread_id: str, body: dict, **_):
+        if self.state.active_run(thread_id):
+            raise ValueError(f"Can't add messages to {thread_id} while a run is active.")
+        content = body.get("content", "")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content)
+        self.send_json(200, self.state.create_message(thread_id, body.get("role", "user"), content))
+
+    def list_messages(self, thread_id: str, query: dict, **_):
+        with self.state.lock:
+            messages = list(self.state.threads[thread_id]["messages"])
+        if query.get("run_id"):
+            messages = [message for message in messages if message["run_id"] == query["run_id"]]
+        if query.get("order", "desc") == "desc":
+            messages.reverse()
+        ids = [message["id"] for message in messages]
+        if query.get("after") in ids:
+            messages = messages[ids.index(query["after"]) + 1 :]
+        elif query.get("before") in ids:
+            messages = messages[: ids.index(query["before"])]
+        limit = int(query.get("limit", 20))
+        page = messages[:limit]
+        self.send_json(
+            200,
+            {
+                "object": "list",
+                "data": page,
+                "first_id": page[0]["id"] if page else None,
+                "last_id": page[-1]["id"] if page else None,
+                "has_more": len(messages) > limit,
+            },
+        )
+
+    def delete_message(self, thread_id: str, message_id: str, **_):
+        with self.state.lock:
+            messages = self.state.threads[thread_id]["messages"]
+            messages[:] = [message for message in messages if message["id"] != message_id]
+        self.send_json(200, {"id": message_id, "object": "thread.message.deleted", "deleted": True})
+
+    def create_run(self, thread_id: str, body: dict, **_):
+        if thread_id not in self.state.threads:
+            raise KeyError(thread_id)
+        if self.state.active_run(thread_id):
+            raise ValueError(f"Thread {thread_id} already has an active run.")
+        run = self.state.create_run(thread_id, body.get("assistant_id"))
+        if body.get("stream"):
+            self.stream(run, created=True)
+        else:
+            self.send_json(200, public(run))
+
+    def get_run(self, run_id: str, **_):
+        self.send_json(200, public(self.state.advance(self.state.runs[run_id])))
+
+    def submit_tool_outputs(self, run_id: str, body: dict, **_):
+        run = self.state.submit_tool_outputs(self.state.runs[run_id], body.get("tool_outputs", []))
+        if body.get("stream"):
+            self.stream(run, created=False)
+        else:
+            self.send_json(200, public(run))
+
+    def stream(self, run: dict, created: bool):
+        """Answers with server-sent events, sleeping through the run's timeline as it goes."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(event: str, data):
+            payload = data if isinstance(data, str) else json.dumps(data)
+            self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode())
+            self.wfile.flush()
+
+        if created:
+            send("thread.run.created", public(run))
+            send("thread.run.queued", public(run))
+        while True:
+            run = self.state.advance(run)
+            if run["status"] in ("queued", "in_progress"):
+                if run["status"] == "in_progress":
+                    send("thread.run.in_progress", public(run))
+                    time.sleep(max(run["_step_due"] - time.time(), 0))
+                else:
+                    time.sleep(max(run["_started"] + self.state.latencies.queue - time.time(), 0))
+                continue
+            break
+
+        if run["status"] == "requires_action":
+            send("thread.run.requires_action", public(run))
+        else:
+            with self.state.lock:
+                message = self.state.threads[run["thread_id"]]["messages"][-1]
+            text = message["content"][0]["text"]["value"]
+            send("thread.message.created", dict(message, content=[], status="in_progress"))
+            chunks = max(self.state.latencies.stream_chunks, 1)
+            size = -(-len(text) // chunks)
+            for index in range(0, len(text), size):
+                send(
+                    "thread.message.delta",
+                    {
+                        "id": message["id"],
+                        "object": "thread.message.delta",
+                        "delta": {
+                            "content": [
+                                {"index": 0, "type": "text", "text": {"value": text[index : index + size], "annotations": []}}
+                            ]
+                        },
+                    },
+                )
+            send("thread.message.completed", message)
+            send("thread.run.completed", public(run))
+        send("done", "[DONE]")
+
+
+def serve(latencies: Latencies, port: int = 0, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Starts the fake API in a background thread and returns its server; see `server_address`."""
+    handler = type("Handler", (FakeAssistantsHandler,), {"state": FakeAssistantsState(latencies)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8701)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--queue-latency", type=float, default=0.2)
+    parser.add_argument("--run-latency", type=float, default=1.0)
+    parser.add_argument("--tool-calls", type=int, default=1)
+    parser.add_argument("--tool-rounds", type=int, default=1)
+    parser.add_argument("--tools", default="sleep_tool")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = serve(
+        Latencies(
+            api=args.api_latency,
+            queue=args.queue_latency,
+            run=args.run_latency,
+            tool_calls=args.tool_calls,
+            tool_rounds=args.tool_rounds,
+            tools=tuple(args.tools.split(",")),
+            error_rate=args.error_rate,
+        ),
+        port=args.port,
+    )
+    print(f"Fake OpenAI API on http://127.0.0.1:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
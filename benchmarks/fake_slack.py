@@ -0,0 +1,133 @@
+"""
+Local stand-in for the parts of the Slack Web API the Slack interfaces call, and
+builders for the `app_mention` and `message` events they handle. Point
+`AIRISTOTLE_SLACK_API_URL` at the server before the interface is imported.
+"""
+
+# Built-ins
+import itertools
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BOT_USER_ID = "UBENCHBOT"
+TEAM_ID = "TBENCH"
+
+_event_ids = itertools.count(1)
+
+
+def app_mention_event(channel: str, ts: str, text: str, thread_ts: str = None) -> dict:
+    """Returns the Events API envelope of a mention of the bot in a channel."""
+    event = {
+        "type": "app_mention",
+        "user": "UBENCHUSER",
+        "text": f"<@{BOT_USER_ID}> {text}",
+        "ts": ts,
+        "channel": channel,
+        "event_ts": ts,
+    }
+    if thread_ts:
+        event["thread_ts"] = thread_ts
+    return envelope(event)
+
+
+def direct_message_event(channel: str, ts: str, text: str) -> dict:
+    """Returns the Events API envelope of a direct message to the bot."""
+    return envelope(
+        {
+            "type": "message",
+            "channel_type": "im",
+            "user": "UBENCHUSER",
+            "text": text,
+            "ts": ts,
+            "channel": channel,
+            "event_ts": ts,
+        }
+    )
+
+
+def envelope(event: dict) -> dict:
+    return {
+        "token": "bench",
+        "team_id": TEAM_ID,
+        "api_app_id": "ABENCH",
+        "type": "event_callback",
+        "event_id": f"Ev{next(_event_ids):010d}",
+        "event_time": int(time.time()),
+        "event": event,
+    }
+
+
+class FakeSlackHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    counts = None
+    lock = None
+    ids = None
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        method = url.path.rsplit("/", 1)[-1]
+        if "/upload/" in url.path:
+            method = "upload"
+        with self.lock:
+            self.counts[method] = self.counts.get(method, 0) + 1
+        time.sleep(self.latency)
+
+        if method == "upload":
+            self.send(200, b"OK", "text/plain")
+            return
+
+        if "json" in self.headers.get("Content-Type", ""):
+            params = json.loads(raw or b"{}")
+        else:
+            params = {key: values[0] for key, values in parse_qs(raw.decode()).items()}
+
+        ts = f"{time.time():.6f}"
+        file_id = f"FBENCH{next(self.ids)}"
+        base = f"http://{self.headers['Host']}"
+        responses = {
+            "auth.test": {"user_id": BOT_USER_ID, "bot_id": "BBENCH", "team_id": TEAM_ID, "user": "bench", "url": base},
+            "chat.postMessage": {"channel": params.get("channel"), "ts": ts, "message": {"text": params.get("text"), "ts": ts}},
+            "chat.update": {"channel": params.get("channel"), "ts": params.get("ts"), "text": params.get("text")},
+            "chat.delete": {"channel": params.get("channel"), "ts": params.get("ts")},
+            "files.getUploadURLExternal": {"upload_url": f"{base}/upload/{file_id}", "file_id": file_id},
+            "files.completeUploadExternal": {
+                "files": [{"id": file_id, "permalink": f"{base}/files/{file_id}"}]
+            },
+        }
+        if method in responses:
+            self.send(200, json.dumps(dict(responses[method], ok=True)).encode())
+        else:
+            self.send(200, json.dumps({"ok": False, "error": "unknown_method"}).encode())
+
+    do_GET = do_POST
+
+    def send(self, status: int, data: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(latency: float = 0.0, port: int = 0, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Starts the fake Web API in a background thread. Call counts are on `server.counts`."""
+    handler = type(
+        "Handler",
+        (FakeSlackHandler,),
+        {"latency": latency, "counts": {}, "lock": threading.Lock(), "ids": itertools.count(1)},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.counts = handler.counts
+    threading.Thread(target=server.serve_forever, name="fake-slack", daemon=True).start()
+    return server
@@ -0,0 +1,417 @@
+"""
+Offline load test. Replays Slack events into a Slack interface backed by a fake
+OpenAI Assistants API, a fake Slack Web API and stub plugins, and reports throughput,
+end-to-end latency percentiles and resource use at each concurrency level.
+
+    python -m benchmarks.load [--concurrency 1,8,32] [--messages 64] [--interface sync]
+
+The fake OpenAI API runs in its own process so its simulated latencies don't compete
+with the code under test. Nothing leaves the machine.
+"""
+
+# Built-ins
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import queue
+import re
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from pathlib import Path
+
+# AIRISTOTLE
+from . import fake_slack
+
+ROOT = Path(__file__).parent.parent
+
+MARKER = re.compile(r"\[bench-(\d+)\]")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_openai(args) -> tuple:
+    """Starts `benchmarks.fake_openai` in a subprocess and returns it with its base URL."""
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_openai",
+            "--port", str(port),
+            "--api-latency", str(args.api_latency),
+            "--queue-latency", str(args.queue_latency),
+            "--run-latency", str(args.run_latency),
+            "--tool-calls", str(args.tool_calls),
+            "--tool-rounds", str(args.tool_rounds),
+            "--tools", args.tools,
+            "--error-rate", str(args.error_rate),
+        ],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}/v1"
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            urllib.request.urlopen(f"{base_url}/_stats", timeout=1).read()
+            return process, base_url
+        except OSError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("The fake OpenAI API did not start.")
+            time.sleep(0.05)
+
+
+def openai_requests(base_url: str) -> int:
+    with urllib.request.urlopen(f"{base_url}/_stats", timeout=5) as response:
+        counts = json.load(response)
+    return sum(count for route, count in counts.items() if route != "stats")
+
+
+def configure_environment(args, openai_url: str, slack_url: str, workdir: str):
+    """Points the settings at the fakes and at throwaway storage. Must run before importing airistotle."""
+    os.environ.update(
+        {
+            "AIRISTOTLE_OPENAI_API_KEY": "bench",
+            "AIRISTOTLE_OPENAI_BASE_URL": openai_url,
+            "AIRISTOTLE_ASSISTANT_ID": "asst_bench",
+            "AIRISTOTLE_SLACK_BOT_TOKEN": "xoxb-bench",
+            "AIRISTOTLE_SLACK_APP_TOKEN": "xapp-bench",
+            "AIRISTOTLE_SLACK_SIGNING_SECRET": "bench",
+            "AIRISTOTLE_SLACK_API_URL": slack_url,
+            "AIRISTOTLE_SLACK_STREAMING": str(args.streaming).lower(),
+            "AIRISTOTLE_THREAD_MAP_LOCATION": str(Path(workdir) / "thread_map.sqlite3"),
+            "AIRISTOTLE_CACHE_DISK_LOCATION": str(Path(workdir) / "cache.sqlite3"),
+            "AIRISTOTLE_BLOB_STORE_LOCATION": str(Path(workdir) / "blobs"),
+            "AIRISTOTLE_PLUGIN_DISCOVERY": "false",
+            "AIRISTOTLE_PLUGIN_WARMUP": "false",
+            "AIRISTOTLE_LOG_LEVEL": str(args.log_level),
+        }
+    )
+
+
+def register_stub_plugins(args):
+    from airistotle.settings import AVAILABLE_PLUGINS
+
+    AVAILABLE_PLUGINS.register(
+        "benchmarks.stub_plugins", "SleepTool", lambda plugin_class: plugin_class(args.sleep_delay)
+    )
+    AVAILABLE_PLUGINS.register(
+        "benchmarks.stub_plugins", "CpuTool", lambda plugin_class: plugin_class(args.cpu_delay)
+    )
+
+
+class Replayer:
+    """
+    Dispatches events into a Slack interface the way the socket mode handler does, and
+    tracks when the reply to each one has been posted.
+    """
+
+    def __init__(self, interface: str):
+        self.interface = interface
+        self.done = {}
+        self.failed = set()
+        self.lock = threading.Lock()
+        self.loop = None
+
+        if interface == "async":
+            from airistotle.interfaces import slack_async as module
+        else:
+            from airistotle.interfaces import slack as module
+        self.module = module
+        self._wrap_respond()
+        if interface == "async":
+            self._start_loop()
+
+    def _finish(self, prompt: str, failed: bool):
+        match = MARKER.search(prompt or "")
+        if not match:
+            return
+        with self.lock:
+            event = self.done.get(int(match.group(1)))
+            if failed:
+                self.failed.add(int(match.group(1)))
+        if event is not None:
+            event.set()
+
+    def _wrap_respond(self):
+        respond = self.module.respond
+        replayer = self
+
+        if self.interface == "async":
+            async def timed_respond(prompt, *args, **kwargs):
+                try:
+                    await respond(prompt, *args, **kwargs)
+                except BaseException:
+                    replayer._finish(prompt, failed=True)
+                    raise
+                replayer._finish(prompt, failed=False)
+        else:
+            def timed_respond(prompt, *args, **kwargs):
+                try:
+                    respond(prompt, *args, **kwargs)
+                except BaseException:
+                    replayer._finish(prompt, failed=True)
+                    raise
+                replayer._finish(prompt, failed=False)
+
+        self.module.respond = timed_respond
+
+    def _start_loop(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="bench-loop", daemon=True).start()
+        # The same setup as slack_async.main(), minus the socket
+        asyncio.run_coroutine_threadsafe(self.module.start(metrics_port=0), self.loop).result()
+
+    def close(self):
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self.module.stop(), self.loop).result()
+
+    def dispatch(self, body: dict, message_id: int = None) -> threading.Event:
+        """Dispatches `body`, tracking the reply to `message_id` if given."""
+        event = threading.Event()
+        if message_id is not None:
+            with self.lock:
+                self.done[message_id] = event
+
+        if self.interface == "async":
+            from slack_bolt.request.async_request import AsyncBoltRequest
+
+            request = AsyncBoltRequest(body=body, mode="socket_mode")
+            asyncio.run_coroutine_threadsafe(self.module.app.async_dispatch(request), self.loop).result()
+        else:
+            from slack_bolt.request import BoltRequest
+
+            self.module.app.dispatch(BoltRequest(body=body, mode="socket_mode"))
+        return event
+
+
+class ResourceSampler:
+    """Samples the thread count in the background; CPU and memory come from getrusage."""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="bench-sampler", daemon=True)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.usage = resource.getrusage(resource.RUSAGE_SELF)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.wall = time.perf_counter() - self.started
+        self.cpu = (usage.ru_utime - self.usage.ru_utime) + (usage.ru_stime - self.usage.ru_stime)
+        self.max_rss_mb = usage.ru_maxrss / 1024
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_level(replayer: Replayer, args, concurrency: int, ids, openai_url: str, slack_server) -> dict:
+    """
+    Runs `args.messages` messages with `concurrency` simulated users. Each user holds
+    one conversation at a time and sends `args.turns` messages in it, waiting for each
+    reply before sending the next.
+    """
+    conversations = queue.Queue()
+    for index in range(-(-args.messages // args.turns)):
+        conversations.put(index)
+
+    latencies, errors, timeouts, redelivered = [], [0], [0], [0]
+    lock = threading.Lock()
+
+    def user():
+        while True:
+            try:
+                conversation = conversations.get_nowait()
+            except queue.Empty:
+                return
+            direct = args.dm_ratio and (conversation % round(1 / args.dm_ratio) == 0)
+            channel = f"D{conversation:06d}" if direct else "CBENCH"
+            thread_ts = None
+            for turn in range(args.turns):
+                message_id = next(ids)
+                ts = f"{time.time():.6f}{message_id % 1000:03d}"
+                text = f"[bench-{message_id}] What is the answer to question {turn}?"
+                if direct:
+                    body = fake_slack.direct_message_event(channel, ts, text)
+                else:
+                    body = fake_slack.app_mention_event(channel, ts, text, thread_ts=thread_ts)
+                    thread_ts = thread_ts or ts
+
+                started = time.perf_counter()
+                done = replayer.dispatch(body, message_id)
+                if args.redelivery_rate and message_id % round(1 / args.redelivery_rate) == 0:
+                    # Slack's retry of an event it thinks wasn't acked in time
+                    replayer.dispatch(body)
+                    with lock:
+                        redelivered[0] += 1
+                finished = done.wait(args.timeout)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    if not finished:
+                        timeouts[0] += 1
+                    elif message_id in replayer.failed:
+                        errors[0] += 1
+                    else:
+                        latencies.append(elapsed)
+
+    openai_before = openai_requests(openai_url)
+    slack_before = sum(slack_server.counts.values())
+    duplicates_before = duplicate_events()
+    with ResourceSampler() as resources:
+        users = [threading.Thread(target=user, name=f"bench-user-{i}") for i in range(concurrency)]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
+
+    sent = len(latencies) + errors[0] + timeouts[0]
+    return {
+        "concurrency": concurrency,
+        "messages": sent,
+        "completed": len(latencies),
+        "errors": errors[0],
+        "timeouts": timeouts[0],
+        "wall_s": resources.wall,
+        "throughput_msg_s": len(latencies) / resources.wall if resources.wall else 0.0,
+        "p50_s": percentile(latencies, 0.50),
+        "p95_s": percentile(latencies, 0.95),
+        "p99_s": percentile(latencies, 0.99),
+        "max_s": max(latencies, default=0.0),
+        "cpu_percent": 100 * resources.cpu / resources.wall if resources.wall else 0.0,
+        "max_rss_mb": resources.max_rss_mb,
+        "peak_threads": resources.peak_threads,
+        "openai_requests_per_msg": (openai_requests(openai_url) - openai_before) / max(sent, 1),
+        "slack_requests_per_msg": (sum(slack_server.counts.values()) - slack_before) / max(sent, 1),
+        "redelivered": redelivered[0],
+        "duplicates_dropped": duplicate_events() - duplicates_before,
+    }
+
+
+def duplicate_events() -> int:
+    from airistotle.interfaces.dedup import DUPLICATE_EVENTS
+
+    return sum(DUPLICATE_EVENTS.snapshot().values())
+
+
+def report(results: list):
+    header = (
+        f"{'users':>6} {'msgs':>5} {'err':>4} {'msg/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} "
+        f"{'max':>7} {'cpu%':>6} {'rss MB':>7} {'thr':>4} {'oai/msg':>8} {'slk/msg':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['concurrency']:>6} {result['messages']:>5} {result['errors'] + result['timeouts']:>4} "
+            f"{result['throughput_msg_s']:>7.2f} {result['p50_s']:>7.2f} {result['p95_s']:>7.2f} "
+            f"{result['p99_s']:>7.2f} {result['max_s']:>7.2f} {result['cpu_percent']:>6.1f} "
+            f"{result['max_rss_mb']:>7.1f} {result['peak_threads']:>4} "
+            f"{result['openai_requests_per_msg']:>8.1f} {result['slack_requests_per_msg']:>8.1f}"
+        )
+    for result in results:
+        if result["redelivered"]:
+            print(
+                f"{result['concurrency']:>6} users: {result['redelivered']} events redelivered, "
+                f"{result['duplicates_dropped']} dropped as duplicates"
+            )
+
+
+def report_stages():
+    """Prints the mean time of each traced stage over the whole benchmark."""
+    from airistotle.telemetry import SPAN_SECONDS
+
+    print(f"\n{'stage':<36} {'count':>7} {'mean ms':>9}")
+    for key, values in sorted(SPAN_SECONDS.snapshot().items()):
+        name = dict(key).get("span", "")
+        print(f"{name:<36} {values['count']:>7} {1000 * values['sum'] / values['count']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--interface", choices=["sync", "async"], default="sync")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated numbers of simultaneous users.")
+    parser.add_argument("--messages", type=int, default=64, help="Messages sent per concurrency level.")
+    parser.add_argument("--turns", type=int, default=2, help="Messages per conversation.")
+    parser.add_argument("--dm-ratio", type=float, default=0.25, help="Share of conversations held in DMs.")
+    parser.add_argument("--streaming", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for each reply.")
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--queue-latency", type=float, default=0.2)
+    parser.add_argument("--run-latency", type=float, default=1.0)
+    parser.add_argument("--tool-calls", type=int, default=1, help="Tool calls per requires_action round.")
+    parser.add_argument("--tool-rounds", type=int, default=1)
+    parser.add_argument("--tools", default="sleep_tool,cpu_tool", help="Comma-separated stub plugins to call.")
+    parser.add_argument("--sleep-delay", type=float, default=0.5, help="Seconds sleep_tool blocks for.")
+    parser.add_argument("--cpu-delay", type=float, default=0.05, help="Seconds of CPU cpu_tool burns.")
+    parser.add_argument("--slack-latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of OpenAI requests answered with 429.")
+    parser.add_argument("--redelivery-rate", type=float, default=0.0, help="Share of Slack events delivered twice.")
+    parser.add_argument("--log-level", type=int, default=40)
+    parser.add_argument("--stages", action="store_true", help="Also print the mean time of each traced stage.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    if (ROOT / ".env").exists():
+        parser.error(f"{ROOT / '.env'} would override the benchmark's settings; move it aside first.")
+
+    process, openai_url = start_fake_openai(args)
+    slack_server = fake_slack.serve(latency=args.slack_latency)
+    slack_url = f"http://127.0.0.1:{slack_server.server_address[1]}/api/"
+    try:
+        with tempfile.TemporaryDirectory(prefix="airistotle-bench-") as workdir:
+            configure_environment(args, openai_url, slack_url, workdir)
+            sys.path.insert(0, str(ROOT))
+            register_stub_plugins(args)
+            replayer = Replayer(args.interface)
+
+            ids = itertools.count(1)
+            results = []
+            try:
+                for concurrency in [int(level) for level in args.concurrency.split(",")]:
+                    results.append(run_level(replayer, args, concurrency, ids, openai_url, slack_server))
+            finally:
+                replayer.close()
+
+            report(results)
+            if args.stages:
+                report_stages()
+            if args.json:
+                with open(args.json, "w") as f:
+                    json.dump({"arguments": vars(args), "results": results}, f, indent=2)
+    finally:
+        process.terminate()
+        slack_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
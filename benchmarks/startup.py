@@ -0,0 +1,78 @@
+"""
+Cold start benchmark. Times fresh interpreters importing airistotle, and optionally
+loading each plugin, so regressions in the import chain show up before they slow
+down deploys.
+
+    python -m benchmarks.startup [--runs 10] [--plugins] [--importtime]
+"""
+
+# Built-ins
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+IMPORT = "import airistotle"
+LOAD_PLUGIN = "from airistotle.settings import AVAILABLE_PLUGINS; AVAILABLE_PLUGINS[{name!r}]"
+
+
+def time_command(code: str, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(label: str, timings: list):
+    print(
+        f"{label:<32} min {min(timings) * 1000:8.1f} ms   "
+        f"median {statistics.median(timings) * 1000:8.1f} ms   "
+        f"max {max(timings) * 1000:8.1f} ms"
+    )
+
+
+def import_time(code: str, top: int = 15):
+    """Prints the modules with the largest cumulative import time, from -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative), module))
+    for cumulative, module in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--plugins", action="store_true", help="Also time loading each plugin.")
+    parser.add_argument("--importtime", action="store_true", help="Show the slowest imports.")
+    args = parser.parse_args()
+
+    report("baseline interpreter", time_command("pass", args.runs))
+    report(IMPORT, time_command(IMPORT, args.runs))
+
+    if args.plugins:
+        from airistotle.settings import AVAILABLE_PLUGINS
+
+        for name in AVAILABLE_PLUGINS:
+            report(f"load plugin {name}", time_command(LOAD_PLUGIN.format(name=name), args.runs))
+
+    if args.importtime:
+        print(f"\nSlowest imports for '{IMPORT}':")
+        import_time(IMPORT)
+
+
+if __name__ == "__main__":
+    main()
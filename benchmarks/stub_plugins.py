@@ -0,0 +1,64 @@
+"""Plugins that stand in for real ones in benchmarks, taking a set amount of time."""
+
+# Built-ins
+import time
+
+# AIRISTOTLE
+from airistotle.plugins.base import BasePlugin
+
+
+class SleepTool(BasePlugin):
+    """
+    {
+        "name": "sleep_tool",
+        "description": "Waits, like a plugin blocked on network I/O.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "seconds": {
+                    "type": "number",
+                    "description": "How long to wait. Defaults to the configured delay."
+                }
+            }
+        }
+    }
+    """
+    name = "sleep_tool"
+    description = "Waits, like a plugin blocked on network I/O."
+
+    def __init__(self, delay: float = 0.5):
+        self.delay = delay
+
+    def run(self, seconds: float = None) -> str:
+        time.sleep(self.delay if seconds is None else seconds)
+        return "Done waiting."
+
+
+class CpuTool(BasePlugin):
+    """
+    {
+        "name": "cpu_tool",
+        "description": "Keeps a CPU busy, like a plugin parsing or ranking documents.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "seconds": {
+                    "type": "number",
+                    "description": "How long to compute. Defaults to the configured delay."
+                }
+            }
+        }
+    }
+    """
+    name = "cpu_tool"
+    description = "Keeps a CPU busy, like a plugin parsing or ranking documents."
+
+    def __init__(self, delay: float = 0.1):
+        self.delay = delay
+
+    def run(self, seconds: float = None) -> str:
+        deadline = time.perf_counter() + (self.delay if seconds is None else seconds)
+        iterations = 0
+        while time.perf_counter() < deadline:
+            iterations += sum(i * i for i in range(1000)) & 1
+        return f"Done computing ({iterations})."
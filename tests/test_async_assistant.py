@@ -0,0 +1,33 @@
+import asyncio
+import itertools
+
+from airistotle import async_assistant
+from airistotle.async_assistant import AsyncAssistantCache
+
+
+def test_cache_reuses_handles_per_thread(monkeypatch):
+    created = []
+    new_threads = itertools.count(1)
+
+    async def create(openai_api_key, assistant_id, thread_id=""):
+        handle = async_assistant.AsyncAssistant.__new__(async_assistant.AsyncAssistant)
+        handle.thread_id = thread_id or f"thread_new_{next(new_threads)}"
+        created.append(handle.thread_id)
+        return handle
+
+    monkeypatch.setattr(async_assistant.AsyncAssistant, "create", create)
+
+    async def scenario():
+        cache = AsyncAssistantCache("key", "asst", maxsize=2)
+        first = await cache.get("thread_a")
+        assert await cache.get("thread_a") is first
+        new = await cache.get()
+        assert new.thread_id == "thread_new_1"
+        assert await cache.get(new.thread_id) is new
+        await cache.get("thread_b")
+        assert len(cache) == 2
+        # thread_a was the least recently used handle
+        assert await cache.get("thread_a") is not first
+
+    asyncio.run(scenario())
+    assert created == ["thread_a", "thread_new_1", "thread_b", "thread_a"]
@@ -0,0 +1,50 @@
+import time
+
+from airistotle.cache import CACHE_LOOKUPS, ContentCache, DiskCache
+
+
+def test_purge_removes_expired_entries(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3")
+    cache.set("pages", "old", "gone", ttl=-1)
+    cache.set("pages", "new", "kept", ttl=60)
+
+    assert cache.purge() == 1
+    assert cache.get("pages", "new")[0] == "kept"
+
+
+def test_purge_evicts_entries_closest_to_expiring_past_max_bytes(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_bytes=25)
+    for index, ttl in enumerate([30, 10, 20, 40]):
+        cache.set("pages", str(index), "x" * 10, ttl=ttl)
+
+    assert cache.purge() == 2
+    assert cache.get("pages", "0") is not None
+    assert cache.get("pages", "3") is not None
+    assert cache.get("pages", "1") is None
+    assert cache.get("pages", "2") is None
+
+
+def test_start_purging_runs_in_the_background(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3")
+    cache.set("pages", "old", "gone", ttl=-1)
+    cache.start_purging(60)
+    try:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if not DiskCache(cache.path).connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]:
+                break
+            time.sleep(0.05)
+        else:
+            raise AssertionError("expired entry was not purged")
+    finally:
+        cache.stop_purging()
+
+
+def test_lookups_are_counted_by_namespace_and_result():
+    cache = ContentCache("counted", ttl=60)
+    cache.get("missing")
+    cache.set("present", "value")
+    cache.get("present")
+
+    assert CACHE_LOOKUPS.value(namespace="counted", result="miss") == 1
+    assert CACHE_LOOKUPS.value(namespace="counted", result="hit") == 1
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from airistotle.interfaces.coalesce import MessageCoalescer, _Buffers
+
+
+class Answers:
+    def __init__(self):
+        self.batches = []
+        self.answered = threading.Event()
+
+    def __call__(self, prompts):
+        self.batches.append(prompts)
+        self.answered.set()
+
+
+def test_lone_message_is_answered_at_once():
+    coalescer = MessageCoalescer(5, ThreadPoolExecutor(1))
+    answers = Answers()
+    started = time.monotonic()
+    coalescer.add("thread", "hello", answers)
+    assert answers.answered.wait(1)
+    assert time.monotonic() - started < 1
+    assert answers.batches == [["hello"]]
+
+
+def test_messages_during_a_run_are_answered_together_after_it():
+    coalescer = MessageCoalescer(0.05, ThreadPoolExecutor(1))
+    first, second = Answers(), Answers()
+    coalescer.add("thread", "one", first)
+    assert first.answered.wait(1)
+
+    coalescer.add("thread", "two", second)
+    coalescer.add("thread", "three", second)
+    time.sleep(0.2)
+    assert not second.answered.is_set()
+
+    coalescer.release("thread")
+    assert second.answered.wait(1)
+    assert second.batches == [["two", "three"]]
+
+
+def test_burst_is_answered_once_by_the_latest_message():
+    coalescer = MessageCoalescer(0.1, ThreadPoolExecutor(1))
+    first, burst = Answers(), Answers()
+    coalescer.add("thread", "one", first)
+    assert first.answered.wait(1)
+    coalescer.release("thread")
+
+    started = time.monotonic()
+    coalescer.add("thread", "two", first)
+    coalescer.add("thread", "three", burst)
+    assert burst.answered.wait(1)
+    assert time.monotonic() - started >= 0.1
+    assert burst.batches == [["two", "three"]]
+    assert first.batches == [["one"]]
+
+
+def test_add_does_not_block_while_a_run_is_active():
+    coalescer = MessageCoalescer(0.05, ThreadPoolExecutor(1))
+    coalescer.add("thread", "one", Answers())
+    started = time.monotonic()
+    for i in range(10):
+        coalescer.add("thread", str(i), Answers())
+    assert time.monotonic() - started < 0.05
+
+
+def test_waiter_superseded_after_the_batch_was_taken_gives_up():
+    buffers = _Buffers(5)
+    first = buffers.add("thread", "hello")
+    buffers.add("thread", "again")
+    assert buffers.take("thread") == ["hello", "again"]
+    assert buffers.wait_time("thread", first) is None
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+from airistotle.plugins.extractive import ExtractiveSummarizer, NO_RESULTS
+
+
+def page(content, url):
+    return SimpleNamespace(content=content, meta={"url": url})
+
+
+def test_best_returns_only_the_most_relevant_passages():
+    summarizer = ExtractiveSummarizer(passage_words=5, top_n=2)
+    documents = [
+        page("Cats sleep most of the day. They like warm places to rest.", "https://a.example"),
+        page("Python 3.12 adds faster startup. Python releases come out every October.", "https://b.example"),
+    ]
+
+    best = summarizer.best("when do python releases come out", documents)
+
+    assert len(best) == 2
+    assert all(url == "https://b.example" for _, url in best)
+    assert "every October" in best[0][0]
+
+
+def test_summarize_without_passages():
+    assert ExtractiveSummarizer().summarize("anything", []) == NO_RESULTS
@@ -0,0 +1,56 @@
+import pytest
+
+from airistotle.similarity import SimilarQueryCache, key_terms, shingles
+
+
+@pytest.mark.parametrize(
+    "cached, query",
+    [
+        ("best pizza places in brooklyn", "best pizza place in Brooklyn?"),
+        ("How do I install numpy on Windows", "how to install numpy on windows"),
+        ("how to reverse a list in python", "how do you reverse a list in Python?"),
+        ("what is the capital of australia", "What's the capital of Australia?"),
+    ],
+)
+def test_reworded_query_hits(cached, query):
+    cache = SimilarQueryCache()
+    cache.add(cached, "result")
+    assert cache.get(query) == "result"
+
+
+@pytest.mark.parametrize(
+    "cached, query",
+    [
+        ("python 3.11 release date", "python 3.12 release date"),
+        ("iphone 14 price", "iphone 15 price"),
+        ("weather in Paris tomorrow", "weather in London tomorrow"),
+        # Synonyms aren't matched; a miss only costs a search
+        ("latest python release", "what's the newest Python version"),
+    ],
+)
+def test_different_query_misses(cached, query):
+    cache = SimilarQueryCache()
+    cache.add(cached, "result")
+    assert cache.get(query) is None
+
+
+def test_key_terms_must_match_even_when_shingles_are_close():
+    cache = SimilarQueryCache(threshold=0.1)
+    cache.add("how to configure gpt4 function calling with streaming responses", "result")
+    assert cache.get("how to configure gpt5 function calling with streaming responses") is None
+
+
+def test_shingles_are_word_ngrams():
+    assert shingles("Release dates of Python") == {"release", "date", "python", "release date", "date python"}
+
+
+def test_key_terms():
+    assert key_terms("python 3.11 release date") == {"3.11"}
+    assert key_terms("Flights from Boston to Denver") == {"boston", "denver"}
+    assert key_terms("latest python release") == set()
+
+
+def test_expired_entries_miss():
+    cache = SimilarQueryCache(ttl=-1)
+    cache.add("best pizza places in brooklyn", "result")
+    assert cache.get("best pizza places in brooklyn") is None
@@ -0,0 +1,121 @@
+import json
+
+import airistotle.storage as storage
+
+from airistotle.storage.create import open_store
+from airistotle.storage.maintenance import ThreadMapMaintainer
+from airistotle.storage.thread_map import CachedThreadMapStore
+
+
+def write_tinydb(path, records):
+    path.write_text(json.dumps({"_default": {str(i): record for i, record in enumerate(records, 1)}}))
+
+
+def test_new_sqlite_store_imports_tinydb_mappings(tmp_path, monkeypatch):
+    write_tinydb(
+        tmp_path / "database.json",
+        [
+            {"slack_thread_id": "1700000000.000100", "openai_thread_id": "thread_a", "last_message_time": 1700000000},
+            {"slack_thread_id": "1700000000.000200", "openai_thread_id": "thread_b"},
+        ],
+    )
+    monkeypatch.setattr(storage, "THREAD_MAP_BACKEND", "sqlite")
+    monkeypatch.setattr(storage, "THREAD_MAP_LOCATION", tmp_path / "thread_map.sqlite3")
+    monkeypatch.setattr(storage, "DB_LOCATION", tmp_path / "database.json")
+    monkeypatch.setattr(storage, "_store", None)
+
+    store = storage.get_thread_map_store()
+
+    assert len(store) == 2
+    assert store.get("1700000000.000100")["openai_thread_id"] == "thread_a"
+    assert store.get("1700000000.000100")["last_message_time"] == 1700000000
+    assert store.get("1700000000.000200")["openai_thread_id"] == "thread_b"
+    store.backend.close()
+
+
+def test_existing_sqlite_store_is_not_reimported(tmp_path):
+    write_tinydb(tmp_path / "database.json", [{"slack_thread_id": "1", "openai_thread_id": "thread_a"}])
+    store = open_store(tmp_path / "thread_map.sqlite3", import_from=tmp_path / "database.json")
+    store.delete("1")
+    store.close()
+
+    store = open_store(tmp_path / "thread_map.sqlite3", import_from=tmp_path / "database.json")
+    assert len(store) == 0
+    store.close()
+
+
+def test_new_sqlite_store_without_tinydb_file(tmp_path):
+    store = open_store(tmp_path / "thread_map.sqlite3", import_from=tmp_path / "database.json")
+    assert len(store) == 0
+    store.close()
+
+
+def test_maintenance_keeps_mappings_whose_thread_could_not_be_deleted(tmp_path):
+    store = open_store(tmp_path / "thread_map.sqlite3")
+    store.put("old", "thread_old", 1000)
+    store.put("stuck", "thread_stuck", 1001)
+    store.put("new", "thread_new")
+
+    def delete_thread(thread_id):
+        if thread_id == "thread_stuck":
+            raise RuntimeError("unavailable")
+
+    maintainer = ThreadMapMaintainer(store, ttl=3600, delete_thread=delete_thread, delete_interval=0)
+    stats = maintainer.run_once()
+
+    assert stats["expired"] == 1
+    assert stats["failed_deletes"] == 1
+    assert store.get("old") is None
+    assert store.get("stuck")["openai_thread_id"] == "thread_stuck"
+    assert store.get("new") is not None
+    store.close()
+
+
+def test_cached_store_rereads_idle_mappings(tmp_path):
+    backend = open_store(tmp_path / "thread_map.sqlite3")
+    store = CachedThreadMapStore(backend, ttl=3600)
+    store.put("old", "thread_old", 1000)
+    # Expired by another process sharing the file
+    backend.expire(2000)
+
+    assert store.get("old") is None
+    backend.close()
+
+
+def test_maintenance_keeps_threads_written_in_during_the_pass(tmp_path):
+    store = open_store(tmp_path / "thread_map.sqlite3")
+    store.put("first", "thread_first", 1000)
+    store.put("second", "thread_second", 1001)
+    deleted = []
+
+    def delete_thread(thread_id):
+        deleted.append(thread_id)
+        # A reply arrives in the other thread while this one is being deleted
+        store.touch("second")
+
+    maintainer = ThreadMapMaintainer(store, ttl=3600, delete_thread=delete_thread, delete_interval=0)
+    stats = maintainer.run_once()
+
+    assert deleted == ["thread_first"]
+    assert stats["expired"] == 1
+    assert store.get("second")["openai_thread_id"] == "thread_second"
+    store.close()
+
+
+def test_maintenance_stops_after_a_batch_with_failed_deletes(tmp_path):
+    store = open_store(tmp_path / "thread_map.sqlite3")
+    store.put("a", "thread_a", 1000)
+    store.put("b", "thread_b", 1001)
+    attempts = []
+
+    def delete_thread(thread_id):
+        attempts.append(thread_id)
+        raise RuntimeError("unavailable")
+
+    maintainer = ThreadMapMaintainer(store, ttl=3600, batch_size=2, delete_thread=delete_thread, delete_interval=0)
+    stats = maintainer.run_once()
+
+    assert attempts == ["thread_a", "thread_b"]
+    assert stats["failed_deletes"] == 2
+    assert store.get("a")["last_message_time"] == 1000
+    store.close()